@@ -0,0 +1,120 @@
+#app/cli.py
+"""
+Command line tools working directly against Qdrant (no API round-trip).
+
+    python -m app.cli snapshot export docs --out ./snap/docs
+    python -m app.cli snapshot import ./snap/docs --collection docs_restored
+    python -m app.cli replay query_log.sqlite3 --since 2025-01-01T10:00 --speed 2
+    python -m app.cli sync ./docs --collection docs
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime
+
+
+def _cmd_snapshot_export(args):
+    from app.services.snapshot_service import export_collection
+    return export_collection(args.collection, out_dir=args.out, page_size=args.page_size)
+
+
+def _cmd_snapshot_import(args):
+    from app.services.snapshot_service import import_collection
+    return import_collection(
+        args.src,
+        collection=args.collection,
+        batch_size=args.batch_size,
+        recreate=args.recreate
+    )
+
+
+def _timestamp(value: str) -> float:
+    """Epoch seconds or an ISO datetime."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _cmd_replay(args):
+    from app.services.query_log import read_window
+    from app.services.replay import replay, compare
+    entries = read_window(args.log, since=args.since, until=args.until, endpoint=args.endpoint, limit=args.limit)
+    if not entries:
+        raise ValueError("No logged queries in the selected window")
+    logging.getLogger(__name__).info(f"🔁 Replaying {len(entries)} queries at {args.speed}x against {args.url}")
+    results = asyncio.run(replay(entries, args.url, speed=args.speed, max_in_flight=args.max_in_flight))
+    return compare(entries, results, args.speed)
+
+
+def _cmd_sync(args):
+    from app.services.dir_sync import DirectorySync, Manifest
+    syncer = DirectorySync(Manifest(args.manifest) if args.manifest else None)
+    report = asyncio.run(syncer.sync(args.collection, args.root, dry_run=args.dry_run))
+    if not args.verbose:
+        report = {k: (len(v) if isinstance(v, list) and k != "failed" else v) for k, v in report.items()}
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="RAG backend tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # ===== snapshot =====
+    snapshot = commands.add_parser("snapshot", help="Export/import collections without re-embedding")
+    snapshot_cmds = snapshot.add_subparsers(dest="action", required=True)
+
+    export = snapshot_cmds.add_parser("export", help="Collection -> vectors.npy + payloads.jsonl")
+    export.add_argument("collection")
+    export.add_argument("--out", help="Output directory (default: $SNAPSHOT_DIR/<collection>)")
+    export.add_argument("--page-size", type=int, default=None)
+    export.set_defaults(func=_cmd_snapshot_export)
+
+    restore = snapshot_cmds.add_parser("import", help="vectors.npy + payloads.jsonl -> collection")
+    restore.add_argument("src", help="Snapshot directory")
+    restore.add_argument("--collection", help="Target collection (default: exported name)")
+    restore.add_argument("--batch-size", type=int, default=None)
+    restore.add_argument("--recreate", action="store_true", help="Drop the target collection first")
+    restore.set_defaults(func=_cmd_snapshot_import)
+
+    # ===== replay =====
+    rp = commands.add_parser("replay", help="Re-send logged queries and compare latency distributions")
+    rp.add_argument("log", help="Query log file (QUERY_LOG_PATH)")
+    rp.add_argument("--url", default="http://localhost:8000", help="Backend to replay against")
+    rp.add_argument("--since", type=_timestamp, help="Window start (epoch or ISO datetime)")
+    rp.add_argument("--until", type=_timestamp, help="Window end (epoch or ISO datetime)")
+    rp.add_argument("--endpoint", help="Only this endpoint, e.g. /api/search_with_llm")
+    rp.add_argument("--limit", type=int, default=None)
+    rp.add_argument("--speed", type=float, default=1.0, help="Rate multiplier (2 = twice the original rate)")
+    rp.add_argument("--max-in-flight", type=int, default=64)
+    rp.set_defaults(func=_cmd_replay)
+
+    # ===== sync =====
+    sy = commands.add_parser("sync", help="Ingest new/changed files of a directory, delete chunks of removed ones")
+    sy.add_argument("root", help="Directory tree to sync")
+    sy.add_argument("--collection", required=True)
+    sy.add_argument("--manifest", help="Manifest file (default: $SYNC_MANIFEST_PATH)")
+    sy.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    sy.add_argument("--verbose", action="store_true", help="List file paths instead of counts")
+    sy.set_defaults(func=_cmd_sync)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    args = build_parser().parse_args(argv)
+    try:
+        result = args.func(args)
+    except Exception as e:
+        logging.getLogger(__name__).error(f"❌ {args.command} failed: {e}")
+        return 1
+    if result is not None:
+        print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,16 @@
 #app/clients.py
 from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
+import grpc
 import httpx
 import os
+import json
 from dataclasses import dataclass, field
 from dotenv import load_dotenv
 import logging
 
+from app.services.resilience import BreakerProxy, BreakerTransport, CircuitBreaker
+
 load_dotenv()
 
 @dataclass
@@ -14,6 +19,22 @@ class QdrantConfig:
     port: int = int(os.getenv("QDRANT_PORT", 6333))
     score_threshold: float = float(os.getenv("QDRANT_SCORE_THRESHOLD", 0.3))
     collection: str = os.getenv("QDRANT_COLLECTION", "docs")
+    # gRPC transport: binary vectors instead of JSON floats
+    prefer_grpc: bool = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+    grpc_port: int = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+    grpc_max_message_mb: int = int(os.getenv("QDRANT_GRPC_MAX_MESSAGE_MB", 64))
+    grpc_keepalive_ms: int = int(os.getenv("QDRANT_GRPC_KEEPALIVE_MS", 30000))
+    timeout_s: int = int(os.getenv("QDRANT_TIMEOUT", 60))
+
+    def grpc_options(self) -> dict:
+        """Channel options for the (single, long-lived) gRPC channel."""
+        max_bytes = self.grpc_max_message_mb * 1024 * 1024
+        return {
+            "grpc.max_send_message_length": max_bytes,
+            "grpc.max_receive_message_length": max_bytes,
+            "grpc.keepalive_time_ms": self.grpc_keepalive_ms,
+            "grpc.keepalive_permit_without_calls": 1,
+        }
 
 @dataclass
 class OllamaConfig:
@@ -21,7 +42,30 @@ class OllamaConfig:
     base_url: str = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
     llm_model: str = os.getenv("OLLAMA_MODEL", "gemma3:1b")
     embed_model: str = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
-    
+    # keep_alive sent with every request ("30m", "1h", "-1" = forever)
+    llm_keep_alive: str = os.getenv("OLLAMA_LLM_KEEP_ALIVE", "30m")
+    embed_keep_alive: str = os.getenv("OLLAMA_EMBED_KEEP_ALIVE", "30m")
+    prewarm: bool = os.getenv("OLLAMA_PREWARM", "true").lower() == "true"
+    keep_alive_refresh_s: float = float(os.getenv("OLLAMA_KEEP_ALIVE_REFRESH", 600))
+    # load_duration above this counts as a cold model load
+    cold_load_threshold_ms: float = float(os.getenv("OLLAMA_COLD_LOAD_THRESHOLD_MS", 500))
+    # Per-call deadlines (seconds)
+    embed_timeout_s: float = float(os.getenv("OLLAMA_EMBED_TIMEOUT", 30))
+    llm_timeout_s: float = float(os.getenv("OLLAMA_LLM_TIMEOUT", 120))
+    # Embedding retries with jittered exponential backoff
+    embed_retries: int = int(os.getenv("OLLAMA_EMBED_RETRIES", 2))
+    retry_base_delay_s: float = float(os.getenv("OLLAMA_RETRY_BASE_DELAY", 0.2))
+    retry_max_delay_s: float = float(os.getenv("OLLAMA_RETRY_MAX_DELAY", 2.0))
+    # Hedged embeddings: extra backends, comma-separated (primary is base_url)
+    embed_hedge_urls: list = field(default_factory=lambda: [
+        u.strip() for u in os.getenv("OLLAMA_EMBED_HEDGE_URLS", "").split(",") if u.strip()
+    ])
+    hedge_percentile: float = float(os.getenv("OLLAMA_HEDGE_PERCENTILE", 95))
+    hedge_min_delay_ms: float = float(os.getenv("OLLAMA_HEDGE_MIN_DELAY_MS", 50))
+    # Query embeddings: micro-batch concurrent requests into one /api/embed call (Ollama >= 0.3.4)
+    embed_batching: bool = os.getenv("OLLAMA_EMBED_BATCHING", "false").lower() == "true"
+    embed_batch_max_size: int = int(os.getenv("OLLAMA_EMBED_BATCH_MAX_SIZE", 32))
+    embed_batch_window_ms: float = float(os.getenv("OLLAMA_EMBED_BATCH_WINDOW_MS", 5))
 
     @classmethod
     def reload(cls):
@@ -31,19 +75,239 @@ class OllamaConfig:
     
 @dataclass
 class SearchSettings:
-    top_k: int = int(os.getenv("TOP_K", 3))    
+    top_k: int = int(os.getenv("TOP_K", 3))
+    # metadata.<key> payload fields to index for filtered search, comma-separated
+    indexed_metadata_keys: list = field(default_factory=lambda: [
+        k.strip() for k in os.getenv("INDEXED_METADATA_KEYS", "").split(",") if k.strip()
+    ])
+
+@dataclass
+class ProjectionSettings:
+    """2D projection (/plot) settings."""
+    page_size: int = int(os.getenv("PROJECTION_PAGE_SIZE", 1000))
+    max_memory_mb: int = int(os.getenv("PROJECTION_MAX_MEMORY_MB", 256))
+    cache_ttl_s: float = float(os.getenv("PROJECTION_CACHE_TTL", 600))
+
+@dataclass
+class SnapshotSettings:
+    """Collection export/import settings."""
+    dir: str = os.getenv("SNAPSHOT_DIR", "snapshots")
+    page_size: int = int(os.getenv("SNAPSHOT_PAGE_SIZE", 1000))
+    batch_size: int = int(os.getenv("SNAPSHOT_BATCH_SIZE", 1024))
+
+@dataclass
+class IngestSettings:
+    """Ingestion pipeline settings."""
+    bulk_batch_size: int = int(os.getenv("BULK_BATCH_SIZE", 512))
+    bulk_max_line_bytes: int = int(os.getenv("BULK_MAX_LINE_BYTES", 1024 * 1024))
+    # Adaptive (AIMD) embedding concurrency for uploads
+    embed_concurrency_min: int = int(os.getenv("INGEST_EMBED_CONCURRENCY_MIN", 1))
+    embed_concurrency_max: int = int(os.getenv("INGEST_EMBED_CONCURRENCY_MAX", 8))
+    embed_concurrency_initial: int = int(os.getenv("INGEST_EMBED_CONCURRENCY_INITIAL", 2))
+    latency_tolerance: float = float(os.getenv("INGEST_LATENCY_TOLERANCE", 2.0))
+    backoff: float = float(os.getenv("INGEST_BACKOFF", 0.7))
+    upsert_batch_size: int = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", 64))
+
+@dataclass
+class DedupSettings:
+    """Duplicate chunk detection before embedding."""
+    enabled: bool = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+    threshold: float = float(os.getenv("DEDUP_THRESHOLD", 0.85))
+    num_perm: int = int(os.getenv("DEDUP_NUM_PERM", 128))
+    bands: int = int(os.getenv("DEDUP_BANDS", 32))
+    shingle_size: int = int(os.getenv("DEDUP_SHINGLE_SIZE", 3))
+
+@dataclass
+class BreakerSettings:
+    """Circuit breakers around Ollama / Qdrant."""
+    failure_rate: float = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))
+    window: int = int(os.getenv("BREAKER_WINDOW", 20))
+    min_calls: int = int(os.getenv("BREAKER_MIN_CALLS", 5))
+    open_s: float = float(os.getenv("BREAKER_OPEN_SECONDS", 10))
+    half_open_max_calls: int = int(os.getenv("BREAKER_HALF_OPEN_CALLS", 1))
+
+@dataclass
+class HealthSettings:
+    """Background health prober."""
+    probe_interval_s: float = float(os.getenv("HEALTH_PROBE_INTERVAL", 5))
+    probe_timeout_s: float = float(os.getenv("HEALTH_PROBE_TIMEOUT", 2))
+
+@dataclass
+class ResponseSettings:
+    """API response serialization / compression."""
+    compress_min_bytes: int = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+    gzip_level: int = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+    brotli_quality: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", 5))
+    preview_chars: int = int(os.getenv("RESPONSE_PREVIEW_CHARS", 300))
+
+@dataclass
+class ChatSettings:
+    """Multi-turn chat sessions (/api/chat)."""
+    session_ttl_s: float = float(os.getenv("CHAT_SESSION_TTL", 1800))
+    max_memory_mb: float = float(os.getenv("CHAT_MAX_MEMORY_MB", 64))
+    max_context_tokens: int = int(os.getenv("CHAT_MAX_CONTEXT_TOKENS", 4096))
+
+@dataclass
+class BudgetSettings:
+    """Per-request latency budgets for /api/search_with_llm (deadline_ms)."""
+    default_deadline_ms: int = int(os.getenv("RAG_DEADLINE_MS", 0))          # 0 = no deadline
+    embed_share: float = float(os.getenv("RAG_EMBED_SHARE", 0.25))           # max part of the deadline for embedding
+    decode_share: float = float(os.getenv("RAG_DECODE_SHARE", 0.6))          # part of the LLM time for generated tokens
+    min_llm_ms: int = int(os.getenv("RAG_MIN_LLM_MS", 1000))                 # less than this left: retrieval-only
+    prefill_tokens_per_s: float = float(os.getenv("RAG_PREFILL_TOKENS_PER_S", 200))
+    decode_tokens_per_s: float = float(os.getenv("RAG_DECODE_TOKENS_PER_S", 10))
+    min_num_predict: int = int(os.getenv("RAG_MIN_NUM_PREDICT", 32))
+    max_num_predict: int = int(os.getenv("RAG_MAX_NUM_PREDICT", 512))
+    min_num_ctx: int = int(os.getenv("RAG_MIN_NUM_CTX", 2048))
+    max_num_ctx: int = int(os.getenv("RAG_MAX_NUM_CTX", 8192))
+    max_context_chars: int = int(os.getenv("RAG_MAX_CONTEXT_CHARS", 6000))
+    min_context_chars: int = int(os.getenv("RAG_MIN_CONTEXT_CHARS", 300))    # less fits: retrieval-only
+
+@dataclass
+class QueryLogSettings:
+    """Opt-in append-only query log (SQLite) used by `app.cli replay`."""
+    enabled: bool = os.getenv("QUERY_LOG_ENABLED", "false").lower() == "true"
+    path: str = os.getenv("QUERY_LOG_PATH", "query_log.sqlite3")
+    queue_size: int = int(os.getenv("QUERY_LOG_QUEUE_SIZE", 10000))
+    batch_size: int = int(os.getenv("QUERY_LOG_BATCH_SIZE", 200))
+
+@dataclass
+class LocalIndexSettings:
+    """In-process NumPy index for small / hot collections."""
+    enabled: bool = os.getenv("LOCAL_INDEX_ENABLED", "false").lower() == "true"
+    # Collections to serve locally, comma-separated (empty: any small enough)
+    collections: list = field(default_factory=lambda: [
+        c.strip() for c in os.getenv("LOCAL_INDEX_COLLECTIONS", "").split(",") if c.strip()
+    ])
+    max_points: int = int(os.getenv("LOCAL_INDEX_MAX_POINTS", 50000))
+    # Bigger indexes are scored in a worker thread, off the event loop
+    inline_max_points: int = int(os.getenv("LOCAL_INDEX_INLINE_MAX_POINTS", 10000))
+    cache_dir: str = os.getenv("LOCAL_INDEX_DIR", "local_index")
+    refresh_interval_s: float = float(os.getenv("LOCAL_INDEX_REFRESH", 300))
 
-# ========= GLOBAL CONFIG =========  
+@dataclass
+class LexicalSettings:
+    """Local BM25 index for hybrid / keyword retrieval."""
+    enabled: bool = os.getenv("LEXICAL_ENABLED", "false").lower() == "true"
+    dir: str = os.getenv("LEXICAL_INDEX_DIR", "lexical_index")
+    k1: float = float(os.getenv("LEXICAL_BM25_K1", 1.2))
+    b: float = float(os.getenv("LEXICAL_BM25_B", 0.75))
+    rrf_k: int = int(os.getenv("LEXICAL_RRF_K", 60))
+    persist_interval_s: float = float(os.getenv("LEXICAL_PERSIST_INTERVAL", 30))
+
+@dataclass
+class CompressionSettings:
+    """Extractive context compression before generation."""
+    enabled: bool = os.getenv("COMPRESSION_ENABLED", "false").lower() == "true"
+    method: str = os.getenv("COMPRESSION_METHOD", "lexical")                  # lexical | embedding
+    max_tokens: int = int(os.getenv("COMPRESSION_MAX_TOKENS", 512))
+    min_sentence_chars: int = int(os.getenv("COMPRESSION_MIN_SENTENCE_CHARS", 20))
+    # Drop sentences scoring at or below this fraction of the best one
+    min_relative_score: float = float(os.getenv("COMPRESSION_MIN_RELATIVE_SCORE", 0.3))
+    embed_cache_size: int = int(os.getenv("COMPRESSION_EMBED_CACHE_SIZE", 20000))
+    embed_concurrency: int = int(os.getenv("COMPRESSION_EMBED_CONCURRENCY", 4))
+
+@dataclass
+class CacheSettings:
+    """Shared cache for query embeddings, answers and collection metadata."""
+    backend: str = os.getenv("CACHE_BACKEND", "memory")                      # memory | sqlite | redis
+    max_items: int = int(os.getenv("CACHE_MAX_ITEMS", 50000))
+    sqlite_path: str = os.getenv("CACHE_SQLITE_PATH", "cache.sqlite3")
+    redis_url: str = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    redis_prefix: str = os.getenv("CACHE_REDIS_PREFIX", "rag:")
+    redis_timeout_s: float = float(os.getenv("CACHE_REDIS_TIMEOUT", 0.05))
+    # TTLs in seconds; 0 = no expiry, answers: 0 = not cached
+    embedding_ttl_s: float = float(os.getenv("CACHE_EMBEDDING_TTL", 0))
+    answer_ttl_s: float = float(os.getenv("CACHE_ANSWER_TTL", 0))
+    metadata_ttl_s: float = float(os.getenv("CACHE_METADATA_TTL", 60))
+
+def _sync_targets() -> dict:
+    """SYNC_DIRS="docs=/data/docs,manuals=/data/manuals" -> {collection: directory}."""
+    targets = {}
+    for item in os.getenv("SYNC_DIRS", "").split(","):
+        if "=" in item:
+            collection, path = item.split("=", 1)
+            targets[collection.strip()] = path.strip()
+    return targets
+
+@dataclass
+class SyncSettings:
+    """Incremental directory -> collection sync (CLI `sync` and background watcher)."""
+    targets: dict = field(default_factory=_sync_targets)
+    manifest_path: str = os.getenv("SYNC_MANIFEST_PATH", "sync_manifest.sqlite3")
+    extensions: list = field(default_factory=lambda: [
+        e.strip().lower() for e in os.getenv("SYNC_EXTENSIONS", ".txt,.md,.json").split(",") if e.strip()
+    ])
+    chunk_size: int = int(os.getenv("SYNC_CHUNK_SIZE", 500))
+    overlap: int = int(os.getenv("SYNC_OVERLAP", 1))
+    file_concurrency: int = int(os.getenv("SYNC_FILE_CONCURRENCY", 4))
+    poll_interval_s: float = float(os.getenv("SYNC_POLL_INTERVAL", 300))
+    watch: bool = os.getenv("SYNC_WATCH", "true").lower() == "true"           # use watchfiles when installed
+    debounce_s: float = float(os.getenv("SYNC_DEBOUNCE", 2))
+
+def _collection_defaults() -> dict:
+    """COLLECTION_DEFAULTS='{"docs": {"top_k": 5, "score_threshold": 0.4}}' -> {collection: defaults}."""
+    raw = os.getenv("COLLECTION_DEFAULTS", "").strip()
+    if not raw:
+        return {}
+    try:
+        defaults = json.loads(raw)
+    except json.JSONDecodeError:
+        logging.getLogger(__name__).warning("!!! COLLECTION_DEFAULTS is not valid JSON, ignored")
+        return {}
+    return {name: dict(values) for name, values in defaults.items() if isinstance(values, dict)}
+
+@dataclass
+class RegistrySettings:
+    """Cached collection metadata: names, vector configs, point counts, per-collection defaults."""
+    refresh_interval_s: float = float(os.getenv("REGISTRY_REFRESH_INTERVAL", 30))
+    # Unknown names are re-checked in Qdrant at most this often (created by another worker?)
+    recheck_s: float = float(os.getenv("REGISTRY_RECHECK", 2))
+    # Per-collection top_k / score_threshold / embed_model; runtime changes go to defaults_path
+    defaults: dict = field(default_factory=_collection_defaults)
+    defaults_path: str = os.getenv("COLLECTION_DEFAULTS_PATH", "collection_defaults.json")
+
+@dataclass
+class ReindexSettings:
+    """Blue/green re-indexing into a shadow collection behind an alias."""
+    # Chunks embedded per second, so live traffic keeps its share of Ollama (0 = no limit)
+    max_chunks_per_s: float = float(os.getenv("REINDEX_MAX_CHUNKS_PER_S", 20))
+    batch_size: int = int(os.getenv("REINDEX_BATCH_SIZE", 64))
+    # Catch-up passes while writes continue; the last one runs with writes paused
+    max_catchup_passes: int = int(os.getenv("REINDEX_MAX_CATCHUP_PASSES", 5))
+    # Alias -> current/previous collection, for rollback
+    state_path: str = os.getenv("REINDEX_STATE_PATH", "reindex_state.json")
+
+# ========= GLOBAL CONFIG =========
 @dataclass
 class GlobalConfig:
     ollama: OllamaConfig = field(default_factory=OllamaConfig)
     qdrant: QdrantConfig = field(default_factory=QdrantConfig)
     searchsettings: SearchSettings = field(default_factory=SearchSettings)
+    projection: ProjectionSettings = field(default_factory=ProjectionSettings)
+    snapshot: SnapshotSettings = field(default_factory=SnapshotSettings)
+    ingest: IngestSettings = field(default_factory=IngestSettings)
+    dedup: DedupSettings = field(default_factory=DedupSettings)
+    breaker: BreakerSettings = field(default_factory=BreakerSettings)
+    health: HealthSettings = field(default_factory=HealthSettings)
+    response: ResponseSettings = field(default_factory=ResponseSettings)
+    chat: ChatSettings = field(default_factory=ChatSettings)
+    budget: BudgetSettings = field(default_factory=BudgetSettings)
+    query_log: QueryLogSettings = field(default_factory=QueryLogSettings)
+    local_index: LocalIndexSettings = field(default_factory=LocalIndexSettings)
+    lexical: LexicalSettings = field(default_factory=LexicalSettings)
+    compression: CompressionSettings = field(default_factory=CompressionSettings)
+    cache: CacheSettings = field(default_factory=CacheSettings)
+    sync: SyncSettings = field(default_factory=SyncSettings)
+    registry: RegistrySettings = field(default_factory=RegistrySettings)
+    reindex: ReindexSettings = field(default_factory=ReindexSettings)
 
     def __repr__(self):
         return (
             f"Ollama({self.ollama.llm_model}), "
-            f"Qdrant({self.qdrant.collection}:{self.qdrant.port}), "
+            f"Qdrant({self.qdrant.collection}:"
+            f"{self.qdrant.grpc_port if self.qdrant.prefer_grpc else self.qdrant.port}"
+            f"{' grpc' if self.qdrant.prefer_grpc else ''}), "
             f"top_k={self.searchsettings.top_k}"
         )
     
@@ -54,12 +318,66 @@ log = logging.getLogger(__name__)
 log.info(f"⚙️ Loaded Ollama config: {cfg}")
 
 
+def make_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_rate=cfg.breaker.failure_rate,
+        window=cfg.breaker.window,
+        min_calls=cfg.breaker.min_calls,
+        open_s=cfg.breaker.open_s,
+        half_open_max_calls=cfg.breaker.half_open_max_calls,
+    )
+
+
+# gRPC status codes that mean "bad request", not "Qdrant is down"
+_GRPC_CLIENT_ERRORS = {
+    grpc.StatusCode.NOT_FOUND,
+    grpc.StatusCode.INVALID_ARGUMENT,
+    grpc.StatusCode.ALREADY_EXISTS,
+    grpc.StatusCode.FAILED_PRECONDITION,
+}
+
+
+def _is_qdrant_failure(e: Exception) -> bool:
+    """Client errors (404 collection, 400 bad request) are not outages."""
+    if isinstance(e, UnexpectedResponse) and e.status_code is not None:
+        return e.status_code >= 500
+    if isinstance(e, grpc.RpcError) and hasattr(e, "code"):
+        return e.code() not in _GRPC_CLIENT_ERRORS
+    return not isinstance(e, (ValueError, TypeError, KeyError))
+
+
+def make_qdrant_client(prefer_grpc: bool = None) -> QdrantClient:
+    """
+    REST or gRPC Qdrant client. The client keeps one channel/connection
+    pool for its whole life, so create it once and share it.
+    """
+    prefer_grpc = cfg.qdrant.prefer_grpc if prefer_grpc is None else prefer_grpc
+    return QdrantClient(
+        host=cfg.qdrant.host,
+        port=cfg.qdrant.port,
+        grpc_port=cfg.qdrant.grpc_port,
+        prefer_grpc=prefer_grpc,
+        grpc_options=cfg.qdrant.grpc_options() if prefer_grpc else None,
+        timeout=cfg.qdrant.timeout_s
+    )
+
+
 # === QDRANT clients(real objects) ===
-qdrant = QdrantClient(
-    host=cfg.qdrant.host,
-    port=cfg.qdrant.port,
-    timeout=60.0
+# Every call goes through the breaker; `qdrant.unwrapped` bypasses it
+qdrant_breaker = make_breaker("qdrant")
+qdrant = BreakerProxy(
+    make_qdrant_client(),
+    qdrant_breaker,
+    _is_qdrant_failure
 )
 
 # === Shared HTTP client ===
-http_client = httpx.AsyncClient(timeout=httpx.Timeout(120.0))
+# One breaker per Ollama host (hedge backends included)
+ollama_transport = BreakerTransport(lambda host: make_breaker(f"ollama@{host}"))
+http_client = httpx.AsyncClient(timeout=httpx.Timeout(120.0), transport=ollama_transport)
+
+
+def ollama_breaker(base_url: str = None) -> CircuitBreaker:
+    """Breaker of an Ollama backend (default: cfg.ollama.base_url)."""
+    return ollama_transport.breaker_for(httpx.URL(base_url or cfg.ollama.base_url).netloc.decode())
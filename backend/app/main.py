@@ -1,6 +1,6 @@
 #rag_local/backend/app/main.py
 import collections
-from math import sqrt
+import numpy as np
 from dotenv import load_dotenv
 from qdrant_client import QdrantClient
 from qdrant_client import models as qmodels
@@ -10,7 +10,16 @@ import logging
 import os
 
 from app.clients import http_client, cfg, qdrant
-from app.routes import base, plot, rag_ui
+from app.routes import base, plot, rag_ui, snapshots, chat, reindex
+from app.services.model_lifecycle import model_keeper
+from app.services.health_monitor import health_monitor, HEALTHY
+from app.services.query_log import query_log
+from app.services.payload_filters import create_collection, ensure_payload_indexes
+from app.services.local_index import local_index
+from app.services.lexical_index import lexical_index
+from app.services.dir_sync import sync_service
+from app.services.collection_registry import collection_registry
+from app.responses import FastJSONResponse, CompressionMiddleware
 
 load_dotenv()
 
@@ -19,29 +28,36 @@ log = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
 
 
-app = FastAPI(title="RAG Local API")
+app = FastAPI(title="RAG Local API", default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware)
 app.include_router(base.router, prefix="/api")
+app.include_router(snapshots.router, prefix="/api")
+app.include_router(chat.router, prefix="/api")
+app.include_router(reindex.router, prefix="/api")
 app.include_router(plot.router)
 app.include_router(rag_ui.router)
 
 #===============UTILS============================
 def distance(p1, p2):
     """Simple Euclidean distance"""
-    return sqrt(sum((a - b) ** 2 for a, b in zip(p1, p2)))
+    return float(np.linalg.norm(np.subtract(p1, p2, dtype=np.float32)))
 
 
 @app.get("/ping_qdrant")
 def ping_qdrant():
-    """Check Qdrant availability and list collections"""
-    try:  
-        info = qdrant.get_collections()
-        collections = [c.name for c in info.collections]
+    """Qdrant availability and collections, as last seen by the health prober"""
+    state = health_monitor.snapshot()["qdrant"]
+    if state["status"] == HEALTHY:
         return {
             "qdrant_alive": True,
-            "collections": collections
+            "collections": state.get("collections", []),
+            "checked_at": state.get("checked_at")
             }
-    except Exception as e :
-        return {"qdrant_alive": False, "error": str(e)}
+    return {
+        "qdrant_alive": False,
+        "error": state["status"],
+        "checked_at": state.get("checked_at")
+        }
     
 #============LIFECYCLE======================
 
@@ -57,20 +73,38 @@ async def startup_event():
         # Prepare HTTP client
         app.state.client = AsyncClient(base_url="http://127.0.0.1:8000", timeout=60.0)
 
-        collections = [c.name for c in qdrant.get_collections().collections]
+        # Keep Qdrant / Ollama health in memory for /api/health
+        health_monitor.start()
+
+        # Load Ollama models before the first user request pays for it
+        if cfg.ollama.prewarm:
+            model_keeper.start()
+
+        # Keep in-process vector indexes in sync with Qdrant
+        local_index.start()
+        lexical_index.start()
+
+        # Keep SYNC_DIRS collections in sync with their directories
+        sync_service.start()
+
+        # Collection names, vector configs and counts, refreshed in the background
+        collection_registry.start()
+
         collection_name = cfg.qdrant.collection
         
-        if collection_name not in collections:
+        if collection_registry.get(collection_name) is None:
             log.info(f"Creating Qdrant collection '{collection_name}'")
-            qdrant.create_collection(
-                collection_name=collection_name,
-                vectors_config=qmodels.VectorParams(
+            create_collection(
+                collection_name,
+                qmodels.VectorParams(
                     size=768,
                     distance=qmodels.Distance.COSINE
                 ),
             )       
         else:
             log.info(f"🚀🚀🚀🚀Collection '{collection_name}' already exists")
+            # Collections created before filtered search have no payload indexes
+            ensure_payload_indexes(collection_name)
             
     except Exception as e:
         logging.warning(f"⚠ Skipping Qdrant init: {e}")
@@ -80,6 +114,14 @@ async def startup_event():
 async def shutdown_event():
     
     """Gracefully close HTTP client"""
+    await model_keeper.stop()
+    await health_monitor.stop()
+    await query_log.stop()
+    await local_index.stop()
+    await lexical_index.stop()
+    await sync_service.stop()
+    await collection_registry.stop()
+
     if hasattr(app.state, "client"):
         await app.state.client.aclose()
         
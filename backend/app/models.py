@@ -1,6 +1,7 @@
 #app/models.py
-from pydantic import BaseModel, Field
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, Field, StrictBool
+from typing import Dict, List, Literal, Optional, Union
 from app.clients import cfg
 
 # ============================================================
@@ -30,10 +31,30 @@ class EmbedRequest(BaseModel):
     text:str
 
 
+# full: whole chunk text | preview: first preview_chars | ids: no text at all
+ResultMode = Literal["full", "preview", "ids"]
+# dense: embedding + vector search | lexical: BM25 only | hybrid: both, RRF-fused
+# auto: lexical for identifier-like queries, dense otherwise
+RetrievalMode = Literal["auto", "dense", "lexical", "hybrid"]
+
+
+class SearchFilter(BaseModel):
+    """Payload filter applied inside the vector search (all fields must match)."""
+    source: Optional[Union[str, List[str]]] = None
+    # metadata.<key> == value (a list means any of)
+    metadata: Optional[Dict[str, Union[StrictBool, int, str, List[Union[int, str]]]]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+
 class SearchRequest(BaseModel):
     query: str
-    #top_k: int = Field(default_factory=lambda: cfg.searchsettings.top_k)
-    top_k: int = 3
+    # None: the collection's default (collection_registry.defaults)
+    top_k: Optional[int] = Field(None, ge=1)
+    result_mode: ResultMode = "full"
+    preview_chars: int = Field(default_factory=lambda: cfg.response.preview_chars, ge=1)
+    filters: Optional[SearchFilter] = None
+    retrieval: RetrievalMode = "auto"
   
 
 class RAGRequest(BaseModel):
@@ -41,4 +62,39 @@ class RAGRequest(BaseModel):
     #top_k: int = Field(default_factory=lambda: cfg.searchsettings.top_k)    
     #collection: str = Field(default_factory=lambda: cfg.qdrant.collection)
     top_k: Optional[int] = None
-    collection: Optional[str] = None
\ No newline at end of file
+    collection: Optional[str] = None
+    result_mode: ResultMode = "preview"
+    preview_chars: int = Field(default_factory=lambda: cfg.response.preview_chars, ge=1)
+    # Total time the caller will wait; stages are sized to fit (None: RAG_DEADLINE_MS)
+    deadline_ms: Optional[int] = Field(None, ge=1)
+    filters: Optional[SearchFilter] = None
+    retrieval: RetrievalMode = "auto"
+    # Send only the sentences relevant to the query (None: COMPRESSION_ENABLED)
+    compress: Optional[bool] = None
+
+
+class CollectionDefaultsUpdate(BaseModel):
+    """Per-collection query defaults (PUT /collections/{name}/defaults); null resets a field."""
+    top_k: Optional[int] = Field(None, ge=1)
+    score_threshold: Optional[float] = None
+    embed_model: Optional[str] = None
+
+
+class ReindexRequest(BaseModel):
+    """Blue/green re-index of the collection behind an alias (POST /reindex/{alias})."""
+    # None: the alias' current embedding model
+    embed_model: Optional[str] = None
+    # None: keep the existing chunks; otherwise re-chunk every document
+    chunk_size: Optional[int] = Field(None, ge=50)
+    overlap: int = Field(1, ge=0)
+    # Switch the alias when the shadow collection is complete
+    switch: bool = True
+    # The alias name is still a plain collection: delete it at the switch
+    replace_collection: bool = False
+
+
+class ChatRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+    collection: Optional[str] = None
+    top_k: Optional[int] = None
@@ -0,0 +1,120 @@
+#app/responses.py
+import gzip
+import logging
+from typing import Any
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.clients import cfg
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def _default(obj: Any):
+    """Fallback for types orjson doesn't know (pydantic models, UUIDs in payloads...)."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return str(obj)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized with orjson (several times faster on large result lists)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+def dumps_pretty(data: Any) -> str:
+    """Indented JSON for display (rag_ui raw_data)."""
+    return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS | orjson.OPT_INDENT_2).decode()
+
+
+#======== Compression ======
+
+def choose_encoding(accept_encoding: str) -> str:
+    """'br' if the client accepts it and brotli is installed, else 'gzip', else ''."""
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in accept_encoding.split(",")
+        if part.strip() and not part.strip().endswith("q=0")
+    }
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return ""
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=cfg.response.brotli_quality)
+    return gzip.compress(body, compresslevel=cfg.response.gzip_level)
+
+
+class CompressionMiddleware:
+    """
+    gzip / brotli for single-body responses of at least `min_bytes`.
+    Streaming responses (more_body) and already-encoded ones pass through
+    untouched, so PNG plots and snapshot downloads aren't buffered.
+    """
+
+    def __init__(self, app: ASGIApp, min_bytes: int = None):
+        self.app = app
+        self.min_bytes = cfg.response.compress_min_bytes if min_bytes is None else min_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough or start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < self.min_bytes
+                or not content_type.startswith(_COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,27 +1,70 @@
 #rag_local/backend/app/routes/base.py
+import json
 import uuid
+import asyncio
+import time
 import logging
 import httpx
-from fastapi import APIRouter
+from dataclasses import asdict
+from typing import Optional
+from fastapi import APIRouter, Query, Response
 from qdrant_client.http import models as qmodels
 from fastapi import UploadFile, File, Form, HTTPException, Request
 from starlette.requests import Request as StarletteRequest
 from fastapi.templating import Jinja2Templates
 
-from app.clients import cfg, qdrant, http_client
+from app.clients import cfg, qdrant, http_client, qdrant_breaker, ollama_transport
 from app.utils import chunk_text_by_sentences
-from app.services.rag_services import generate_rag_answer, _get_embedding
+from app.services.rag_services import (
+    generate_rag_answer,
+    retrieve,
+    hit_text,
+    payload_selector,
+    _get_embedding,
+    _hedge_delay_s,
+    embed_latency,
+    embed_transport_stats,
+    query_embed_batcher
+)
+from app.services.projection_service import projection_service
+from app.services.snapshot_service import get_vector_params
+from app.services.bulk_ingest import ingest_jsonl
+from app.services.model_lifecycle import LLM, keep_alive_for, record_load, model_status
+from app.services.health_monitor import health_monitor
+from app.services.resilience import CircuitOpenError
+from app.services.dedup import dedup_service, content_hash
+from app.services.ingest_service import embed_and_store
+from app.services.concurrency import ingest_limiter, write_gate, WriteRejected
+from app.services.query_log import query_log, entry_from_result
+from app.services.payload_filters import build_filter, create_collection as create_indexed_collection
+from app.services.local_index import local_index
+from app.services.lexical_index import lexical_index
+from app.services.cache import cache_status
+from app.services.dir_sync import sync_service
+from app.services.collection_registry import CollectionNotFound, collection_registry
+from app.services.cancellation import (
+    CLIENT_CLOSED_REQUEST,
+    ClientDisconnected,
+    WorkCancelled,
+    cancel_on_disconnect,
+    disconnect_stats,
+    upload_jobs,
+)
+from app.responses import FastJSONResponse
 from app.models import (
     AskRequest,
     EmbedRequest,
     SearchRequest,
-    RAGRequest
+    RAGRequest,
+    CollectionDefaultsUpdate
 )
 
 # ========= Logger setup =========
 log = logging.getLogger(__name__)
 router = APIRouter()
 
+MAX_REPORTED_DUPLICATES = 50
+
 @router.get("/")
 def root():
     """Health check endpoint"""
@@ -33,42 +76,129 @@ def root():
 
 @router.get("/health")
 async def health_check():
-    """Check if all services are available"""
-    try:
-        # Check Qdrant
-        collections = qdrant.get_collections()
-        qdrant_status = "healthy"
-    except Exception as e:
-        qdrant_status = f"unhealthy: {str(e)}"
-
-    try:
-        # Check Ollama
-        resp = await http_client.get(f"{cfg.ollama.base_url}/api/tags", timeout=5.0)
-        ollama_status = "healthy" if resp.status_code == 200 else "unhealthy"
-    except Exception as e:
-        ollama_status = f"unhealthy: {str(e)}"
-    
+    """Service health from the background prober (no live upstream calls)."""
+    state = health_monitor.snapshot()
     return {
-        "qdrant": qdrant_status,
-        "ollama": ollama_status,
-        "collection": cfg.qdrant.collection
+        "qdrant": state["qdrant"]["status"],
+        "ollama": state["ollama"]["status"],
+        "collection": cfg.qdrant.collection,
+        "details": state,
+        "circuits": {
+            "qdrant": qdrant_breaker.snapshot(),
+            **{
+                f"ollama@{host}": breaker.snapshot()
+                for host, breaker in ollama_transport.breakers.items()
+            }
+        }
     } 
   
 
 
+@router.get("/models/status")
+async def models_status():
+    """Ollama model load and embedding transport statistics."""
+    return {
+        "models": model_status(),
+        "keep_alive": {
+            "embedding": cfg.ollama.embed_keep_alive,
+            "llm": cfg.ollama.llm_keep_alive
+        },
+        "refresh_s": cfg.ollama.keep_alive_refresh_s,
+        "embedding_transport": {
+            **embed_transport_stats,
+            "p95_ms": round(embed_latency.percentile(95), 1),
+            "hedge_delay_ms": round(_hedge_delay_s() * 1000, 1)
+        },
+        "query_embedding_batching": {
+            "enabled": cfg.ollama.embed_batching,
+            **query_embed_batcher.snapshot()
+        }
+    }
+
+
+@router.get("/ingest/status")
+async def ingest_status():
+    """Current adaptive embedding concurrency and observed Ollama latency."""
+    return {"embedding_concurrency": ingest_limiter.snapshot()}
+
+
+@router.get("/query_log/status")
+async def query_log_status():
+    """Query log writer state (entries written / dropped)."""
+    return query_log.snapshot()
+
+
+@router.get("/local_index/status")
+async def local_index_status():
+    """Collections served from the in-process vector index."""
+    return local_index.snapshot()
+
+
+@router.get("/lexical_index/status")
+async def lexical_index_status():
+    """Collections with a loaded BM25 index."""
+    return lexical_index.snapshot()
+
+
+@router.get("/cache/status")
+async def cache_stats():
+    """Shared cache backend and per-namespace hit rates."""
+    return cache_status()
+
+
+@router.get("/sync/status")
+async def sync_status():
+    """Configured sync directories and the last report of each."""
+    return sync_service.snapshot()
+
+
+@router.get("/collections")
+async def list_collections():
+    """Cached collection metadata: vector size, distance, point count and query defaults."""
+    return collection_registry.snapshot()
+
+
+@router.put("/collections/{name}/defaults")
+async def update_collection_defaults(name: str, request: CollectionDefaultsUpdate):
+    """Set a collection's top_k / score_threshold / embed_model (null resets one to the global value)."""
+    try:
+        await collection_registry.arequire(name)
+    except CollectionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    defaults = collection_registry.set_defaults(name, **request.model_dump(exclude_unset=True))
+    return {"collection": name, "defaults": asdict(defaults)}
+
+
+@router.post("/sync/{collection}")
+async def sync_now(collection: str):
+    """Sync a configured directory now instead of waiting for the watcher."""
+    try:
+        return await sync_service.run_once(collection)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/ask")
-async def ask_ollama(request: AskRequest):
-    """Send raw prompt to LLM without RAG. """      
+async def ask_ollama(request: AskRequest, http_request: Request):
+    """Send raw prompt to LLM without RAG (cancelled if the caller disconnects)."""      
     try:  
         data = {
-            "model": cfg.ollama.ollama_model,
+            "model": cfg.ollama.llm_model,
             "prompt": request.prompt,
-            "stream": False
+            "stream": False,
+            "keep_alive": keep_alive_for(LLM)
         }        
-        response = await http_client.post(
-            f"{cfg.ollama.base_url}/api/generate",
-            json=data,
-            timeout=120.0
+        response = await cancel_on_disconnect(
+            http_request,
+            http_client.post(
+                f"{cfg.ollama.base_url}/api/generate",
+                json=data,
+                timeout=120.0
+                )
             )            
         if response.status_code != 200:
             raise HTTPException(
@@ -76,10 +206,13 @@ async def ask_ollama(request: AskRequest):
                 detail=f"Ollama  error: {response.text}"
                 )        
         result = response.json()
+        record_load(LLM, cfg.ollama.llm_model, result.get("load_duration"))
         return {
             "answer": result.get("response", "No answer"),
             "model": cfg.ollama.llm_model
             }
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except Exception as e:
         log.error(f"Ask endpoint error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -89,7 +222,17 @@ async def ask_ollama(request: AskRequest):
 async def embed_text(request: EmbedRequest):
     """Embed text and store in Qdrant"""  
     try:
-        embedding, elapsed_embedding = await _get_embedding(request.text)
+        await collection_registry.validate_ingest(cfg.qdrant.collection)
+    except CollectionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Writes go to the collection behind an alias, like the in-process indexes
+    collection = collection_registry.resolve(cfg.qdrant.collection)
+    try:
+        embedding, elapsed_embedding = await _get_embedding(
+            request.text, model=collection_registry.defaults(collection).embed_model
+        )
 
         # store in Qdrant =========
         point = qmodels.PointStruct(
@@ -97,20 +240,27 @@ async def embed_text(request: EmbedRequest):
             vector = embedding,
             payload = {
                 "text": request.text,
-                "source": "api_embed"
+                "source": "api_embed",
+                "content_hash": content_hash(request.text),
+                "uploaded_at": time.time()
             }
         )
-        qdrant.upsert(
-            collection_name=cfg.qdrant.collection,
-            points=[point]
-        )        
+        async with write_gate.writing(collection):
+            point.payload["stored_at"] = time.time()
+            await asyncio.to_thread(qdrant.upsert, collection_name=collection, points=[point])
+        projection_service.invalidate(collection)
+        dedup_service.add(collection, request.text, f"api_embed#{point.id}")
+        local_index.add_points(collection, [point])
+        lexical_index.add_points(collection, [point])
         return {
             "message": "Vector saved to Qdrant",
             "vector_dim": len(embedding),
             "text_preview": request.text[:100],
-            "collection": cfg.qdrant.collection,
+            "collection": collection,
             "embedding_time_ms": round(elapsed_embedding, 1)
         }
+    except WriteRejected as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         log.error(f"Embed endpoint error: {str(e)}")            
         raise HTTPException(status_code=500, detail=str(e))
@@ -119,52 +269,151 @@ async def embed_text(request: EmbedRequest):
 @router.post("/search")        
 async def search_text(request: SearchRequest):
     """Semantic search in Qdrant without LLM generation"""
+    t0 = time.perf_counter()
+    if await collection_registry.amissing(cfg.qdrant.collection):
+        raise HTTPException(status_code=404, detail=f"Collection '{cfg.qdrant.collection}' not found")
     try:
-        query_vector, elapsed_search = await _get_embedding(request.query)    
-
-        # Search in Qdrant =========
-        search_result = qdrant.search(
-        collection_name=cfg.qdrant.collection,
-        query_vector=query_vector,
-        limit=request.top_k,
-        with_payload=True,
-        score_threshold=cfg.qdrant.score_threshold,
-        )
+        # Embed + search, or BM25 only for identifier-like queries =========
+        retrieved = await retrieve(
+            request.query,
+            cfg.qdrant.collection,
+            request.top_k or collection_registry.defaults(cfg.qdrant.collection).top_k,
+            filters=request.filters,
+            mode=request.retrieval,
+            with_payload=payload_selector(request.result_mode)
+            )
+        search_result = retrieved["hits"]
         results = [
-            {"text": hit.payload.get("text", ""),
+            {"id": hit.id,
+            **hit_text(hit.payload, request.result_mode, request.preview_chars),
             "score": round(hit.score, 4),
             "source": hit.payload.get("source", "unknown")
             }
             for hit in search_result
         ]
-        return {
+        result = {
             "query": request.query,
             "results": results,
             "count": len(results),
-            "embedding_time_ms": round(elapsed_search)
+            "embedding_time_ms": round(retrieved["embedding_ms"]),
+            "timing": {
+                "embedding": round(retrieved["embedding_ms"], 1),
+                "search": round(retrieved["search_ms"], 1),
+            },
+            "retrieval": retrieved["retrieval"],
+            "collection": cfg.qdrant.collection
             }
+        if query_log.enabled:
+            query_log.record(entry_from_result(
+                "/api/search", request.model_dump(mode="json"), result, (time.perf_counter() - t0) * 1000
+                ))
+        # Returned as a response so FastAPI skips jsonable_encoder on large result lists
+        return FastJSONResponse(result)
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         log.error(f"Search endpoint error: {str(e)}")    
         raise HTTPException(status_code=500, detail=str(e))
         
 
+async def _ingest_upload(
+    text: str,
+    filename: str,
+    collection_name: str,
+    chunk_size: int,
+    overlap: int,
+    dedup: bool,
+    extra_payload: Optional[dict]
+    ):
+    """Chunk, dedup, embed and store one uploaded file (runs as an upload job)."""
+    # chunk text ========
+    chunks =chunk_text_by_sentences(
+        text,
+        max_chunk_size=chunk_size,
+        overlap_sentences=overlap
+    )        
+    log.info(f" Uploading '{filename}' -> {len(chunks)} chunks total")
+
+    # drop duplicates before paying for embeddings ========
+    if dedup and cfg.dedup.enabled:
+        to_embed, duplicates = await dedup_service.filter_chunks(collection_name, chunks)
+        if duplicates:
+            log.info(f" Skipping {len(duplicates)} duplicate chunks")
+    else:
+        to_embed = [(idx, chunk, None) for idx, chunk in enumerate(chunks, 1)]
+        duplicates = []
+
+    # Embed (adaptive concurrency) + store in batches ========
+    try:
+        stored, failed = await embed_and_store(
+            collection_name, filename, to_embed, extra_payload,
+            model=collection_registry.defaults(collection_name).embed_model
+        )
+    except asyncio.CancelledError:
+        # Batches upserted before the cancel stay searchable
+        projection_service.invalidate(collection_name)
+        raise
+    log.info(f" Indexed {stored}/{len(to_embed)} chunks of '{filename}'")
+
+    if stored:
+        projection_service.invalidate(collection_name)
+
+    return { 
+        "message": f"Successfully uploaded '{filename}'",
+        "filename": filename,
+        "total_chunks": len(chunks),
+        "chunks_indexed": stored,
+        "chunks_failed": failed,
+        "chunks_skipped_duplicate": len(duplicates),
+        "duplicates": [d.to_dict() for d in duplicates[:MAX_REPORTED_DUPLICATES]],
+        "collection": collection_name,
+        "chunk_size": chunk_size
+    }
+
+
 @router.post("/upload_docs")
 async def upload_docs(
+    request: Request,
     file: UploadFile = File(...),
     collection: str = Form('docs'),
     chunk_size: int = Form(500),
-    overlap: int = Form(1)
+    overlap: int = Form(1),
+    dedup: bool = Form(True),
+    metadata: Optional[str] = Form(None),
+    background: bool = Form(False)
     ):
     """
     Upload .txt / .md/ .json and index content into the Qdrant.
     Support chunking with configurate size and overlap.
+    Exact and near-duplicate chunks (within the file or already in
+    the collection) are skipped before embedding when `dedup` is on.
+    `metadata` is an optional JSON object stored with every chunk
+    (filterable as metadata.<key> in search requests).
+    Every upload runs as a job that DELETE /upload_jobs/{job_id} cancels.
+    `background` returns the job id at once (202); otherwise the call
+    waits, and the job is cancelled if the caller disconnects.
     """   
     collection_name = collection
 
-    # Check for collection exists
-    collections = [c.name for c in qdrant.get_collections().collections]
-    if collection_name not in collections:
-        raise HTTPException(status_code=404, detail=f"Collection '{collection_name}' not found")
+    # Check the collection (cached registry) before anything is chunked or embedded
+    try:
+        await collection_registry.validate_ingest(collection_name)
+    except CollectionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    collection_name = collection_registry.resolve(collection_name)
+
+    extra_payload = None
+    if metadata:
+        try:
+            extra_payload = {"metadata": json.loads(metadata)}
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"metadata is not valid JSON: {e}")
+        if not isinstance(extra_payload["metadata"], dict):
+            raise HTTPException(status_code=400, detail="metadata must be a JSON object")
     
     try:
         # Validate file type ===========
@@ -184,79 +433,124 @@ async def upload_docs(
         if not text.strip():
             raise HTTPException(status_code=400, detail="File is empty")
 
-        # chunk text ========
-        chunks =chunk_text_by_sentences(
-            text,
-            max_chunk_size=chunk_size,
-            overlap_sentences=overlap
-        )        
-        log.info(f" Uploading '{file.filename}' -> {len(chunks)} chunks total")
-
-        # Process chunks
-        stored = 0   
-        failed = 0
-
-        for idx,  chunk in enumerate(chunks, 1):
-            try:
-                embedding, _ = await _get_embedding(chunk)
-
-                # Store in Qdrant
-                point = qmodels.PointStruct(
-                id=str(uuid.uuid4()),
-                vector=embedding,
-                payload={
-                    "text": chunk,
-                    "source": file.filename,
-                    "chunk_index": idx,
-                    "collection": collection_name
-                    }
-                )
-                qdrant.upsert(
-                    collection_name=collection_name,
-                    points=[point]
-                )                
-                stored += 1
-
-                if idx % 10 == 0 or idx == len(chunks):
-                    log.info(f" Indexed {idx}/{len(chunks)} chunks")
-
-            except Exception as e:
-                log.warning(f"!!! Embedding failed for chunk {idx}: {str(e)}")
-                failed += 1
-                continue
-
-        return { 
-            "message": f"Successfully uploaded '{file.filename}'",
-            "filename": file.filename,
-            "total_chunks": len(chunks),
-            "chunks_indexed": stored,
-            "chunks_failed": failed,
-            "collection": collection_name,
-            "chunk_size": chunk_size
-        }
+        job = upload_jobs.start(
+            _ingest_upload(text, file.filename, collection_name, chunk_size, overlap, dedup, extra_payload),
+            filename=file.filename,
+            collection=collection_name
+        )
+        if background:
+            return FastJSONResponse(job.to_dict(), status_code=202)
+        return {"job_id": job.id, **await cancel_on_disconnect(request, job.task, "/api/upload_docs")}
     except HTTPException:
         raise
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except WorkCancelled:
+        raise HTTPException(status_code=409, detail=f"Upload job {job.id} was cancelled")
     except Exception as e:
         log.error(f"Uload error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/upload_jobs")
+async def list_upload_jobs():
+    """Running and recently finished upload jobs."""
+    return FastJSONResponse({"jobs": upload_jobs.list(), "disconnects": disconnect_stats})
+
+
+@router.get("/upload_jobs/{job_id}")
+async def get_upload_job(job_id: str):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found")
+    return FastJSONResponse(job.to_dict())
+
+
+@router.delete("/upload_jobs/{job_id}")
+async def cancel_upload_job(job_id: str):
+    """Stop an upload; chunks stored before the cancel are kept."""
+    job = upload_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found")
+    await asyncio.wait({job.task})
+    return FastJSONResponse(job.to_dict())
         
 
+@router.post("/upload_vectors")
+async def upload_vectors(
+    request: Request,
+    collection: Optional[str] = None,
+    batch_size: Optional[int] = Query(None, ge=1, le=10000)
+    ):
+    """
+    Bulk upsert of pre-computed embeddings, no Ollama calls.
+    Body: JSONL / NDJSON (chunked transfer is fine), one record per line:
+    {"id": ..., "vector": [...], "text": ..., "source": ..., <extra payload>}
+    """
+    collection_name = collection or cfg.qdrant.collection
+
+    try:
+        await collection_registry.arequire(collection_name)
+    except CollectionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    collection_name = collection_registry.resolve(collection_name)
+
+    try:
+        dim = get_vector_params(collection_name).size
+        result = await ingest_jsonl(
+            request.stream(),
+            collection=collection_name,
+            dim=dim,
+            batch_size=batch_size
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WriteRejected as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        log.error(f"Bulk upload error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        projection_service.invalidate(collection_name)
+        dedup_service.invalidate(collection_name)
+
+    return result
+
+
 @router.post("/search_with_llm")        
-async def search_with_llm(request: RAGRequest):
+async def search_with_llm(request: RAGRequest, http_request: Request):
     """
     Full RAG pipeline: search +LLM generation.
     This is the main endpoint for answering questions.
+    If the caller disconnects, the pipeline (and Ollama's generation) is cancelled.
     """
+    t0 = time.perf_counter()
     try:
         # Call the main RAG service
-        result = await generate_rag_answer(
+        result = await cancel_on_disconnect(http_request, generate_rag_answer(
             query=request.query,
             top_k=request.top_k,
-            collection=request.collection
-        )
-        return result
+            collection=request.collection,
+            result_mode=request.result_mode,
+            preview_chars=request.preview_chars,
+            deadline_ms=request.deadline_ms,
+            filters=request.filters,
+            retrieval=request.retrieval,
+            compress=request.compress
+        ))
+        if query_log.enabled:
+            query_log.record(entry_from_result(
+                "/api/search_with_llm", request.model_dump(mode="json"), result, (time.perf_counter() - t0) * 1000
+                ))
+        return FastJSONResponse(result)
+    except HTTPException:
+        raise
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         log.error(f"RAG endpoint error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -297,15 +591,14 @@ async def create_collection(
     """
     Create a ne Qdrant collection from web or API call.
     """
-    collections  = [c.name for c in qdrant.get_collections().collections]
-    if name in collections:
+    if await collection_registry.aget(name) is not None:
         return{
             "status": "exists",
             "message": f"Colection: '{name}' already exists."}
     
-    qdrant.create_collection(
-        collection_name=name,
-        vectors_config=qmodels.VectorParams(
+    create_indexed_collection(
+        name,
+        qmodels.VectorParams(
             size=vector_size,
             distance=qmodels.Distance.COSINE
         )
@@ -0,0 +1,73 @@
+#app/routes/chat.py
+import logging
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from app.clients import cfg
+from app.models import ChatRequest
+from app.responses import FastJSONResponse
+from app.services.resilience import CircuitOpenError
+from app.services.chat_sessions import session_store, chat_turn
+from app.services.cancellation import CLIENT_CLOSED_REQUEST, ClientDisconnected, cancel_on_disconnect
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.post("/chat")
+async def chat(request: ChatRequest, http_request: Request):
+    """
+    Multi-turn RAG chat. Omit session_id to start a conversation;
+    pass the returned session_id for follow-ups.
+    A turn abandoned by the caller is cancelled and leaves the session unchanged.
+    """
+    if request.session_id:
+        session = session_store.get(request.session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Chat session not found or expired")
+        if request.collection and request.collection != session.collection:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Session is bound to collection '{session.collection}'"
+                )
+    else:
+        session = session_store.create(request.collection or cfg.qdrant.collection)
+
+    try:
+        async with session.lock:
+            result = await cancel_on_disconnect(http_request, chat_turn(session, request.query, request.top_k))
+        return FastJSONResponse(result)
+    except HTTPException:
+        raise
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        log.error(f"Chat endpoint error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        session_store.sweep(keep=session.id)
+
+
+@router.get("/chat/status")
+async def chat_status():
+    """Session count and memory use against the budget"""
+    return session_store.snapshot()
+
+
+@router.get("/chat/{session_id}")
+async def get_session(session_id: str):
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return {**session.to_dict(), "history": session.turns}
+
+
+@router.delete("/chat/{session_id}")
+async def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return {"status": "deleted", "session_id": session_id}
@@ -1,47 +1,42 @@
-import io, os
-import numpy as np
-import matplotlib.pyplot as plt
-from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
-from sklearn.decomposition import PCA
-from app.clients import qdrant
+#app/routes/plot.py
+import logging
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
 
-router = APIRouter()
-
-@router.get("/plot")
-def plot_vectors(limit: int = 100):
-    collection_name = os.getenv("QDRANT_COLLECTION", "docs")
-
-    points, _ = qdrant.scroll(
-        collection_name=collection_name,
-        limit=limit,
-        with_vectors=True
-    )
-
-    if not points:
-        plt.figure()
-        plt.text(0.5, 0.5, "No vectors found", ha='center', va='center')
-    else:
-        # достаём все вектора
-        vectors = [p.vector for p in points if p.vector]
-        labels = [f"v{i}" for i in range(len(vectors))]
+from app.clients import cfg
+from app.services.projection_service import projection_service
 
-        # PCA → 2D
-        pca = PCA(n_components=2)
-        reduced = pca.fit_transform(vectors)
-
-        plt.figure(figsize=(7, 7))
-        for label, (x, y) in zip(labels, reduced):
-            plt.scatter(x, y, s=40)
-            plt.text(x + 0.02, y + 0.02, label, fontsize=8)
-
-        plt.title(f"PCA projection of {len(vectors)} vectors from '{collection_name}'")
-        plt.grid(True, linestyle="--", alpha=0.3)
-        plt.tight_layout()
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+router = APIRouter()
 
-    buf = io.BytesIO()
-    plt.savefig(buf, format="png", dpi=150)
-    plt.close()
-    buf.seek(0)
 
-    return StreamingResponse(buf, media_type="image/png")
+@router.get("/plot")
+async def plot_vectors(
+    collection: Optional[str] = None,
+    format: Literal["png", "json"] = "png",
+    limit: Optional[int] = Query(None, ge=1),
+    refresh: bool = False
+):
+    """
+    2D PCA projection of a whole collection.
+    `format=json` returns compact coordinates, `format=png` a scatter plot.
+    `limit` caps the number of returned/drawn points (evenly sampled).
+    """
+    collection_name = collection or cfg.qdrant.collection
+    if refresh:
+        projection_service.invalidate(collection_name)
+
+    try:
+        projection = await projection_service.get(collection_name)
+    except Exception as e:
+        log.error(f"Plot error for '{collection_name}': {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    projection = projection.sample(limit)
+    if format == "json":
+        return projection.to_dict()
+
+    png = await projection_service.render(projection)
+    return Response(content=png, media_type="image/png")
@@ -1,11 +1,14 @@
 #app/routes/rag_ui.py
-from fastapi import APIRouter, Request, Form
+from fastapi import APIRouter, Request, Form, Response
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 import httpx, os
 import json
 import logging
-from app.clients import cfg, qdrant
+from app.clients import cfg
+from app.services.collection_registry import collection_registry
+from app.responses import dumps_pretty
+from app.services.cancellation import CLIENT_CLOSED_REQUEST, ClientDisconnected, cancel_on_disconnect
 
 # ========= Logger setup =========
 log = logging.getLogger(__name__)
@@ -15,12 +18,15 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(
 templates = Jinja2Templates(directory="app/templates")
 router = APIRouter()
 
+# result.html only shows the first 200 chars of each hit
+UI_PREVIEW_CHARS = 200
+
 
 @router.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     try:
-        qdrant_collections = qdrant.get_collections()
-        collections = [c.name for c in qdrant_collections.collections]
+        # Cached registry: no Qdrant round-trip per page load
+        collections = await collection_registry.anames()
         log.info(f"🧠 Found collections: {collections}")
     except Exception:
         collections = ["docs"]      #fallback
@@ -48,19 +54,22 @@ async def ask(
     client= request.app.state.client    
     
     try:
-        response = await client.post(
+        # Closing the tab cancels this call, which cancels the RAG request behind it
+        response = await cancel_on_disconnect(request, client.post(
             url,           
             json={
                 "query": query,
                 "top_k": cfg.searchsettings.top_k,
-                "collection": collection
+                "collection": collection,
+                "result_mode": "preview",
+                "preview_chars": UI_PREVIEW_CHARS
             },
             headers={
                 "Content-Type": "application/json",
                 "Accept": "application/json"
                 },
             timeout=100,
-        )
+        ))
         log.info(f"RAG response status: {response.status_code}")
         log.info(f"RAG raw: {response.text[:300]}")
 
@@ -80,6 +89,8 @@ async def ask(
                 data = {"answer": f"⛔ JSON parse error: {e}"}
                 #data = {"answer": await response.text()}
             
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except Exception as e:
         log.error(f"❌ Request error: {e}")
         data = {"answer":f"⛔ ERROR: {e}"}
@@ -100,9 +111,7 @@ async def ask(
     timing = data.get("timing_ms", {}) if isinstance(data, dict) else {}
 
     try:
-        safe_data = json.dumps(
-            data, ensure_ascii=False, indent=2, default=str
-        )
+        safe_data = dumps_pretty(data)
     except Exception:
         safe_data = str(data)
 
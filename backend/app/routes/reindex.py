@@ -0,0 +1,79 @@
+#app/routes/reindex.py
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException
+
+from app.models import ReindexRequest
+from app.responses import FastJSONResponse
+from app.services.collection_registry import CollectionNotFound
+from app.services.reindex import reindex_service
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/reindex")
+async def reindex_status():
+    """Aliases (current / previous collection) and re-index jobs with their progress."""
+    return FastJSONResponse(reindex_service.snapshot())
+
+
+@router.post("/reindex/{alias}")
+async def start_reindex(alias: str, request: ReindexRequest):
+    """
+    Re-embed (and optionally re-chunk) the collection behind `alias` into
+    a shadow collection in the background; queries keep using the old one
+    until the alias is switched. Poll GET /reindex/jobs/{job_id}.
+    """
+    try:
+        job = await reindex_service.start(alias, **request.model_dump())
+    except CollectionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(job.to_dict(), status_code=202)
+
+
+@router.get("/reindex/jobs/{job_id}")
+async def get_reindex_job(job_id: str):
+    job = reindex_service.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Re-index job '{job_id}' not found")
+    return FastJSONResponse(job.to_dict())
+
+
+@router.delete("/reindex/jobs/{job_id}")
+async def cancel_reindex_job(job_id: str):
+    """Stop a re-index; its shadow collection is dropped, the alias is untouched."""
+    job = reindex_service.jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Re-index job '{job_id}' not found")
+    await asyncio.wait({job.task})
+    return FastJSONResponse(job.to_dict())
+
+
+@router.post("/reindex/{alias}/switch/{collection}")
+async def switch_alias(alias: str, collection: str):
+    """Point `alias` at `collection` (for jobs started with switch=false)."""
+    try:
+        return await asyncio.to_thread(reindex_service.switch, alias, collection)
+    except CollectionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/reindex/{alias}/rollback")
+async def rollback_alias(alias: str):
+    """Point `alias` back at the collection it served before the last switch."""
+    try:
+        return await asyncio.to_thread(reindex_service.rollback, alias)
+    except CollectionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
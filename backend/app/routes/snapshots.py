@@ -0,0 +1,118 @@
+#app/routes/snapshots.py
+import os
+import shutil
+import asyncio
+import logging
+from typing import Optional
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+
+from app.services.projection_service import projection_service
+from app.services.dedup import dedup_service
+from app.services.local_index import local_index
+from app.services.lexical_index import lexical_index
+from app.services.concurrency import write_gate, WriteRejected
+from app.services.collection_registry import collection_registry
+from app.services.snapshot_service import (
+    SNAPSHOT_FILES,
+    VECTORS_FILE,
+    PAYLOADS_FILE,
+    META_FILE,
+    snapshot_path,
+    export_collection,
+    import_collection,
+)
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+router = APIRouter()
+
+MEDIA_TYPES = {
+    VECTORS_FILE: "application/octet-stream",
+    PAYLOADS_FILE: "application/x-ndjson",
+    META_FILE: "application/json",
+}
+
+
+@router.post("/snapshots/{collection}/export")
+async def export_snapshot(collection: str):
+    """Export vectors (.npy) + payloads (.jsonl) of a collection to the snapshot dir."""
+    try:
+        return await asyncio.to_thread(export_collection, collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        log.error(f"Snapshot export error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/snapshots/{collection}/{filename}")
+async def download_snapshot_file(collection: str, filename: str):
+    """Stream one snapshot file (vectors.npy, payloads.jsonl or meta.json)."""
+    if filename not in SNAPSHOT_FILES:
+        raise HTTPException(status_code=404, detail=f"Unknown snapshot file '{filename}'")
+    try:
+        path = os.path.join(snapshot_path(collection), filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"No snapshot of '{collection}'")
+    return FileResponse(path, media_type=MEDIA_TYPES[filename], filename=filename)
+
+
+@router.post("/snapshots/{collection}/import")
+async def import_snapshot(
+    collection: str,
+    target: Optional[str] = Form(None),
+    recreate: bool = Form(False),
+    vectors: Optional[UploadFile] = File(None),
+    payloads: Optional[UploadFile] = File(None),
+    meta: Optional[UploadFile] = File(None)
+):
+    """
+    Restore a snapshot into `target` (default: `collection`).
+    Uploaded files replace the stored snapshot of `collection` first;
+    without uploads the snapshot already on disk is used.
+    """
+    try:
+        src_dir = snapshot_path(collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    uploads = {VECTORS_FILE: vectors, PAYLOADS_FILE: payloads, META_FILE: meta}
+    given = {name: f for name, f in uploads.items() if f is not None}
+    if given and len(given) != len(uploads):
+        raise HTTPException(
+            status_code=400,
+            detail="Upload all of vectors, payloads and meta, or none of them"
+        )
+
+    try:
+        if given:
+            os.makedirs(src_dir, exist_ok=True)
+            for name, upload in given.items():
+                with open(os.path.join(src_dir, name), "wb") as out:
+                    await asyncio.to_thread(shutil.copyfileobj, upload.file, out, 1024 * 1024)
+        elif not os.path.isfile(os.path.join(src_dir, META_FILE)):
+            raise HTTPException(status_code=404, detail=f"No snapshot of '{collection}'")
+
+        # Held for the whole import, like any other upsert: a re-index
+        # switch waits for it, a retired collection rejects it
+        target = collection_registry.resolve(target or collection)
+        async with write_gate.writing(target):
+            result = await asyncio.to_thread(
+                import_collection, src_dir, target, None, recreate
+            )
+        projection_service.invalidate(result["collection"])
+        dedup_service.invalidate(result["collection"])
+        local_index.invalidate(result["collection"])
+        lexical_index.invalidate(result["collection"])
+        return result
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WriteRejected as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        log.error(f"Snapshot import error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
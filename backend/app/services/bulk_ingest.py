@@ -0,0 +1,159 @@
+#app/services/bulk_ingest.py
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg, qdrant
+from app.services.concurrency import write_gate
+from app.services.local_index import local_index
+from app.services.lexical_index import lexical_index
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+# Keys consumed by the point itself, everything else becomes payload
+RESERVED_KEYS = {"id", "vector"}
+MAX_REPORTED_ERRORS = 20
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = None) -> AsyncIterator[bytes]:
+    """Split a byte stream (e.g. chunked request body) into lines."""
+    max_line_bytes = max_line_bytes or cfg.ingest.bulk_max_line_bytes
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"JSONL line longer than {max_line_bytes} bytes")
+    if buffer:
+        yield buffer
+
+
+def point_id(value: Any):
+    """Qdrant accepts unsigned integers and UUIDs; anything else fails the whole batch."""
+    if value is None:
+        return str(uuid.uuid4())
+    if isinstance(value, int) and not isinstance(value, bool):
+        if value < 0:
+            raise ValueError(f"id must be an unsigned integer or a UUID, got {value}")
+        return value
+    if isinstance(value, str):
+        try:
+            return str(uuid.UUID(value))
+        except ValueError:
+            pass
+    raise ValueError(f"id must be an unsigned integer or a UUID, got {value!r}")
+
+
+def parse_record(line: bytes, dim: int) -> qmodels.PointStruct:
+    """Validate one `{id, vector, text, source, ...}` record."""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    pid = point_id(record.get("id"))
+
+    vector = np.asarray(record.get("vector"), dtype=np.float32)
+    if vector.ndim != 1 or vector.shape[0] != dim:
+        raise ValueError(f"vector must have {dim} dims, got shape {vector.shape}")
+    if not np.isfinite(vector).all():
+        raise ValueError("vector contains NaN/inf")
+
+    payload = {k: v for k, v in record.items() if k not in RESERVED_KEYS}
+    payload.setdefault("uploaded_at", time.time())
+    return qmodels.PointStruct(
+        id=pid,
+        vector=vector.tolist(),
+        payload=payload,
+    )
+
+
+async def ingest_jsonl(
+        chunks: AsyncIterator[bytes],
+        collection: str,
+        dim: int,
+        batch_size: int = None
+        ) -> Dict[str, Any]:
+    """
+    Upsert pre-computed vectors from a JSONL byte stream.
+
+    At most one batch is upserted while the next one is being parsed:
+    the stream is not read further until the previous upsert finished,
+    which pushes back on the client instead of buffering the body.
+    """
+    batch_size = batch_size or cfg.ingest.bulk_batch_size
+    t0 = time.perf_counter()
+    stored = 0
+    queued = 0
+    rejected = 0
+    errors: List[str] = []
+    batch: List[qmodels.PointStruct] = []
+    in_flight: Optional[asyncio.Task] = None
+
+    async def _wait_in_flight():
+        nonlocal stored, in_flight
+        if in_flight is not None:
+            stored += await in_flight
+            in_flight = None
+
+    def _upsert(points: List[qmodels.PointStruct]) -> int:
+        qdrant.upsert(collection_name=collection, points=points, wait=True)
+        local_index.add_points(collection, points)
+        lexical_index.add_points(collection, points)
+        return len(points)
+
+    async def _store(points: List[qmodels.PointStruct]) -> int:
+        async with write_gate.writing(collection):
+            stored_at = time.time()
+            for point in points:
+                point.payload["stored_at"] = stored_at
+            return await asyncio.to_thread(_upsert, points)
+
+    line_no = 0
+    try:
+        async for line in iter_lines(chunks):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                batch.append(parse_record(line, dim))
+            except (ValueError, TypeError) as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"line {line_no}: {e}")
+                continue
+
+            if len(batch) >= batch_size:
+                await _wait_in_flight()
+                in_flight = asyncio.create_task(_store(batch))
+                queued += len(batch)
+                batch = []
+                log.info(f" Bulk upsert into '{collection}': {queued} points queued")
+
+        await _wait_in_flight()
+        if batch:
+            stored += await _store(batch)
+    finally:
+        if in_flight is not None and not in_flight.done():
+            in_flight.cancel()
+
+    elapsed = time.perf_counter() - t0
+    log.info(
+        f"📥 Bulk ingest into '{collection}': {stored} stored, "
+        f"{rejected} rejected in {elapsed:.2f} s"
+    )
+    return {
+        "collection": collection,
+        "points_indexed": stored,
+        "points_rejected": rejected,
+        "errors": errors,
+        "vector_dim": dim,
+        "elapsed_s": round(elapsed, 2),
+    }
@@ -0,0 +1,348 @@
+#app/services/cache.py
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import orjson
+
+from app.clients import cfg
+
+try:
+    import redis
+except ImportError:  # optional: only needed for CACHE_BACKEND=redis
+    redis = None
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+
+#======== backends: bytes in, bytes out ======
+class CacheBackend:
+    """
+    Key/value store for the caches below. Values are opaque bytes;
+    ttl_s <= 0 means no expiry. Backends never raise on get/set:
+    a broken cache only costs a miss.
+    """
+    name = "base"
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl_s: float = 0):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU (per worker)."""
+    name = "memory"
+
+    def __init__(self, max_items: int = None):
+        self.max_items = cfg.cache.max_items if max_items is None else max_items
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()     # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at and expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl_s: float = 0):
+        with self._lock:
+            self._items[key] = (value, time.time() + ttl_s if ttl_s > 0 else 0)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": self.name, "items": len(self._items), "max_items": self.max_items}
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key        TEXT PRIMARY KEY,
+    value      BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    written_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_written_at ON cache (written_at);
+"""
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    On-disk store shared by all workers on the host (WAL mode: readers
+    don't block the writer). Bounded by max_items, oldest writes first.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str = None, max_items: int = None):
+        self.path = cfg.cache.sqlite_path if path is None else path
+        self.max_items = cfg.cache.max_items if max_items is None else max_items
+        self._conn = sqlite3.connect(self.path, timeout=1.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SQLITE_SCHEMA)
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            log.warning(f"!!! Cache read failed: {str(e)}")
+            return None
+        if row is None or (row[1] and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl_s: float = 0):
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at, written_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now + ttl_s if ttl_s > 0 else 0, now),
+                )
+                self._writes += 1
+                if self._writes % 256 == 0:
+                    self._trim(now)
+        except sqlite3.Error as e:
+            log.warning(f"!!! Cache write failed: {str(e)}")
+
+    def _trim(self, now: float):
+        self._conn.execute("DELETE FROM cache WHERE expires_at > 0 AND expires_at < ?", (now,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_items
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY written_at LIMIT ?)", (excess,)
+            )
+
+    def delete(self, key: str):
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            log.warning(f"!!! Cache delete failed: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"backend": self.name, "path": self.path, "items": items, "max_items": self.max_items}
+
+
+class RedisBackend(CacheBackend):
+    """
+    Network store shared by all workers and hosts. Any client with
+    Redis' get/set(ex=)/delete/scan_iter works (tests use FakeRedis).
+    Short socket timeouts: a slow cache must not slow the request down.
+    """
+    name = "redis"
+
+    def __init__(self, url: str = None, client=None, prefix: str = None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package")
+            client = redis.Redis.from_url(
+                url or cfg.cache.redis_url,
+                socket_timeout=cfg.cache.redis_timeout_s,
+                socket_connect_timeout=cfg.cache.redis_timeout_s,
+            )
+        self._client = client
+        self.prefix = cfg.cache.redis_prefix if prefix is None else prefix
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._client.get(self.prefix + key)
+        except Exception as e:
+            self.errors += 1
+            log.warning(f"!!! Redis cache read failed: {str(e)}")
+            return None
+
+    def set(self, key: str, value: bytes, ttl_s: float = 0):
+        try:
+            self._client.set(self.prefix + key, value, ex=max(1, int(ttl_s)) if ttl_s > 0 else None)
+        except Exception as e:
+            self.errors += 1
+            log.warning(f"!!! Redis cache write failed: {str(e)}")
+
+    def delete(self, key: str):
+        try:
+            self._client.delete(self.prefix + key)
+        except Exception as e:
+            self.errors += 1
+            log.warning(f"!!! Redis cache delete failed: {str(e)}")
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": self.name, "prefix": self.prefix, "errors": self.errors}
+
+
+class FakeRedis:
+    """Minimal in-process stand-in for redis.Redis (get/set/delete/scan_iter), used in tests."""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None or (item[1] and item[1] < time.time()):
+            return None
+        return item[0]
+
+    def set(self, key: str, value: bytes, ex: int = None):
+        self._data[key] = (bytes(value), time.time() + ex if ex else 0)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(k, None) is not None for k in keys)
+
+    def scan_iter(self, match: str = "*"):
+        prefix = match.rstrip("*")
+        return (k for k in list(self._data) if k.startswith(prefix))
+
+
+def make_backend(kind: str = None) -> CacheBackend:
+    kind = (kind or cfg.cache.backend).lower()
+    if kind == "sqlite":
+        return SQLiteBackend()
+    if kind == "redis":
+        return RedisBackend()
+    return MemoryBackend()
+
+
+#======== typed namespaces ======
+def encode_vector(vector: Sequence[float]) -> bytes:
+    """float32 bytes: 3 KB for 768 dims instead of ~15 KB of JSON."""
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float32)
+
+
+class Cache:
+    """One namespace (embeddings, answers, metadata) over the shared backend."""
+
+    def __init__(self, namespace: str, ttl_s: float = 0, backend: CacheBackend = None):
+        self.namespace = namespace
+        self.ttl_s = ttl_s
+        self._backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or cache_backend
+
+    def key(self, *parts: Any) -> str:
+        raw = "\x00".join(str(p) for p in parts)
+        return f"{self.namespace}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    def _get(self, key: str) -> Optional[bytes]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def get_vector(self, key: str) -> Optional[np.ndarray]:
+        value = self._get(key)
+        return None if value is None else decode_vector(value)
+
+    def set_vector(self, key: str, vector: Sequence[float]):
+        self.backend.set(key, encode_vector(vector), self.ttl_s)
+
+    def get_json(self, key: str) -> Optional[Any]:
+        value = self._get(key)
+        return None if value is None else orjson.loads(value)
+
+    def set_json(self, key: str, value: Any):
+        self.backend.set(key, orjson.dumps(value, default=str, option=orjson.OPT_SERIALIZE_NUMPY), self.ttl_s)
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    #======== async callers: disk/network backends go to a worker thread ======
+    async def _offload(self, fn, *args):
+        if isinstance(self.backend, MemoryBackend):
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def aget_vector(self, key: str) -> Optional[np.ndarray]:
+        return await self._offload(self.get_vector, key)
+
+    async def aset_vector(self, key: str, vector: Sequence[float]):
+        await self._offload(self.set_vector, key, vector)
+
+    async def aget_json(self, key: str) -> Optional[Any]:
+        return await self._offload(self.get_json, key)
+
+    async def aset_json(self, key: str, value: Any):
+        await self._offload(self.set_json, key, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+            "ttl_s": self.ttl_s,
+        }
+
+
+cache_backend: CacheBackend = make_backend()
+embedding_cache = Cache("emb", cfg.cache.embedding_ttl_s)
+answer_cache = Cache("answer", cfg.cache.answer_ttl_s)
+metadata_cache = Cache("meta", cfg.cache.metadata_ttl_s)
+
+
+def cache_status() -> Dict[str, Any]:
+    return {
+        **cache_backend.snapshot(),
+        "embeddings": embedding_cache.snapshot(),
+        "answers": answer_cache.snapshot(),
+        "metadata": metadata_cache.snapshot(),
+    }
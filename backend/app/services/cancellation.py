@@ -0,0 +1,140 @@
+#app/services/cancellation.py
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, List, Optional
+
+from starlette.requests import Request
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+# nginx's "client closed request"; nobody reads it, but it shows up in access logs
+CLIENT_CLOSED_REQUEST = 499
+# Finished jobs kept for GET /upload_jobs
+MAX_FINISHED_JOBS = 100
+
+disconnect_stats: Dict[str, int] = {}
+
+
+class WorkCancelled(Exception):
+    """The awaited work was cancelled by someone else (e.g. DELETE /upload_jobs/{id})."""
+
+
+class ClientDisconnected(WorkCancelled):
+    """The caller went away before the response was ready."""
+
+
+async def _wait_for_disconnect(request: Request):
+    # The body is already read, so the next ASGI message is the disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable, name: str = None) -> Any:
+    """
+    Await `work`, cancelling it if the client disconnects first.
+    Cancellation reaches the in-flight httpx call to Ollama, which closes
+    the connection, so Ollama stops generating and frees its slot.
+    Raises ClientDisconnected, or WorkCancelled if `work` was cancelled elsewhere.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if task.done():
+        if task.cancelled():
+            raise WorkCancelled(name or request.url.path)
+        return task.result()
+
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+    name = name or request.url.path
+    disconnect_stats[name] = disconnect_stats.get(name, 0) + 1
+    log.info(f"🔌 Client disconnected from {name}, upstream work cancelled")
+    raise ClientDisconnected(name)
+
+
+#======== upload jobs ======
+@dataclass
+class Job:
+    id: str
+    kind: str
+    meta: Dict[str, Any]
+    task: asyncio.Task = field(repr=False)
+    status: str = "running"         # running | done | failed | cancelled
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            **self.meta,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobRegistry:
+    """Running and recently finished background jobs, cancellable by id."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def start(self, work: Awaitable, **meta) -> Job:
+        job_id = uuid.uuid4().hex
+        job = Job(id=job_id, kind=self.kind, meta=meta, task=asyncio.ensure_future(work))
+        job.task.add_done_callback(lambda _: self._finish(job))
+        self._jobs[job_id] = job
+        return job
+
+    def _finish(self, job: Job):
+        job.finished_at = time.time()
+        if job.task.cancelled():
+            job.status = "cancelled"
+        elif job.task.exception() is not None:
+            job.status = "failed"
+            job.error = str(getattr(job.task.exception(), "detail", None) or job.task.exception())
+        else:
+            job.status = "done"
+            job.result = job.task.result()
+        finished = [jid for jid, j in self._jobs.items() if j.finished_at is not None]
+        for jid in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[jid]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None and not job.task.done():
+            job.task.cancel()
+            log.info(f"🛑 {self.kind} job {job_id} cancelled")
+        return job
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [j.to_dict() for j in reversed(self._jobs.values())]
+
+
+upload_jobs = JobRegistry("upload")
@@ -0,0 +1,272 @@
+#app/services/chat_sessions.py
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.clients import cfg, qdrant
+from app.services.rag_services import (
+    _get_query_embedding,
+    _ollama_generate,
+    build_prompt,
+    select_context,
+    size_num_ctx,
+    hit_text,
+)
+from app.services.local_index import local_index
+from app.services.collection_registry import collection_registry
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio, only used to decide when the context is full
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class ChatSession:
+    """
+    Retrieved chunks and Ollama's token context of one conversation.
+    Follow-ups send only the chunks the model hasn't seen yet plus the
+    question; everything earlier is already in `ollama_context`.
+    """
+    id: str
+    collection: str
+    chunks: Dict[str, str] = field(default_factory=dict)       # point id -> text
+    ollama_context: Optional[np.ndarray] = None                 # int32 tokens
+    turns: List[Dict[str, str]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    @property
+    def context_tokens(self) -> int:
+        return 0 if self.ollama_context is None else len(self.ollama_context)
+
+    def size_bytes(self) -> int:
+        text = sum(len(t) for t in self.chunks.values())
+        text += sum(len(t["query"]) + len(t["answer"]) for t in self.turns)
+        tokens = 0 if self.ollama_context is None else self.ollama_context.nbytes
+        return text + tokens
+
+    def reset(self):
+        self.chunks.clear()
+        self.ollama_context = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.id,
+            "collection": self.collection,
+            "turns": len(self.turns),
+            "chunks": len(self.chunks),
+            "context_tokens": self.context_tokens,
+            "size_kb": round(self.size_bytes() / 1024, 1),
+            "created_at": self.created_at,
+        }
+
+
+class SessionStore:
+    """In-memory sessions, expired by idle TTL and evicted LRU over the memory budget."""
+
+    def __init__(self, ttl_s: float = None, max_memory_mb: float = None):
+        self.ttl_s = cfg.chat.session_ttl_s if ttl_s is None else ttl_s
+        self.max_bytes = int((cfg.chat.max_memory_mb if max_memory_mb is None else max_memory_mb) * 1024 * 1024)
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, collection: str) -> ChatSession:
+        session = ChatSession(id=uuid.uuid4().hex, collection=collection)
+        self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if time.monotonic() - session.last_used > self.ttl_s:
+            self._sessions.pop(session_id, None)
+            self.expired += 1
+            return None
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def memory_bytes(self) -> int:
+        return sum(s.size_bytes() for s in self._sessions.values())
+
+    def sweep(self, keep: str = None):
+        """Drop idle sessions, then least recently used ones until under budget."""
+        now = time.monotonic()
+        for sid in [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl_s]:
+            del self._sessions[sid]
+            self.expired += 1
+
+        total = self.memory_bytes()
+        for sid in list(self._sessions):
+            if total <= self.max_bytes:
+                break
+            if sid == keep:
+                continue
+            total -= self._sessions.pop(sid).size_bytes()
+            self.evicted += 1
+            log.info(f"🧹 Evicted chat session {sid} (memory budget)")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "memory_mb": round(self.memory_bytes() / 1024 / 1024, 2),
+            "max_memory_mb": round(self.max_bytes / 1024 / 1024, 2),
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+def build_followup_prompt(context: str, query: str) -> str:
+    """Continuation of a conversation whose earlier context Ollama already holds."""
+    extra = f"\n        Additional context:\n        {context}\n" if context else ""
+    return f"""{extra}
+        Follow-up question: {query}
+
+        Answer concisely and factually, using ONLY the context given so far (in the same language as the question):
+        """
+
+
+async def chat_turn(session: ChatSession, query: str, top_k: int = None) -> Dict[str, Any]:
+    """
+    One conversation turn:
+    1. Embed + search (cheap compared to generation)
+    2. Keep only hits the session hasn't sent yet
+    3. Reuse Ollama's context while it fits max_context_tokens,
+       otherwise start over with a full prompt
+    """
+    if not query:
+        raise ValueError("Query cannot be empty")
+    defaults = collection_registry.defaults(session.collection)
+    top_k = top_k or defaults.top_k
+    # Resolved every turn: a re-index switch applies to open sessions too
+    collection = collection_registry.resolve(session.collection)
+    total_start = time.perf_counter()
+
+    query_vec, embedding_ms = await _get_query_embedding(query, model=defaults.embed_model)
+
+    t0 = time.perf_counter()
+    hits = await local_index.asearch(collection, query_vec, top_k, defaults.score_threshold)
+    if hits is None:
+        hits = await asyncio.to_thread(
+            qdrant.search,
+            collection_name=collection,
+            query_vector=query_vec,
+            limit=top_k,
+            with_payload=True,
+            score_threshold=defaults.score_threshold,
+        )
+    search_ms = (time.perf_counter() - t0) * 1000
+    hits = [h for h in hits if (h.payload or {}).get("text")]
+
+    if not hits and not session.chunks:
+        # Nothing to ground an answer on, same as generate_rag_answer
+        log.warning("!!! No relevant documents found.")
+        return {
+            "session_id": session.id,
+            "query": query,
+            "answer": "No relevant documents found.",
+            "turn": len(session.turns),
+            "context_reused": False,
+            "new_chunks": 0,
+            "reused_chunks": 0,
+            "prompt_chars": 0,
+            "context_tokens": session.context_tokens,
+            "results": [],
+            "collection": session.collection,
+            "timing": {
+                "embedding": round(embedding_ms, 1),
+                "search": round(search_ms, 1),
+                "llm": 0.0,
+                "total": round(time.perf_counter() - total_start, 2),
+            },
+        }
+
+    new_hits = [h for h in hits if str(h.id) not in session.chunks]
+    new_parts = select_context([h.payload["text"] for h in new_hits])
+    new_tokens = (sum(len(t) for t in new_parts) + len(query)) // CHARS_PER_TOKEN
+
+    reuse = (
+        session.ollama_context is not None
+        and session.context_tokens + new_tokens <= cfg.chat.max_context_tokens
+    )
+    if reuse:
+        sent = new_hits[:len(new_parts)]
+        prompt = build_followup_prompt("\n\n".join(new_parts), query)
+        context = session.ollama_context.tolist()
+    else:
+        if session.ollama_context is not None:
+            log.info(f"♻️ Chat session {session.id}: context full, starting over")
+        parts = select_context([h.payload["text"] for h in hits])
+        sent = hits[:len(parts)]
+        prompt = build_prompt("\n\n".join(parts), query)
+        context = None
+
+    # The window must hold the reused context too, or Ollama silently truncates it
+    context_chars = (len(context) if context else 0) * CHARS_PER_TOKEN
+    options = {
+        "num_predict": cfg.budget.max_num_predict,
+        "num_ctx": size_num_ctx(context_chars + len(prompt), cfg.budget.max_num_predict),
+    }
+    body, llm_s = await _ollama_generate(prompt, context, options=options)
+    answer = body.get("response", "").strip() or "No answer generated."
+
+    # Session state changes only once generation succeeded: a turn cancelled
+    # mid-generation (client gone) leaves the session as it was
+    if not reuse:
+        session.reset()
+    for h in sent:
+        session.chunks[str(h.id)] = h.payload["text"]
+    returned_context = body.get("context")
+    session.ollama_context = np.asarray(returned_context, dtype=np.int32) if returned_context else None
+    session.turns.append({"query": query, "answer": answer})
+
+    total_time = time.perf_counter() - total_start
+    log.info(
+        f"💬 Chat turn {len(session.turns)} of {session.id}: "
+        f"{len(sent)} new chunks, context {'reused' if reuse else 'fresh'}, {total_time:.2f} s"
+    )
+    return {
+        "session_id": session.id,
+        "query": query,
+        "answer": answer,
+        "turn": len(session.turns),
+        "context_reused": reuse,
+        "new_chunks": len(sent),
+        "reused_chunks": len(hits) - len(new_hits),
+        "prompt_chars": len(prompt),
+        "context_tokens": session.context_tokens,
+        "results": [
+            {
+                "id": h.id,
+                "rank": i + 1,
+                "score": round(h.score, 3),
+                "source": h.payload.get("source", "unknown"),
+                **hit_text(h.payload, "preview"),
+            }
+            for i, h in enumerate(hits)
+        ],
+        "collection": session.collection,
+        "timing": {
+            "embedding": round(embedding_ms, 1),
+            "search": round(search_ms, 1),
+            "llm": round(llm_s, 2),
+            "total": round(total_time, 2),
+        },
+    }
+
+
+session_store = SessionStore()
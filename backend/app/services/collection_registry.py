@@ -0,0 +1,347 @@
+#app/services/collection_registry.py
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg, qdrant
+from app.services.cache import metadata_cache
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+# Unknown names remembered for REGISTRY_RECHECK; bounded against junk names
+MAX_REMEMBERED_MISSES = 1000
+
+
+class CollectionNotFound(LookupError):
+    """Qdrant has no collection of that name."""
+
+
+@dataclass
+class CollectionDefaults:
+    """Per-collection query defaults; None falls back to the global config."""
+    top_k: Optional[int] = None
+    score_threshold: Optional[float] = None
+    embed_model: Optional[str] = None
+
+
+@dataclass
+class CollectionInfo:
+    name: str
+    vector_size: Optional[int]          # None for named-vector collections
+    distance: Optional[str]
+    points_count: Optional[int]         # as of refreshed_at
+    status: Optional[str] = None
+    refreshed_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _describe(name: str) -> CollectionInfo:
+    info = qdrant.get_collection(collection_name=name)
+    params = info.config.params.vectors
+    single = isinstance(params, qmodels.VectorParams)
+    return CollectionInfo(
+        name=name,
+        vector_size=params.size if single else None,
+        distance=getattr(params.distance, "value", params.distance) if single else None,
+        points_count=info.points_count,
+        status=getattr(info.status, "value", info.status),
+    )
+
+
+class CollectionRegistry:
+    """
+    In-process view of the Qdrant collections, refreshed in the background
+    (REGISTRY_REFRESH_INTERVAL) and on create/delete. Existence checks,
+    vector sizes and per-collection defaults are answered without a
+    Qdrant round-trip; only unknown names go back to Qdrant.
+    Aliases (blue/green re-indexing) resolve to their collection.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, CollectionInfo] = {}
+        self._aliases: Dict[str, str] = {}            # alias -> collection
+        self._misses: Dict[str, float] = {}          # name -> last time Qdrant didn't have it
+        self._overrides: Optional[Dict[str, Dict[str, Any]]] = None
+        self._embed_dims: Dict[str, int] = {}         # embedding model -> vector size it returns
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshed_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        """A full listing succeeded at least once, so missing names are really missing."""
+        return self.refreshed_at is not None
+
+    def _load_aliases(self) -> Dict[str, str]:
+        try:
+            response = qdrant.get_aliases()
+        except AttributeError:      # LocalQdrant: no aliases
+            return {}
+        return {a.alias_name: a.collection_name for a in response.aliases}
+
+    def refresh(self) -> Dict[str, CollectionInfo]:
+        """Re-read every collection and alias from Qdrant (blocking)."""
+        names = [c.name for c in qdrant.get_collections().collections]
+        aliases = self._load_aliases()
+        entries: Dict[str, CollectionInfo] = {}
+        for name in names:
+            try:
+                entries[name] = _describe(name)
+            except Exception as e:
+                log.warning(f"!!! Collection '{name}' not described: {str(e)}")
+                entries[name] = self._entries.get(name) or CollectionInfo(name, None, None, None)
+        with self._lock:
+            self._entries = entries
+            self._aliases = aliases
+            self._misses.clear()
+            # Another worker may have re-indexed: re-read its defaults too
+            self._overrides = None
+            self.refreshed_at = time.time()
+        return entries
+
+    def get(self, name: str, reload: bool = True) -> Optional[CollectionInfo]:
+        """
+        Cached info of a collection, or None if Qdrant doesn't have it.
+        An unknown name is looked up in Qdrant (another worker may have
+        created it) at most every REGISTRY_RECHECK s; reload=False never
+        calls Qdrant. Aliases return their collection's info.
+        """
+        info = self._entries.get(self.resolve(name))
+        if info is not None or not reload:
+            return info
+        now = time.time()
+        if now - self._misses.get(name, 0) < cfg.registry.recheck_s:
+            return None
+        names = {c.name for c in qdrant.get_collections().collections}
+        aliases = self._load_aliases()
+        with self._lock:
+            self._aliases = aliases
+        collection = aliases.get(name, name)
+        if collection not in names:
+            with self._lock:
+                if len(self._misses) >= MAX_REMEMBERED_MISSES:
+                    self._misses.clear()
+                self._misses[name] = now
+            return None
+        info = _describe(collection)
+        with self._lock:
+            self._entries[collection] = info
+            self._misses.pop(name, None)
+        return info
+
+    def require(self, name: str) -> CollectionInfo:
+        info = self.get(name)
+        if info is None:
+            raise CollectionNotFound(f"Collection '{name}' not found")
+        return info
+
+    def missing(self, name: str) -> bool:
+        """True only when Qdrant is known not to have `name`; never guesses before the first refresh."""
+        return self.loaded and self.get(name) is None
+
+    def names(self) -> List[str]:
+        """Collections and aliases, as a user would name them."""
+        if not self.loaded:
+            self.refresh()
+        return sorted({*self._entries, *self._aliases})
+
+    #======== async callers: Qdrant lookups go to a worker thread ======
+    async def aget(self, name: str) -> Optional[CollectionInfo]:
+        info = self.get(name, reload=False)
+        if info is not None:
+            return info
+        return await asyncio.to_thread(self.get, name)
+
+    async def arequire(self, name: str) -> CollectionInfo:
+        info = await self.aget(name)
+        if info is None:
+            raise CollectionNotFound(f"Collection '{name}' not found")
+        return info
+
+    async def amissing(self, name: str) -> bool:
+        return self.loaded and await self.aget(name) is None
+
+    async def anames(self) -> List[str]:
+        if not self.loaded:
+            await asyncio.to_thread(self.refresh)
+        return self.names()
+
+    def resolve(self, name: str) -> str:
+        """Collection behind an alias (the name itself otherwise); no Qdrant call."""
+        return self._aliases.get(name, name)
+
+    def aliases(self) -> Dict[str, str]:
+        return dict(self._aliases)
+
+    def set_alias(self, alias: str, collection: Optional[str]):
+        """The alias was just switched here; other workers see it on their next refresh."""
+        with self._lock:
+            if collection is None:
+                self._aliases.pop(alias, None)
+            else:
+                self._aliases[alias] = collection
+                self._entries.pop(alias, None)
+
+    def register(self, name: str, vectors_config: qmodels.VectorParams):
+        """A collection was just created here: known at once, no refresh needed."""
+        with self._lock:
+            self._entries[name] = CollectionInfo(
+                name=name,
+                vector_size=vectors_config.size,
+                distance=getattr(vectors_config.distance, "value", vectors_config.distance),
+                points_count=0,
+            )
+            self._misses.pop(name, None)
+        metadata_cache.delete(metadata_cache.key("vectors", name))
+
+    def invalidate(self, name: str = None):
+        """Forget one collection (deleted / recreated), or everything."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                self._aliases.clear()
+                self._misses.clear()
+                self._overrides = None
+                self._embed_dims.clear()
+                self.refreshed_at = None
+            else:
+                self._entries.pop(name, None)
+                self._misses.pop(name, None)
+        if name is not None:
+            metadata_cache.delete(metadata_cache.key("vectors", name))
+
+    #======== per-collection defaults ======
+    def _load_overrides(self) -> Dict[str, Dict[str, Any]]:
+        if self._overrides is None:
+            try:
+                with open(cfg.registry.defaults_path, encoding="utf-8") as f:
+                    self._overrides = json.load(f)
+            except FileNotFoundError:
+                self._overrides = {}
+            except (OSError, ValueError) as e:
+                log.warning(f"!!! Collection defaults not loaded: {str(e)}")
+                self._overrides = {}
+        return self._overrides
+
+    def _values(self, name: str) -> Dict[str, Any]:
+        return {**cfg.registry.defaults.get(name, {}), **self._load_overrides().get(name, {})}
+
+    def defaults(self, name: str) -> CollectionDefaults:
+        """
+        COLLECTION_DEFAULTS, then runtime overrides, then the global settings.
+        For an alias, its collection's values win: the embed_model belongs
+        to the vectors, not to the name users query.
+        """
+        values = self._values(name)
+        if self.resolve(name) != name:
+            values.update(self._values(self.resolve(name)))
+        return CollectionDefaults(
+            top_k=values.get("top_k") or cfg.searchsettings.top_k,
+            score_threshold=cfg.qdrant.score_threshold if values.get("score_threshold") is None else values["score_threshold"],
+            embed_model=values.get("embed_model") or cfg.ollama.embed_model,
+        )
+
+    def set_defaults(self, name: str, **values) -> CollectionDefaults:
+        """Persist overrides for a collection (None removes one)."""
+        unknown = set(values) - set(CollectionDefaults.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown collection defaults: {sorted(unknown)}")
+        with self._lock:
+            overrides = dict(self._load_overrides())
+            current = {**overrides.get(name, {}), **values}
+            current = {k: v for k, v in current.items() if v is not None}
+            if current:
+                overrides[name] = current
+            else:
+                overrides.pop(name, None)
+            path = cfg.registry.defaults_path
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(overrides, f, indent=2)
+            os.replace(tmp, path)
+            self._overrides = overrides
+        return self.defaults(name)
+
+    #======== validation before embedding ======
+    def record_embed_dim(self, model: str, dim: int):
+        """Size of the vectors a model returns, learned from real embedding calls."""
+        self._embed_dims[model] = dim
+
+    async def probe_embed_dim(self, model: str) -> Optional[int]:
+        """Embed a probe text once to learn a model's vector size (None if Ollama fails)."""
+        from app.services.rag_services import _get_embedding
+
+        try:
+            vector, _ = await _get_embedding("dimension probe", model=model)
+        except Exception as e:
+            log.warning(f"!!! Vector size of '{model}' not probed: {getattr(e, 'detail', None) or str(e)}")
+            return None
+        self.record_embed_dim(model, len(vector))
+        return len(vector)
+
+    async def validate_ingest(self, name: str) -> CollectionInfo:
+        """
+        The collection exists and accepts this collection's embedding model's vectors.
+        Raises CollectionNotFound or ValueError, before anything is embedded.
+        A model not used yet in this process is probed once.
+        """
+        info = await self.arequire(name)
+        model = self.defaults(name).embed_model
+        dim = self._embed_dims.get(model)
+        if dim is None and info.vector_size is not None:
+            dim = await self.probe_embed_dim(model)
+        if info.vector_size is not None and dim is not None and dim != info.vector_size:
+            raise ValueError(
+                f"Collection '{name}' stores {info.vector_size}-dim vectors, "
+                f"but '{model}' returns {dim}-dim embeddings"
+            )
+        return info
+
+    #======== background refresh ======
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                log.warning(f"!!! Collection registry refresh failed: {str(e)}")
+            await asyncio.sleep(cfg.registry.refresh_interval_s)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "refreshed_at": self.refreshed_at,
+            "refresh_interval_s": cfg.registry.refresh_interval_s,
+            "collections": {
+                name: {**info.to_dict(), "defaults": asdict(self.defaults(name))}
+                for name, info in sorted(self._entries.items())
+            },
+            "aliases": dict(self._aliases),
+            "embedding_dims": dict(self._embed_dims),
+        }
+
+
+collection_registry = CollectionRegistry()
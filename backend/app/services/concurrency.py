@@ -0,0 +1,330 @@
+#app/services/concurrency.py
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.clients import cfg
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit driven by observed latency and errors.
+
+    - success with latency <= baseline * tolerance: limit += 1/limit
+      (about +1 per "round" of `limit` calls)
+    - error, or latency above that: limit *= backoff, at most once per
+      observed latency so one slow burst doesn't collapse the limit
+    The baseline is the minimum latency over the last `window` calls,
+    i.e. what the upstream does when it isn't queueing.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            min_limit: int,
+            max_limit: int,
+            initial: Optional[int] = None,
+            tolerance: float = 2.0,
+            backoff: float = 0.7,
+            window: int = 50
+            ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial or self.min_limit, self.min_limit), self.max_limit))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.latency_ms = 0.0
+        self.successes = 0
+        self.errors = 0
+        self._samples = deque(maxlen=window)
+        self._last_decrease = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop = None
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond, self._loop = asyncio.Condition(), loop
+        return self._cond
+
+    @property
+    def baseline_ms(self) -> float:
+        return min(self._samples) if self._samples else 0.0
+
+    async def acquire(self):
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency_ms: float, ok: Optional[bool]):
+        """ok=None: the call was abandoned, free the slot without a signal."""
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            if ok is not None:
+                self._update(latency_ms, ok)
+            cond.notify_all()
+
+    def _decrease(self, latency_ms: float):
+        now = time.monotonic()
+        if now - self._last_decrease < latency_ms / 1000:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        if int(old) != int(self.limit):
+            log.info(f"🐢 {self.name} concurrency {int(old)} -> {int(self.limit)}")
+
+    def _update(self, latency_ms: float, ok: bool):
+        if not ok:
+            self.errors += 1
+            self._decrease(latency_ms)
+            return
+
+        self.successes += 1
+        self._samples.append(latency_ms)
+        self.latency_ms = latency_ms if not self.latency_ms else 0.8 * self.latency_ms + 0.2 * latency_ms
+        if latency_ms > self.baseline_ms * self.tolerance:
+            self._decrease(latency_ms)
+        else:
+            old = self.limit
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            if int(old) != int(self.limit):
+                log.info(f"🚀 {self.name} concurrency {int(old)} -> {int(self.limit)}")
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one concurrency slot; latency and outcome feed the limit."""
+        await self.acquire()
+        t0 = time.perf_counter()
+        try:
+            yield
+        except asyncio.CancelledError:
+            await asyncio.shield(self.release(0.0, None))
+            raise
+        except Exception:
+            await self.release((time.perf_counter() - t0) * 1000, False)
+            raise
+        await self.release((time.perf_counter() - t0) * 1000, True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "min": self.min_limit,
+            "max": self.max_limit,
+            "in_flight": self.in_flight,
+            "latency_ms": round(self.latency_ms, 1),
+            "baseline_ms": round(self.baseline_ms, 1),
+            "successes": self.successes,
+            "errors": self.errors,
+        }
+
+
+class MicroBatcher:
+    """
+    Collects items submitted within `max_wait_ms` (or until `max_size`
+    are waiting) and hands them to `send_batch` in one call; each caller
+    gets its own result. Identical items in a batch are sent once.
+    A failed batch fails all of its callers.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            send_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+            max_size: int,
+            max_wait_ms: float,
+            window: int = 500
+            ):
+        self.name = name
+        self.send_batch = send_batch
+        self.max_size = max_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[tuple] = []         # (item, future, submitted_at)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()   # strong refs: the loop only keeps weak ones
+        self._sizes: deque = deque(maxlen=window)
+        self._waits: deque = deque(maxlen=window)
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.in_flight = 0
+
+    def submit(self, item: Any) -> "asyncio.Future":
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        if len(self._pending) >= self.max_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._dispatch)
+        return future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[tuple]):
+        now = time.perf_counter()
+        batch = [entry for entry in batch if not entry[1].done()]     # callers that gave up
+        if not batch:
+            return
+        unique = list(dict.fromkeys(item for item, _, _ in batch))
+        self.batches += 1
+        self.items += len(batch)
+        self._sizes.append(len(batch))
+        self._waits.extend((now - submitted) * 1000 for _, _, submitted in batch)
+        self.in_flight += 1
+        try:
+            results = await self.send_batch(unique)
+            if len(results) != len(unique):
+                raise RuntimeError(f"{self.name}: got {len(results)} results for {len(unique)} items")
+            by_item = dict(zip(unique, results))
+            for item, future, _ in batch:
+                if not future.done():
+                    future.set_result(by_item[item])
+        except Exception as e:
+            self.errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.in_flight -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        sizes = sorted(self._sizes)
+        waits = sorted(self._waits)
+
+        def pct(values, q):
+            return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))] if values else 0
+
+        return {
+            "max_size": self.max_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "pending": len(self._pending),
+            "batch_size": {
+                "mean": round(sum(sizes) / len(sizes), 2) if sizes else 0,
+                "p50": pct(sizes, 50),
+                "max": sizes[-1] if sizes else 0,
+            },
+            "wait_ms": {
+                "p50": round(pct(waits, 50), 2),
+                "p95": round(pct(waits, 95), 2),
+                "max": round(waits[-1], 2) if waits else 0,
+            },
+        }
+
+
+class WriteRejected(RuntimeError):
+    """The collection was replaced behind its alias while the write was in flight."""
+
+
+class WriteGate:
+    """
+    Upserts and deletes hold `writing(collection)`, with the collection
+    behind the alias resolved when the write started. `paused(collection)`
+    lets the writes in flight finish, then holds new ones back until it is
+    released (re-indexing's final catch-up and alias switch). A retired
+    collection (the alias moved off it) rejects writes: their vectors were
+    embedded for it, not for its replacement.
+    In-process only: other workers' writes are left to the catch-up passes.
+    """
+
+    def __init__(self):
+        self._writers: Dict[str, int] = {}
+        self._paused: Set[str] = set()
+        self._retired: Dict[str, str] = {}          # collection -> why writes are rejected
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop = None
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond, self._loop = asyncio.Condition(), loop
+        return self._cond
+
+    async def _leave(self, collection: str):
+        cond = self._condition()
+        async with cond:
+            self._writers[collection] -= 1
+            if not self._writers[collection]:
+                del self._writers[collection]
+            cond.notify_all()
+
+    async def _resume(self, collection: str):
+        cond = self._condition()
+        async with cond:
+            self._paused.discard(collection)
+            cond.notify_all()
+
+    @asynccontextmanager
+    async def writing(self, collection: str):
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: collection not in self._paused)
+            if collection in self._retired:
+                raise WriteRejected(self._retired[collection])
+            self._writers[collection] = self._writers.get(collection, 0) + 1
+        try:
+            yield
+        finally:
+            await asyncio.shield(self._leave(collection))
+
+    @asynccontextmanager
+    async def paused(self, collection: str):
+        """No writes into `collection` while held (one pause at a time per collection)."""
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: collection not in self._paused)
+            self._paused.add(collection)
+        try:
+            async with cond:
+                await cond.wait_for(lambda: not self._writers.get(collection))
+            log.info(f"⏸ Writes to '{collection}' paused")
+            yield
+        finally:
+            await asyncio.shield(self._resume(collection))
+            log.info(f"▶ Writes to '{collection}' resumed")
+
+    def retire(self, collection: str, reason: str):
+        self._retired[collection] = reason
+
+    def reopen(self, collection: str):
+        """An alias points at `collection` again (rollback)."""
+        self._retired.pop(collection, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"writing": dict(self._writers), "paused": sorted(self._paused), "retired": sorted(self._retired)}
+
+
+# Shared by every upload: caps the total embedding load ingestion puts on Ollama
+ingest_limiter = AdaptiveLimiter(
+    "ingest-embedding",
+    min_limit=cfg.ingest.embed_concurrency_min,
+    max_limit=cfg.ingest.embed_concurrency_max,
+    initial=cfg.ingest.embed_concurrency_initial,
+    tolerance=cfg.ingest.latency_tolerance,
+    backoff=cfg.ingest.backoff,
+)
+
+# Every in-process write path into Qdrant goes through it
+write_gate = WriteGate()
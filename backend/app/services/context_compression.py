@@ -0,0 +1,224 @@
+#app/services/context_compression.py
+import re
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, Counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.clients import cfg
+from app.services.lexical_index import tokenize
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+# Sentence ends: . ! ? … (optionally followed by quotes/brackets) + whitespace, or blank lines
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])[\"')\]]*\s+|\n\s*\n")
+# Rough chars-per-token ratio for the token budget
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class Sentence:
+    text: str
+    chunk: int          # rank of the hit it came from
+    position: int       # index within that hit
+    source: str
+
+
+def split_sentences(text: str, min_chars: int = None) -> List[str]:
+    """Split a chunk into sentences; fragments shorter than min_chars ("Dr.", "Fig. 3.") stay attached."""
+    min_chars = cfg.compression.min_sentence_chars if min_chars is None else min_chars
+    sentences: List[str] = []
+    carry = ""
+    for part in _SENTENCE_RE.split(text):
+        part = " ".join(f"{carry} {part}".split())
+        if len(part) < min_chars:
+            carry = part
+            continue
+        carry = ""
+        sentences.append(part)
+    if carry:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {carry}"
+        else:
+            sentences.append(carry)
+    return sentences
+
+
+#======== scoring ======
+def lexical_scores(query: str, sentences: Sequence[str]) -> np.ndarray:
+    """
+    Query-term overlap weighted by IDF over the candidate sentences,
+    normalised by sqrt(sentence length) so long sentences don't win by size.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms or not sentences:
+        return np.zeros(len(sentences), dtype=np.float32)
+    counts = [Counter(tokenize(s)) for s in sentences]
+    tf = np.array([[c.get(t, 0) for t in terms] for c in counts], dtype=np.float32)    # sentences x terms
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(sentences) - df + 0.5) / (df + 0.5))
+    lengths = np.array([max(1, sum(c.values())) for c in counts], dtype=np.float32)
+    return (np.minimum(tf, 1.0) @ idf) / np.sqrt(lengths)
+
+
+class SentenceEmbeddingCache:
+    """LRU of sentence embeddings (float32, unit length), keyed by text hash."""
+
+    def __init__(self, max_items: int = None):
+        self.max_items = cfg.compression.embed_cache_size if max_items is None else max_items
+        self._items: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        k = self.key(text)
+        vec = self._items.get(k)
+        if vec is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(k)
+        return vec
+
+    def put(self, text: str, vector: Sequence[float]):
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        self._items[self.key(text)] = vec / norm if norm else vec
+        self._items.move_to_end(self.key(text))
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"items": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+sentence_cache = SentenceEmbeddingCache()
+
+
+async def embedding_scores(
+        query_vec: Sequence[float],
+        sentences: Sequence[str],
+        embed: Callable[[str], Awaitable[Tuple[List[float], float]]]
+        ) -> np.ndarray:
+    """Cosine similarity to the query; sentences missing from the cache are embedded (bounded concurrency)."""
+    vectors = {s: sentence_cache.get(s) for s in dict.fromkeys(sentences)}
+    missing = [s for s, v in vectors.items() if v is None]
+    if missing:
+        sem = asyncio.Semaphore(cfg.compression.embed_concurrency)
+
+        async def fill(text: str):
+            async with sem:
+                vector, _ = await embed(text)
+            sentence_cache.put(text, vector)
+            vectors[text] = sentence_cache.get(text)
+
+        await asyncio.gather(*(fill(s) for s in missing))
+
+    matrix = np.stack([vectors[s] for s in sentences])
+    q = np.asarray(query_vec, dtype=np.float32)
+    q = q / (np.linalg.norm(q) or 1.0)
+    return matrix @ q
+
+
+#======== selection ======
+def select_sentences(sentences: List[Sentence], scores: np.ndarray, max_chars: int) -> List[Sentence]:
+    """Best-scoring sentences that fit max_chars, back in document order."""
+    order = np.argsort(-scores, kind="stable")
+    kept, used = [], 0
+    best = max(float(scores[order[0]]), 0.0) if len(order) else 0.0
+    for i in order:
+        if kept and scores[i] <= best * cfg.compression.min_relative_score:
+            break
+        size = len(sentences[i].text) + 1
+        if used + size > max_chars:
+            continue
+        kept.append(sentences[i])
+        used += size
+    return sorted(kept, key=lambda s: (s.chunk, s.position))
+
+
+def format_context(kept: List[Sentence]) -> str:
+    """One paragraph per source hit, prefixed with its source."""
+    blocks: List[str] = []
+    current = None
+    for s in kept:
+        if s.chunk != current:
+            blocks.append(f"[{s.source}] {s.text}")
+            current = s.chunk
+        else:
+            blocks[-1] += f" {s.text}"
+    return "\n\n".join(blocks)
+
+
+async def compress_context(
+        query: str,
+        hits: Sequence[Any],
+        max_chars: int = None,
+        query_vec: Optional[Sequence[float]] = None,
+        embed: Optional[Callable] = None,
+        timeout: float = None
+        ) -> Dict[str, Any]:
+    """
+    Extractive compression of the retrieved hits:
+    split into sentences, score against the query, keep the best within
+    `max_chars` (default: cfg.compression.max_tokens), preserving order
+    and source. Embedding scoring needs query_vec and embed, otherwise
+    lexical overlap is used, also when embedding fails or takes longer
+    than `timeout`.
+    Returns {"context", "chunks", "sentences", "original_chars", "ratio", "method"}.
+    """
+    max_chars = cfg.compression.max_tokens * CHARS_PER_TOKEN if max_chars is None else max_chars
+    sentences = [
+        Sentence(text=text, chunk=rank, position=pos, source=(h.payload or {}).get("source", "unknown"))
+        for rank, h in enumerate(hits)
+        for pos, text in enumerate(split_sentences((h.payload or {}).get("text", "")))
+    ]
+    original_chars = sum(len((h.payload or {}).get("text", "")) for h in hits)
+    if not sentences:
+        return {"context": "", "chunks": 0, "sentences": 0, "original_chars": original_chars, "ratio": 0.0, "method": None}
+
+    method = cfg.compression.method
+    if method == "embedding" and (query_vec is None or embed is None):
+        method = "lexical"
+    scores = None
+    if method == "embedding":
+        try:
+            scores = await asyncio.wait_for(
+                embedding_scores(query_vec, [s.text for s in sentences], embed), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            log.warning(f"⏱ Sentence embeddings exceeded {timeout:.2f} s, scoring lexically")
+            method = "lexical"
+        except Exception as e:
+            # Ollama down / circuit open: compression must not fail the answer
+            log.warning(f"!!! Sentence embeddings failed, scoring lexically: {getattr(e, 'detail', None) or str(e)}")
+            method = "lexical"
+    if scores is None:
+        scores = lexical_scores(query, [s.text for s in sentences])
+    # Tie-break toward higher-ranked hits
+    scores = scores - np.array([s.chunk for s in sentences], dtype=np.float32) * 1e-6
+
+    kept = select_sentences(sentences, scores, max_chars)
+    context = format_context(kept)
+    ratio = len(context) / original_chars if original_chars else 0.0
+    log.info(
+        f"✂️ Context compressed ({method}): {len(kept)}/{len(sentences)} sentences, "
+        f"{original_chars} -> {len(context)} chars ({ratio:.0%})"
+    )
+    return {
+        "context": context,
+        "chunks": len({s.chunk for s in kept}),
+        "sentences": len(kept),
+        "original_chars": original_chars,
+        "ratio": round(ratio, 3),
+        "method": method,
+    }
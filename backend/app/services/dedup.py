@@ -0,0 +1,216 @@
+#app/services/dedup.py
+import re
+import zlib
+import asyncio
+import hashlib
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.clients import cfg, qdrant
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace, so trivial formatting diffs still match."""
+    return " ".join(text.lower().split())
+
+
+def content_hash(text: str) -> str:
+    """Exact-duplicate key (stored as the `content_hash` payload field)."""
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, vectorized with NumPy."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a < 2^31 and x < 2^32 keep a*x + b inside uint64
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+
+    def shingles(self, text: str) -> Set[str]:
+        words = _WORD_RE.findall(text.lower())
+        k = self.shingle_size
+        if len(words) <= k:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in self.shingles(text)),
+            dtype=np.uint64,
+        )
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+@dataclass
+class Duplicate:
+    chunk_index: int
+    reason: str              # "exact" | "near"
+    similarity: float
+    duplicate_of: str        # "<source>#<chunk_index>" or "this upload#<n>"
+
+    def to_dict(self) -> Dict:
+        return {
+            "chunk_index": self.chunk_index,
+            "reason": self.reason,
+            "similarity": round(self.similarity, 3),
+            "duplicate_of": self.duplicate_of,
+        }
+
+
+@dataclass
+class DedupIndex:
+    """Exact hashes + MinHash LSH buckets of one collection's chunks."""
+    hasher: MinHasher
+    bands: int
+    exact: Dict[str, str] = field(default_factory=dict)
+    buckets: Dict[Tuple[int, bytes], List[int]] = field(default_factory=lambda: defaultdict(list))
+    signatures: List[np.ndarray] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+
+    @property
+    def rows(self) -> int:
+        return self.hasher.num_perm // self.bands
+
+    def _band_keys(self, sig: np.ndarray):
+        r = self.rows
+        return [(b, sig[b * r:(b + 1) * r].tobytes()) for b in range(self.bands)]
+
+    def add(self, text: str, label: str, sig: np.ndarray = None):
+        self.exact.setdefault(content_hash(text), label)
+        sig = self.hasher.signature(text) if sig is None else sig
+        pos = len(self.signatures)
+        self.signatures.append(sig)
+        self.labels.append(label)
+        for key in self._band_keys(sig):
+            self.buckets[key].append(pos)
+
+    def find(
+            self,
+            text: str,
+            threshold: float,
+            sig: np.ndarray = None
+            ) -> Tuple[Optional[Tuple[str, str, float]], np.ndarray]:
+        """
+        (match, signature); match is (reason, label, similarity) or None.
+        LSH candidates are verified with the signature agreement ratio.
+        Pass `sig` when it is already known.
+        """
+        exact = self.exact.get(content_hash(text))
+        sig = self.hasher.signature(text) if sig is None else sig
+        if exact is not None:
+            return ("exact", exact, 1.0), sig
+
+        candidates = {pos for key in self._band_keys(sig) for pos in self.buckets.get(key, ())}
+        best, best_sim = None, 0.0
+        for pos in candidates:
+            sim = float(np.mean(self.signatures[pos] == sig))
+            if sim > best_sim:
+                best, best_sim = pos, sim
+        if best is not None and best_sim >= threshold:
+            return ("near", self.labels[best], best_sim), sig
+        return None, sig
+
+
+class DedupService:
+    """Per-collection dedup indexes, loaded lazily from Qdrant payloads."""
+
+    def __init__(self):
+        self._indexes: Dict[str, DedupIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hasher = MinHasher(cfg.dedup.num_perm, cfg.dedup.shingle_size)
+
+    def _new_index(self) -> DedupIndex:
+        return DedupIndex(hasher=self.hasher, bands=cfg.dedup.bands)
+
+    def _load(self, collection: str) -> DedupIndex:
+        """Index every stored chunk text (no vectors are fetched)."""
+        index = self._new_index()
+        offset = None
+        while True:
+            points, offset = qdrant.scroll(
+                collection_name=collection,
+                limit=cfg.snapshot.page_size,
+                offset=offset,
+                with_payload=["text", "source", "chunk_index"],
+                with_vectors=False,
+            )
+            for p in points:
+                payload = p.payload or {}
+                if payload.get("text"):
+                    label = f"{payload.get('source', 'unknown')}#{payload.get('chunk_index', p.id)}"
+                    index.add(payload["text"], label)
+            if offset is None:
+                break
+        log.info(f"🧬 Dedup index for '{collection}': {len(index.labels)} chunks")
+        return index
+
+    async def get_index(self, collection: str) -> DedupIndex:
+        if collection in self._indexes:
+            return self._indexes[collection]
+        lock = self._locks.setdefault(collection, asyncio.Lock())
+        async with lock:
+            if collection not in self._indexes:
+                self._indexes[collection] = await asyncio.to_thread(self._load, collection)
+            return self._indexes[collection]
+
+    def invalidate(self, collection: str):
+        """Forget the index; it is rebuilt from Qdrant on next use."""
+        self._indexes.pop(collection, None)
+
+    async def filter_chunks(
+            self,
+            collection: str,
+            chunks: List[str]
+            ) -> Tuple[List[Tuple[int, str, np.ndarray]], List[Duplicate]]:
+        """
+        Split chunks (1-based chunk_index) into (kept, duplicates).
+        Duplicates are checked against the collection and earlier
+        chunks of the same upload. Kept chunks carry their signature
+        so `add()` doesn't recompute it.
+        """
+        index = await self.get_index(collection)
+        local = self._new_index()
+        kept, duplicates = [], []
+        threshold = cfg.dedup.threshold
+        # MinHash is the CPU-heavy part: once per chunk, off the event loop
+        signatures = await asyncio.to_thread(lambda: [self.hasher.signature(chunk) for chunk in chunks])
+
+        for idx, (chunk, sig) in enumerate(zip(chunks, signatures), 1):
+            match, _ = index.find(chunk, threshold, sig)
+            if match is None:
+                local_match, _ = local.find(chunk, threshold, sig)
+                if local_match is not None:
+                    reason, label, sim = local_match
+                    match = (reason, f"this upload#{label}", sim)
+            if match is not None:
+                reason, label, sim = match
+                duplicates.append(Duplicate(idx, reason, sim, label))
+                continue
+            local.add(chunk, str(idx), sig)
+            kept.append((idx, chunk, sig))
+        return kept, duplicates
+
+    def add(self, collection: str, text: str, label: str, sig: np.ndarray = None):
+        """Register a stored chunk (no-op if the index isn't loaded yet)."""
+        index = self._indexes.get(collection)
+        if index is not None:
+            index.add(text, label, sig)
+
+
+dedup_service = DedupService()
@@ -0,0 +1,409 @@
+#app/services/dir_sync.py
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg, qdrant
+from app.utils import chunk_text_by_sentences
+from app.services.ingest_service import embed_and_store
+from app.services.concurrency import write_gate
+from app.services.dedup import dedup_service
+from app.services.local_index import local_index
+from app.services.lexical_index import lexical_index
+from app.services.projection_service import projection_service
+from app.services.collection_registry import collection_registry
+
+try:
+    from watchfiles import awatch
+except ImportError:  # optional: plain polling
+    awatch = None
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: a single process is assumed
+    fcntl = None
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    collection TEXT NOT NULL,
+    path TEXT NOT NULL,         -- relative to the synced root, also the chunks' "source"
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (collection, path)
+);
+"""
+
+
+@dataclass
+class FileState:
+    mtime_ns: int
+    size: int
+    sha256: str = ""
+    chunks: int = 0
+
+
+class Manifest:
+    """What was ingested from which file, per collection (SQLite)."""
+
+    def __init__(self, path: str = None):
+        self.path = cfg.sync.manifest_path if path is None else path
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def load(self, collection: str) -> Dict[str, FileState]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, mtime_ns, size, sha256, chunks FROM files WHERE collection = ?", (collection,)
+            ).fetchall()
+        return {path: FileState(*rest) for path, *rest in rows}
+
+    def put(self, collection: str, path: str, state: FileState):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (collection, path, state.mtime_ns, state.size, state.sha256, state.chunks, time.time()),
+            )
+
+    def remove(self, collection: str, path: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE collection = ? AND path = ?", (collection, path))
+
+
+def scan(root: str, extensions=None) -> Dict[str, FileState]:
+    """mtime/size of every supported file under root (hidden files and dirs skipped)."""
+    extensions = tuple(cfg.sync.extensions if extensions is None else extensions)
+    found: Dict[str, FileState] = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for name in filenames:
+            if name.startswith(".") or not name.lower().endswith(extensions):
+                continue
+            full = os.path.join(dirpath, name)
+            try:
+                st = os.stat(full)
+            except FileNotFoundError:       # removed while scanning
+                continue
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            found[rel] = FileState(mtime_ns=st.st_mtime_ns, size=st.st_size)
+    return found
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _source_point_ids(collection: str, source: str, sync_root: str) -> List[Any]:
+    """
+    IDs of the chunks stored for one file of one sync root (source is a
+    payload index): an upload with the same file name, or the same path
+    under another root, is left alone.
+    """
+    ids, offset = [], None
+    source_filter = qmodels.Filter(must=[
+        qmodels.FieldCondition(key="source", match=qmodels.MatchValue(value=source)),
+        qmodels.FieldCondition(key="sync_root", match=qmodels.MatchValue(value=sync_root)),
+    ])
+    while True:
+        points, offset = qdrant.scroll(
+            collection_name=collection,
+            scroll_filter=source_filter,
+            limit=cfg.snapshot.page_size,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        ids.extend(p.id for p in points)
+        if offset is None:
+            return ids
+
+
+def _delete_points(collection: str, ids: List[Any]):
+    if not ids:
+        return
+    qdrant.delete(collection_name=collection, points_selector=qmodels.PointIdsList(points=ids))
+    local_index.remove_points(collection, ids)
+    lexical_index.remove_points(collection, ids)
+
+
+class DirectorySync:
+    """
+    Incremental sync of a directory tree into a collection:
+    - new files are chunked, embedded and upserted
+    - files whose mtime/size changed are re-hashed; only a new hash
+      re-ingests them (old chunks are deleted after the new ones are stored)
+    - files gone from disk have their chunks deleted
+    """
+
+    def __init__(self, manifest: Manifest = None):
+        self._manifest = manifest
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @property
+    def manifest(self) -> Manifest:
+        if self._manifest is None:
+            self._manifest = Manifest()
+        return self._manifest
+
+    def plan(self, collection: str, root: str) -> Tuple[Dict[str, FileState], List[str], List[str]]:
+        """(files on disk, candidates to (re)ingest, removed paths)."""
+        on_disk = scan(root)
+        known = self.manifest.load(collection)
+        candidates = [
+            path for path, st in on_disk.items()
+            if path not in known or (known[path].mtime_ns, known[path].size) != (st.mtime_ns, st.size)
+        ]
+        removed = [path for path in known if path not in on_disk]
+        return on_disk, sorted(candidates), sorted(removed)
+
+    async def sync(self, collection: str, root: str, dry_run: bool = False) -> Dict[str, Any]:
+        if not os.path.isdir(root):
+            raise ValueError(f"'{root}' is not a directory")
+        lock = self._locks.setdefault(collection, asyncio.Lock())
+        async with lock:
+            return await self._sync(collection, root, dry_run)
+
+    async def _sync(self, collection: str, root: str, dry_run: bool) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        on_disk, candidates, removed = await asyncio.to_thread(self.plan, collection, root)
+        known = self.manifest.load(collection)
+        report = {
+            "collection": collection,
+            "root": root,
+            "files": len(on_disk),
+            "added": [], "changed": [], "removed": removed, "touched": 0,
+            "chunks_stored": 0, "chunks_deleted": 0, "failed": [],
+            "dry_run": dry_run,
+        }
+
+        sem = asyncio.Semaphore(cfg.sync.file_concurrency)
+
+        async def handle(path: str):
+            async with sem:
+                try:
+                    await self._sync_file(collection, root, path, on_disk[path], known.get(path), report, dry_run)
+                except Exception as e:
+                    log.warning(f"!!! Sync of '{path}' failed: {str(e)}")
+                    report["failed"].append(path)
+
+        await asyncio.gather(*(handle(p) for p in candidates))
+
+        for path in removed:
+            if dry_run:
+                continue
+            target = collection_registry.resolve(collection)
+            ids = await asyncio.to_thread(_source_point_ids, target, path, os.path.abspath(root))
+            async with write_gate.writing(target):
+                await asyncio.to_thread(_delete_points, target, ids)
+            report["chunks_deleted"] += len(ids)
+            self.manifest.remove(collection, path)
+
+        if not dry_run and (report["chunks_stored"] or report["chunks_deleted"]):
+            projection_service.invalidate(collection)
+            if report["chunks_deleted"]:
+                dedup_service.invalidate(collection)
+
+        # Files finish in any order
+        report["added"].sort()
+        report["changed"].sort()
+        report["failed"].sort()
+        report["duration_s"] = round(time.perf_counter() - t0, 2)
+        log.info(
+            f"🔄 Synced '{root}' -> '{collection}': {len(report['added'])} new, {len(report['changed'])} changed, "
+            f"{len(removed)} removed, {len(on_disk) - len(candidates)} unchanged in {report['duration_s']} s"
+        )
+        return report
+
+    async def _sync_file(self, collection, root, path, state: FileState, known: Optional[FileState], report, dry_run):
+        full = os.path.join(root, path)
+        state.sha256 = await asyncio.to_thread(file_hash, full)
+        if known is not None and known.sha256 == state.sha256:
+            # Touched but identical: remember the new mtime, nothing to embed
+            state.chunks = known.chunks
+            report["touched"] += 1
+            if not dry_run:
+                self.manifest.put(collection, path, state)
+            return
+
+        report["added" if known is None else "changed"].append(path)
+        if dry_run:
+            return
+
+        with open(full, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+        # Writes go to the collection behind an alias, resolved once per file
+        target = collection_registry.resolve(collection)
+        # Looked up for new files too: chunks stored by an earlier, partly failed sync
+        old_ids = await asyncio.to_thread(_source_point_ids, target, path, os.path.abspath(root))
+        chunks = chunk_text_by_sentences(
+            text, max_chunk_size=cfg.sync.chunk_size, overlap_sentences=cfg.sync.overlap
+        ) if text.strip() else []
+        items = [(idx, chunk, None) for idx, chunk in enumerate(chunks, 1)]
+        stored, failed = await embed_and_store(
+            target, path, items, {"sync_root": os.path.abspath(root)},
+            model=collection_registry.defaults(collection).embed_model
+        )
+        if failed:
+            # Keep the old chunks and leave the manifest alone: retried on the next sync
+            report["failed"].append(path)
+            report["chunks_stored"] += stored
+            return
+        async with write_gate.writing(target):
+            await asyncio.to_thread(_delete_points, target, old_ids)
+        state.chunks = stored
+        self.manifest.put(collection, path, state)
+        report["chunks_stored"] += stored
+        report["chunks_deleted"] += len(old_ids)
+
+
+class SyncLock:
+    """
+    Exclusive lock file next to the manifest. Every uvicorn worker runs
+    the startup hook, but only the one holding this lock syncs: the
+    in-process asyncio locks can't stop two workers from ingesting the
+    same new file.
+    """
+
+    def __init__(self, path: str = None):
+        self._path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def path(self) -> str:
+        return self._path or cfg.sync.manifest_path + ".lock"
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self) -> bool:
+        """Non-blocking; True if this process holds the lock (now or already)."""
+        if self._fd is not None or fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class SyncService:
+    """
+    Background sync of the SYNC_DIRS targets, on file events (watchfiles)
+    or by polling, in the one worker that holds the SyncLock.
+    """
+
+    def __init__(self, syncer: DirectorySync = None, lock: SyncLock = None):
+        self.syncer = syncer or DirectorySync()
+        self.lock = lock or SyncLock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.last_reports: Dict[str, Dict[str, Any]] = {}
+
+    async def run_once(self, collection: str) -> Dict[str, Any]:
+        root = cfg.sync.targets.get(collection)
+        if root is None:
+            raise KeyError(f"No sync directory configured for '{collection}'")
+        # Manual syncs from another worker borrow the lock for the run
+        borrowed = not self.lock.held
+        if borrowed and not self.lock.acquire():
+            raise RuntimeError(f"Directory sync is running in another worker (lock {self.lock.path})")
+        try:
+            report = await self.syncer.sync(collection, root)
+        finally:
+            if borrowed:
+                self.lock.release()
+        self.last_reports[collection] = {**report, "finished_at": time.time()}
+        return report
+
+    async def _wait_for_change(self, root: str):
+        if awatch is None or not cfg.sync.watch:
+            await asyncio.sleep(cfg.sync.poll_interval_s)
+            return
+        try:
+            # Debounced file events; the poll interval is still the upper bound
+            async def first_change():
+                async for _ in awatch(root, debounce=int(cfg.sync.debounce_s * 1000)):
+                    return
+            await asyncio.wait_for(first_change(), timeout=cfg.sync.poll_interval_s)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self, collection: str, root: str):
+        while True:
+            try:
+                await self.run_once(collection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning(f"!!! Background sync of '{collection}' failed: {str(e)}")
+            await self._wait_for_change(root)
+
+    def start(self):
+        if not cfg.sync.targets:
+            return
+        if not self.lock.acquire():
+            log.info(f"Directory sync left to the worker holding {self.lock.path}")
+            return
+        for collection, root in cfg.sync.targets.items():
+            task = self._tasks.get(collection)
+            if task is None or task.done():
+                self._tasks[collection] = asyncio.create_task(self._run(collection, root))
+                log.info(f"👀 Watching '{root}' for collection '{collection}'")
+
+    async def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        for task in self._tasks.values():
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks.clear()
+        self.lock.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "targets": cfg.sync.targets,
+            "mode": "watch" if awatch is not None and cfg.sync.watch else "poll",
+            "poll_interval_s": cfg.sync.poll_interval_s,
+            "running": sorted(c for c, t in self._tasks.items() if not t.done()),
+            "owner": self.lock.held,
+            "last": {
+                c: {k: (len(v) if isinstance(v, list) else v) for k, v in r.items()}
+                for c, r in self.last_reports.items()
+            },
+        }
+
+
+sync_service = SyncService()
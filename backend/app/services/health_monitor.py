@@ -0,0 +1,101 @@
+#app/services/health_monitor.py
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from app.clients import cfg, qdrant, http_client, qdrant_breaker, ollama_breaker
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+HEALTHY = "healthy"
+UNKNOWN = "unknown"
+
+
+class HealthMonitor:
+    """
+    Probes Qdrant and Ollama in the background and keeps the last result
+    in memory, so health endpoints never call upstream themselves.
+    Probes bypass the circuit breakers; a healthy probe moves an open
+    breaker to half-open so recovery is noticed without waiting out `open_s`.
+    """
+
+    def __init__(self):
+        self._state: Dict[str, Dict[str, Any]] = {
+            "qdrant": {"status": UNKNOWN},
+            "ollama": {"status": UNKNOWN},
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    async def probe_qdrant(self) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            info = await asyncio.wait_for(
+                asyncio.to_thread(qdrant.unwrapped.get_collections),
+                timeout=cfg.health.probe_timeout_s
+            )
+            state = {"status": HEALTHY, "collections": [c.name for c in info.collections]}
+            qdrant_breaker.half_open()
+        except Exception as e:
+            state = {"status": f"unhealthy: {str(e) or type(e).__name__}"}
+        state["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        state["checked_at"] = time.time()
+        state["circuit"] = qdrant_breaker.snapshot()["state"]
+        self._state["qdrant"] = state
+        return state
+
+    async def probe_ollama(self) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        breaker = ollama_breaker()
+        try:
+            resp = await http_client.get(
+                f"{cfg.ollama.base_url}/api/tags",
+                timeout=cfg.health.probe_timeout_s,
+                extensions={"circuit_breaker_bypass": True}
+            )
+            if resp.status_code == 200:
+                state = {"status": HEALTHY}
+                breaker.half_open()
+            else:
+                state = {"status": f"unhealthy: HTTP {resp.status_code}"}
+        except Exception as e:
+            state = {"status": f"unhealthy: {str(e) or type(e).__name__}"}
+        state["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        state["checked_at"] = time.time()
+        state["circuit"] = breaker.snapshot()["state"]
+        self._state["ollama"] = state
+        return state
+
+    async def probe_all(self):
+        await asyncio.gather(self.probe_qdrant(), self.probe_ollama())
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(state) for name, state in self._state.items()}
+
+    def is_healthy(self, name: str) -> bool:
+        return self._state[name]["status"] == HEALTHY
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                log.warning(f"⚠ Health probe failed: {e}")
+            await asyncio.sleep(cfg.health.probe_interval_s)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,110 @@
+#app/services/ingest_service.py
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg, qdrant
+from app.services.rag_services import _get_embedding
+from app.services.concurrency import ingest_limiter, write_gate
+from app.services.dedup import dedup_service, content_hash
+from app.services.local_index import local_index
+from app.services.lexical_index import lexical_index
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+# (chunk_index, text, MinHash signature or None)
+ChunkItem = Tuple[int, str, Optional[np.ndarray]]
+
+
+async def _embed_chunk(item: ChunkItem, model: str = None):
+    """Embed one chunk inside an adaptive concurrency slot."""
+    async with ingest_limiter.slot():
+        embedding, _ = await _get_embedding(item[1], model=model)
+    return item, embedding
+
+
+async def embed_and_store(
+        collection: str,
+        source: str,
+        items: List[ChunkItem],
+        extra_payload: Dict[str, Any] = None,
+        model: str = None
+        ) -> Tuple[int, int]:
+    """
+    Embed chunks with adaptive concurrency and upsert them in batches.
+    `model` defaults to OLLAMA_EMBED_MODEL.
+    Returns (stored, failed).
+    """
+    stored = 0
+    failed = 0
+    uploaded_at = time.time()
+    batch: List[qmodels.PointStruct] = []
+    batch_items: List[ChunkItem] = []
+
+    async def _flush():
+        nonlocal stored, failed, batch, batch_items
+        if not batch:
+            return
+        points, flushed = batch, batch_items
+        batch, batch_items = [], []
+        try:
+            async with write_gate.writing(collection):
+                # When the points land, unlike uploaded_at (re-indexing catches up on it)
+                stored_at = time.time()
+                for point in points:
+                    point.payload["stored_at"] = stored_at
+                await asyncio.to_thread(qdrant.upsert, collection_name=collection, points=points)
+        except Exception as e:
+            log.warning(f"!!! Upsert of {len(points)} chunks failed: {str(e)}")
+            failed += len(points)
+            return
+        stored += len(points)
+        local_index.add_points(collection, points)
+        lexical_index.add_points(collection, points)
+        for idx, chunk, signature in flushed:
+            dedup_service.add(collection, chunk, f"{source}#{idx}", signature)
+
+    tasks = [asyncio.create_task(_embed_chunk(item, model)) for item in items]
+    try:
+        for done, future in enumerate(asyncio.as_completed(tasks), 1):
+            try:
+                (idx, chunk, signature), embedding = await future
+            except Exception as e:
+                log.warning(f"!!! Embedding failed for chunk: {str(e)}")
+                failed += 1
+                continue
+
+            batch.append(qmodels.PointStruct(
+                id=str(uuid.uuid4()),
+                vector=embedding,
+                payload={
+                    "text": chunk,
+                    "source": source,
+                    "chunk_index": idx,
+                    "collection": collection,
+                    "content_hash": content_hash(chunk),
+                    "uploaded_at": uploaded_at,
+                    **(extra_payload or {})
+                }
+            ))
+            batch_items.append((idx, chunk, signature))
+            if len(batch) >= cfg.ingest.upsert_batch_size:
+                await _flush()
+
+            if done % 10 == 0 or done == len(items):
+                log.info(
+                    f" Embedded {done}/{len(items)} chunks "
+                    f"(concurrency {ingest_limiter.snapshot()['limit']})"
+                )
+        await _flush()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return stored, failed
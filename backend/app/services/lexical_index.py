@@ -0,0 +1,383 @@
+#app/services/lexical_index.py
+import os
+import re
+import json
+import math
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg, qdrant
+from app.services.local_index import stored_since
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+# Identifier-ish tokens stay whole (ERR_CONN_RESET, app.cli, v1.2.3) ...
+_TOKEN_RE = re.compile(r"[\w][\w.:/\-]*[\w]|[\w]", re.UNICODE)
+# ... and are also indexed by their parts, so "conn reset" still matches
+_SPLIT_RE = re.compile(r"[._:/\-]+")
+# Payload fields kept per document so lexical hits need no Qdrant round-trip
+STORED_FIELDS = ("text", "source", "chunk_index")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = [p for p in _SPLIT_RE.split(token) if p]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+def _is_code_like(word: str) -> bool:
+    word = word.strip("\"'`()[]{},;?!")
+    return bool(
+        re.search(r"[_.:/]", word.strip("."))
+        or (re.search(r"\d", word) and re.search(r"[A-Za-z]", word))
+        or (len(word) >= 3 and word.isupper())
+    )
+
+
+def is_identifier_query(query: str) -> bool:
+    """
+    Short queries made only of code-like tokens: error codes, config keys,
+    dotted paths. Dense embeddings handle these poorly; a question that
+    merely mentions one ("Who founded IBM?") is not one of them.
+    """
+    words = query.split()
+    return 0 < len(words) <= 3 and all(_is_code_like(word) for word in words)
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring over one collection's chunks."""
+
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = cfg.lexical.k1 if k1 is None else k1
+        self.b = cfg.lexical.b if b is None else b
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)   # term -> {doc id: tf}
+        self._lengths: Dict[str, int] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}                      # doc id -> stored payload
+        self._ids: Dict[str, Any] = {}                                  # doc id -> original point id
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self.dirty = False
+        self.synced_at: Optional[float] = None      # when it was last built from Qdrant
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, point_id: Any, payload: Dict[str, Any]):
+        text = (payload or {}).get("text")
+        if not text:
+            return
+        key = str(point_id)
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(key)
+            for term, tf in terms.items():
+                self._postings[term][key] = tf
+            length = sum(terms.values())
+            self._lengths[key] = length
+            self._total_length += length
+            self._docs[key] = {f: payload[f] for f in STORED_FIELDS if f in payload}
+            self._ids[key] = point_id
+            self.dirty = True
+
+    def _remove(self, key: str):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for term in set(tokenize(doc.get("text", ""))):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(key, 0)
+        self._ids.pop(key, None)
+        self.dirty = True
+
+    def remove(self, point_ids: Iterable):
+        with self._lock:
+            for point_id in point_ids:
+                self._remove(str(point_id))
+
+    def search(self, query: str, limit: int) -> List[qmodels.ScoredPoint]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._docs)
+            if not n or not terms:
+                return []
+            avgdl = self._total_length / n
+            scores: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[key] / avgdl)
+                    scores[key] += idf * tf * (self.k1 + 1) / (tf + norm)
+            ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+            return [
+                qmodels.ScoredPoint(id=self._ids[key], version=0, score=score, payload=dict(self._docs[key]))
+                for key, score in ranked
+            ]
+
+    #======== persistence: one JSON document per line ======
+    # Later lines win; {"id": ..., "deleted": true} drops a document.
+    # An optional first line {"meta": {"synced_at": ...}} dates the file.
+    def save(self, path: str):
+        with self._lock:
+            rows = [{"id": self._ids[key], **doc} for key, doc in self._docs.items()]
+            self.dirty = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Per-process temp file: workers replace the file, never interleave writes
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"meta": {"synced_at": self.synced_at}}) + "\n")
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index = cls()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    if "meta" in row:
+                        index.synced_at = row["meta"].get("synced_at")
+                    elif row.get("deleted"):
+                        index.remove([row["id"]])
+                    else:
+                        index.add(row.pop("id"), row)
+        index.dirty = False
+        return index
+
+
+def rrf_fuse(
+        rankings: Sequence[Sequence[qmodels.ScoredPoint]],
+        limit: int,
+        k: int = None
+        ) -> List[qmodels.ScoredPoint]:
+    """Reciprocal rank fusion: score = sum(1 / (k + rank)) over the rankings."""
+    k = cfg.lexical.rrf_k if k is None else k
+    fused: Dict[str, float] = defaultdict(float)
+    points: Dict[str, qmodels.ScoredPoint] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, 1):
+            key = str(hit.id)
+            fused[key] += 1.0 / (k + rank)
+            if key not in points or not points[key].payload:
+                points[key] = hit
+    ranked = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return [
+        qmodels.ScoredPoint(id=points[key].id, version=0, score=score, payload=points[key].payload)
+        for key, score in ranked
+    ]
+
+
+class LexicalIndexService:
+    """
+    Per-collection BM25 indexes, persisted as JSONL under LEXICAL_INDEX_DIR.
+    Missing indexes are built from Qdrant payloads in the background; until
+    then `search()` returns None and callers use dense retrieval.
+    Each worker keeps its own index and only sees its own uploads, so
+    indexes are reconciled with Qdrant's count periodically and on load,
+    and rebuilt when they drifted.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, BM25Index] = {}
+        self._loading: Dict[str, List[Any]] = {}     # collection -> updates seen while loading
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return cfg.lexical.enabled
+
+    def _path(self, collection: str) -> str:
+        return os.path.join(cfg.lexical.dir, f"{collection}.jsonl")
+
+    def search(self, collection: str, query: str, limit: int) -> Optional[List[qmodels.ScoredPoint]]:
+        if not self.enabled:
+            return None
+        index = self._indexes.get(collection)
+        if index is None:
+            self._schedule_load(collection)
+            return None
+        return index.search(query, limit)
+
+    async def asearch(self, collection: str, query: str, limit: int) -> Optional[List[qmodels.ScoredPoint]]:
+        """search() for async callers: BM25 scoring is pure Python, so it runs in a worker thread."""
+        index = self._indexes.get(collection) if self.enabled else None
+        if index is None:
+            return self.search(collection, query, limit)
+        return await asyncio.to_thread(index.search, query, limit)
+
+    def _schedule_load(self, collection: str):
+        with self._lock:
+            if collection in self._loading:
+                return
+            self._loading[collection] = []
+        asyncio.get_running_loop().create_task(self._load(collection))
+
+    async def _load(self, collection: str, use_cache: bool = True):
+        try:
+            index = await asyncio.to_thread(self.build, collection, use_cache)
+        except Exception as e:
+            log.warning(f"!!! Lexical index for '{collection}' not loaded: {str(e)}")
+            index = None
+        with self._lock:
+            pending = self._loading.pop(collection, [])
+            if index is not None:
+                for row in pending:
+                    self._apply(index, row)
+                self._indexes[collection] = index
+
+    @staticmethod
+    def _apply(index: BM25Index, row: Dict[str, Any]):
+        if row.get("deleted"):
+            index.remove([row["id"]])
+        else:
+            index.add(row["id"], row)
+
+    @staticmethod
+    def _qdrant_count(collection: str) -> int:
+        """Chunks with text, i.e. what a complete BM25 index holds."""
+        with_text = qmodels.Filter(must_not=[qmodels.IsEmptyCondition(is_empty=qmodels.PayloadField(key="text"))])
+        return qdrant.count(collection_name=collection, count_filter=with_text, exact=True).count
+
+    def build(self, collection: str, use_cache: bool = True) -> BM25Index:
+        """
+        Load the JSONL file when it matches Qdrant's count and nothing was
+        uploaded since it was built, else scroll the payloads from Qdrant.
+        """
+        path = self._path(collection)
+        if use_cache and os.path.exists(path):
+            index = BM25Index.load(path)
+            count = self._qdrant_count(collection)
+            if len(index) == count and not stored_since(collection, index.synced_at):
+                log.info(f"🔤 Lexical index for '{collection}' loaded from disk ({len(index)} chunks)")
+                return index
+            log.info(f"♻️ Lexical index file for '{collection}' is stale ({len(index)} vs {count}), rebuilding")
+
+        index = BM25Index()
+        index.synced_at = time.time()
+        offset = None
+        while True:
+            points, offset = qdrant.scroll(
+                collection_name=collection,
+                limit=cfg.snapshot.page_size,
+                offset=offset,
+                with_payload=list(STORED_FIELDS),
+                with_vectors=False,
+            )
+            for p in points:
+                index.add(p.id, p.payload or {})
+            if offset is None:
+                break
+        index.save(path)
+        log.info(f"🔤 Lexical index for '{collection}' built from Qdrant ({len(index)} chunks)")
+        return index
+
+    #======== ingestion hooks ======
+    def _update(self, collection: str, rows: List[Dict[str, Any]]):
+        """
+        Loaded index: apply in memory. Loading: replay once built.
+        Not loaded: nothing to do, the next load reconciles with Qdrant.
+        """
+        if not self.enabled or not rows:
+            return
+        with self._lock:
+            if collection in self._loading:
+                self._loading[collection].extend(rows)
+                return
+            index = self._indexes.get(collection)
+            if index is None:
+                return
+        for row in rows:
+            self._apply(index, row)
+
+    def add_points(self, collection: str, points: Sequence[qmodels.PointStruct]):
+        """Called after a successful upsert (any thread)."""
+        self._update(collection, [
+            {"id": p.id, **{f: p.payload[f] for f in STORED_FIELDS if f in (p.payload or {})}}
+            for p in points
+            if (p.payload or {}).get("text")
+        ])
+
+    def remove_points(self, collection: str, ids: Sequence):
+        self._update(collection, [{"id": pid, "deleted": True} for pid in ids])
+
+    def invalidate(self, collection: str):
+        with self._lock:
+            self._indexes.pop(collection, None)
+        try:
+            os.remove(self._path(collection))
+        except FileNotFoundError:
+            pass
+
+    #======== reconcile / persistence loop ======
+    async def reconcile(self):
+        """Rebuild indexes whose size no longer matches Qdrant (e.g. uploads through another worker)."""
+        for collection, index in list(self._indexes.items()):
+            try:
+                count = await asyncio.to_thread(self._qdrant_count, collection)
+                if count != len(index):
+                    log.info(f"♻️ Lexical index for '{collection}' out of sync ({len(index)} vs {count}), rebuilding")
+                    with self._lock:
+                        if collection in self._loading:
+                            continue
+                        self._loading[collection] = []
+                    await self._load(collection, use_cache=False)
+            except Exception as e:
+                log.warning(f"!!! Lexical index reconcile for '{collection}' failed: {str(e)}")
+
+    async def persist(self):
+        for collection, index in list(self._indexes.items()):
+            if index.dirty:
+                try:
+                    await asyncio.to_thread(index.save, self._path(collection))
+                except Exception as e:
+                    log.warning(f"!!! Saving lexical index for '{collection}' failed: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(cfg.lexical.persist_interval_s)
+            await self.reconcile()
+            await self.persist()
+
+    def start(self):
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.persist()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "collections": {name: len(index) for name, index in self._indexes.items()},
+            "loading": sorted(self._loading),
+        }
+
+
+lexical_index = LexicalIndexService()
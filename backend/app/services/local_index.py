@@ -0,0 +1,467 @@
+#app/services/local_index.py
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg, qdrant
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+META_SUFFIX = ".meta.json"
+VECTORS_SUFFIX = ".npy"
+
+
+def stored_since(collection: str, synced_at: Optional[float]) -> bool:
+    """
+    Points stored (or replaced) in Qdrant since a cache file was read
+    from it; such a file may miss them even when the count matches.
+    stored_at is stamped when the points land, so no grace window is needed.
+    """
+    if synced_at is None:
+        return True
+    recent = qmodels.Filter(must=[qmodels.FieldCondition(
+        key="stored_at", range=qmodels.Range(gte=synced_at)
+    )])
+    return qdrant.count(collection_name=collection, count_filter=recent, exact=True).count > 0
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so cosine similarity is a plain dot product."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class LocalIndex:
+    """
+    Normalized float32 matrix + payloads of one cosine collection.
+    Search is one matmul and an argpartition. The matrix may start as a
+    read-only memmap of the cache file; the first write copies it into
+    a growable in-memory buffer (capacity doubles).
+    """
+
+    def __init__(
+            self,
+            dim: int,
+            ids: Sequence = (),
+            vectors: np.ndarray = None,
+            payloads: Sequence[Dict[str, Any]] = None
+            ):
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._ids: List[Any] = list(ids)
+        self._payloads: List[Dict[str, Any]] = list(payloads) if payloads is not None else [{} for _ in self._ids]
+        self._rows: Dict[str, int] = {str(pid): row for row, pid in enumerate(self._ids)}
+        self._vectors = vectors if vectors is not None else np.empty((0, dim), dtype=np.float32)
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self.dirty = False
+        self.synced_at: Optional[float] = None      # Qdrant state the cache file reflects
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _grow(self, extra: int):
+        count = len(self._ids)
+        need = count + extra
+        if need <= self._vectors.shape[0] and self._vectors.flags.writeable:
+            return
+        capacity = max(need, 2 * self._vectors.shape[0], 64)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:count] = self._vectors[:count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:count] = self._alive[:count]
+        self._vectors, self._alive = vectors, alive
+
+    def upsert(self, ids: Sequence, vectors, payloads: Sequence[Dict[str, Any]]):
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        with self._lock:
+            self._grow(len(ids))
+            for pid, vector, payload in zip(ids, vectors, payloads):
+                row = self._rows.get(str(pid))
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(pid)
+                    self._payloads.append(payload or {})
+                    self._rows[str(pid)] = row
+                else:
+                    self._payloads[row] = payload or {}
+                self._vectors[row] = vector
+                self._alive[row] = True
+            self.dirty = True
+
+    def remove(self, ids: Iterable):
+        with self._lock:
+            for pid in ids:
+                row = self._rows.pop(str(pid), None)
+                if row is not None:
+                    self._alive[row] = False
+                    self.dirty = True
+
+    def search(
+            self,
+            query_vector: Sequence[float],
+            limit: int,
+            score_threshold: float = None
+            ) -> List[qmodels.ScoredPoint]:
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        with self._lock:
+            count = len(self._ids)
+            if count == 0 or not self._rows:
+                return []
+            scores = self._vectors[:count] @ query
+            alive = self._alive[:count]
+            if not alive.all():
+                scores = np.where(alive, scores, -np.inf)
+            k = min(limit, count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [
+                qmodels.ScoredPoint(
+                    id=self._ids[row],
+                    version=0,
+                    score=float(scores[row]),
+                    payload=self._payloads[row],
+                )
+                for row in top
+                if alive[row] and (score_threshold is None or scores[row] >= score_threshold)
+            ]
+
+    def records(self) -> Tuple[List[Any], np.ndarray, List[Dict[str, Any]]]:
+        """Live (ids, vectors, payloads), compacted."""
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:len(self._ids)])
+            return (
+                [self._ids[r] for r in rows],
+                np.ascontiguousarray(self._vectors[rows]),
+                [self._payloads[r] for r in rows],
+            )
+
+    #======== cache file ======
+    def save(self, prefix: str, synced_at: float = None):
+        """synced_at: when the data was read from Qdrant (default: now)."""
+        synced_at = time.time() if synced_at is None else synced_at
+        ids, vectors, payloads = self.records()
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        np.save(prefix + VECTORS_SUFFIX, vectors)
+        with open(prefix + META_SUFFIX, "w", encoding="utf-8") as f:
+            json.dump({
+                "dim": self.dim, "count": len(ids), "synced_at": synced_at, "ids": ids, "payloads": payloads,
+            }, f, ensure_ascii=False)
+        self.dirty = False
+        self.synced_at = synced_at
+
+    @classmethod
+    def load(cls, prefix: str) -> "LocalIndex":
+        with open(prefix + META_SUFFIX, encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(prefix + VECTORS_SUFFIX, mmap_mode="r")
+        index = cls(meta["dim"], meta["ids"], vectors, meta["payloads"])
+        index.synced_at = meta.get("synced_at")
+        return index
+
+
+class LocalIndexService:
+    """
+    Serves vector search for small cosine collections from memory.
+    `search()` never blocks on loading: the first query for a collection
+    returns None (caller uses Qdrant) and schedules a background load.
+    Ingestion hooks keep loaded indexes current; a periodic refresh
+    re-scrolls any index whose size no longer matches Qdrant's count.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, LocalIndex] = {}
+        self._loading: Dict[str, List[Tuple[str, Any]]] = {}   # collection -> ops seen while loading
+        self._unsupported: Dict[str, str] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._state_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def enabled_for(self, collection: str) -> bool:
+        if not cfg.local_index.enabled or collection in self._unsupported:
+            return False
+        return not cfg.local_index.collections or collection in cfg.local_index.collections
+
+    def _prefix(self, collection: str) -> str:
+        return os.path.join(cfg.local_index.cache_dir, collection)
+
+    #======== search ======
+    def search(
+            self,
+            collection: str,
+            query_vector: Sequence[float],
+            limit: int,
+            score_threshold: float = None,
+            query_filter: qmodels.Filter = None
+            ) -> Optional[List[qmodels.ScoredPoint]]:
+        """Local hits, or None when the caller should ask Qdrant."""
+        if query_filter is not None or not self.enabled_for(collection):
+            return None
+        index = self._indexes.get(collection)
+        if index is None:
+            self._schedule_load(collection)
+            return None
+        return index.search(query_vector, limit, score_threshold)
+
+    async def asearch(
+            self,
+            collection: str,
+            query_vector: Sequence[float],
+            limit: int,
+            score_threshold: float = None,
+            query_filter: qmodels.Filter = None
+            ) -> Optional[List[qmodels.ScoredPoint]]:
+        """search() for async callers: big matrices are scored in a worker thread."""
+        index = self._indexes.get(collection) if query_filter is None and self.enabled_for(collection) else None
+        if index is None or len(index) <= cfg.local_index.inline_max_points:
+            return self.search(collection, query_vector, limit, score_threshold, query_filter)
+        return await asyncio.to_thread(index.search, query_vector, limit, score_threshold)
+
+    def _schedule_load(self, collection: str):
+        with self._state_lock:
+            if collection in self._loading:
+                return
+            self._loading[collection] = []
+        asyncio.get_running_loop().create_task(self._load(collection))
+
+    async def _load(self, collection: str, use_cache: bool = True):
+        try:
+            index = await asyncio.to_thread(self.build, collection, use_cache)
+        except Exception as e:
+            log.warning(f"!!! Local index for '{collection}' not loaded: {str(e)}")
+            index = None
+        with self._state_lock:
+            pending = self._loading.pop(collection, [])
+            if index is None:
+                return
+            for op, args in pending:
+                if op == "upsert":
+                    index.upsert(*args)
+                else:
+                    index.remove(args)
+            self._indexes[collection] = index
+            self._loaded_at[collection] = time.time()
+
+    def build(self, collection: str, use_cache: bool = True) -> Optional[LocalIndex]:
+        """
+        Load from the cache file when it matches Qdrant's count and nothing
+        was uploaded since it was written, else scroll.
+        """
+        from app.services.snapshot_service import get_vector_params
+
+        params = get_vector_params(collection)
+        if params.distance != qmodels.Distance.COSINE:
+            self._unsupported[collection] = f"distance {params.distance} (cosine only)"
+            return None
+        count = qdrant.count(collection_name=collection, exact=True).count
+        if count > cfg.local_index.max_points:
+            self._unsupported[collection] = f"{count} points > {cfg.local_index.max_points}"
+            log.info(f"Local index skipped for '{collection}': {self._unsupported[collection]}")
+            return None
+
+        prefix = self._prefix(collection)
+        if use_cache and os.path.exists(prefix + META_SUFFIX):
+            index = LocalIndex.load(prefix)
+            if len(index) == count and index.dim == params.size and not stored_since(collection, index.synced_at):
+                log.info(f"⚡ Local index for '{collection}' mapped from cache ({count} points)")
+                return index
+
+        t0 = time.perf_counter()
+        synced_at = time.time()
+        ids, vectors, payloads = [], [], []
+        offset = None
+        while True:
+            points, offset = qdrant.scroll(
+                collection_name=collection,
+                limit=cfg.snapshot.page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for p in points:
+                if isinstance(p.vector, list):
+                    ids.append(p.id)
+                    vectors.append(p.vector)
+                    payloads.append(p.payload or {})
+            if offset is None:
+                break
+        index = LocalIndex(params.size)
+        if ids:
+            index.upsert(ids, np.asarray(vectors, dtype=np.float32), payloads)
+        index.save(prefix, synced_at)
+        log.info(
+            f"⚡ Local index for '{collection}' built from Qdrant: "
+            f"{len(index)} points in {time.perf_counter() - t0:.2f} s"
+        )
+        return index
+
+    #======== ingestion hooks ======
+    def add_points(self, collection: str, points: Sequence[qmodels.PointStruct]):
+        """Called after a successful upsert (any thread)."""
+        if not cfg.local_index.enabled:
+            return
+        points = [p for p in points if isinstance(p.vector, (list, np.ndarray))]
+        if not points:
+            return
+        args = ([p.id for p in points], [p.vector for p in points], [p.payload or {} for p in points])
+        with self._state_lock:
+            if collection in self._loading:
+                self._loading[collection].append(("upsert", args))
+                return
+            index = self._indexes.get(collection)
+        if index is not None:
+            index.upsert(*args)
+
+    def remove_points(self, collection: str, ids: Sequence):
+        if not cfg.local_index.enabled:
+            return
+        with self._state_lock:
+            if collection in self._loading:
+                self._loading[collection].append(("remove", list(ids)))
+                return
+            index = self._indexes.get(collection)
+        if index is not None:
+            index.remove(ids)
+
+    def invalidate(self, collection: str):
+        """Forget the index and its cache (e.g. after a snapshot import)."""
+        with self._state_lock:
+            self._indexes.pop(collection, None)
+            self._unsupported.pop(collection, None)
+        for suffix in (META_SUFFIX, VECTORS_SUFFIX):
+            try:
+                os.remove(self._prefix(collection) + suffix)
+            except FileNotFoundError:
+                pass
+
+    #======== background refresh ======
+    async def refresh(self):
+        """Re-scroll indexes that drifted from Qdrant; persist changed ones."""
+        for collection, index in list(self._indexes.items()):
+            try:
+                count = (await asyncio.to_thread(qdrant.count, collection_name=collection, exact=True)).count
+                if count != len(index):
+                    log.info(f"♻️ Local index for '{collection}' out of sync ({len(index)} vs {count}), reloading")
+                    with self._state_lock:
+                        self._loading.setdefault(collection, [])
+                    await self._load(collection, use_cache=False)
+                elif index.dirty:
+                    await asyncio.to_thread(index.save, self._prefix(collection))
+            except Exception as e:
+                log.warning(f"!!! Local index refresh for '{collection}' failed: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(cfg.local_index.refresh_interval_s)
+            await self.refresh()
+
+    def start(self):
+        if cfg.local_index.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": cfg.local_index.enabled,
+            "collections": {
+                name: {"points": len(index), "dim": index.dim, "loaded_at": self._loaded_at.get(name)}
+                for name, index in self._indexes.items()
+            },
+            "loading": list(self._loading),
+            "unsupported": dict(self._unsupported),
+        }
+
+
+class LocalQdrant:
+    """
+    In-process stand-in for the subset of QdrantClient this backend uses
+    (collections, upsert, search, scroll, count), backed by LocalIndex.
+    Cosine only; payload filters are not supported. Meant for tests and
+    offline experiments: patch("app.services.rag_services.qdrant", LocalQdrant()).
+    """
+
+    def __init__(self):
+        self._collections: Dict[str, LocalIndex] = {}
+
+    def _get(self, collection_name: str) -> LocalIndex:
+        if collection_name not in self._collections:
+            raise ValueError(f"Collection {collection_name} not found")
+        return self._collections[collection_name]
+
+    def get_collections(self) -> qmodels.CollectionsResponse:
+        return qmodels.CollectionsResponse(
+            collections=[qmodels.CollectionDescription(name=name) for name in self._collections]
+        )
+
+    def create_collection(self, collection_name: str, vectors_config: qmodels.VectorParams, **kwargs):
+        if vectors_config.distance != qmodels.Distance.COSINE:
+            raise ValueError("LocalQdrant supports cosine collections only")
+        self._collections[collection_name] = LocalIndex(vectors_config.size)
+        return True
+
+    def delete_collection(self, collection_name: str, **kwargs):
+        return self._collections.pop(collection_name, None) is not None
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema=None, **kwargs):
+        self._get(collection_name)
+
+    def upsert(self, collection_name: str, points: Sequence[qmodels.PointStruct], **kwargs):
+        self._get(collection_name).upsert(
+            [p.id for p in points], [p.vector for p in points], [p.payload or {} for p in points]
+        )
+
+    def search(
+            self,
+            collection_name: str,
+            query_vector: Sequence[float],
+            limit: int = 10,
+            score_threshold: float = None,
+            query_filter: qmodels.Filter = None,
+            **kwargs
+            ) -> List[qmodels.ScoredPoint]:
+        if query_filter is not None:
+            raise ValueError("LocalQdrant does not support payload filters")
+        return self._get(collection_name).search(query_vector, limit, score_threshold)
+
+    def count(self, collection_name: str, **kwargs) -> qmodels.CountResult:
+        return qmodels.CountResult(count=len(self._get(collection_name)))
+
+    def scroll(
+            self,
+            collection_name: str,
+            limit: int = 10,
+            offset: int = None,
+            with_vectors: bool = False,
+            **kwargs
+            ) -> Tuple[List[qmodels.Record], Optional[int]]:
+        ids, vectors, payloads = self._get(collection_name).records()
+        start = offset or 0
+        end = min(start + limit, len(ids))
+        records = [
+            qmodels.Record(
+                id=ids[i],
+                payload=payloads[i],
+                vector=vectors[i].tolist() if with_vectors else None,
+            )
+            for i in range(start, end)
+        ]
+        return records, (end if end < len(ids) else None)
+
+
+local_index = LocalIndexService()
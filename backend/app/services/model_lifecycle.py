@@ -0,0 +1,156 @@
+#app/services/model_lifecycle.py
+import time
+import asyncio
+import logging
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Union
+
+from app.clients import cfg, http_client
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+EMBEDDING = "embedding"
+LLM = "llm"
+
+# Cold loads observed during the current request (see track_cold_loads)
+_request_cold_loads: ContextVar[Optional[Dict[str, bool]]] = ContextVar(
+    "request_cold_loads", default=None
+)
+
+
+def keep_alive_value(value: str) -> Union[str, int]:
+    """Ollama takes durations ("30m") or seconds as a number (-1 = forever)."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def keep_alive_for(kind: str) -> Union[str, int]:
+    value = cfg.ollama.embed_keep_alive if kind == EMBEDDING else cfg.ollama.llm_keep_alive
+    return keep_alive_value(value)
+
+
+@dataclass
+class ModelLoadStats:
+    model: str
+    requests: int = 0
+    cold_loads: int = 0
+    last_load_ms: float = 0.0
+    last_cold_at: Optional[float] = None
+    last_warmed_at: Optional[float] = None
+
+
+_stats: Dict[str, ModelLoadStats] = {}
+
+
+def _stats_for(kind: str, model: str) -> ModelLoadStats:
+    stats = _stats.get(kind)
+    if stats is None or stats.model != model:
+        stats = _stats[kind] = ModelLoadStats(model=model)
+    return stats
+
+
+def is_cold(load_duration_ns: Optional[int]) -> bool:
+    return (load_duration_ns or 0) / 1e6 >= cfg.ollama.cold_load_threshold_ms
+
+
+def record_load(kind: str, model: str, load_duration_ns: Optional[int], track: bool = True) -> bool:
+    """
+    Record Ollama's `load_duration` for one call.
+    Returns True if the model had to be loaded (cold start).
+    track=False leaves the current request's flags alone (the call was
+    made for several requests, see flag_request_load).
+    """
+    stats = _stats_for(kind, model)
+    stats.requests += 1
+    load_ms = (load_duration_ns or 0) / 1e6
+    stats.last_load_ms = round(load_ms, 1)
+    cold = is_cold(load_duration_ns)
+    if cold:
+        stats.cold_loads += 1
+        stats.last_cold_at = time.time()
+        log.warning(f"🥶 Cold load of {kind} model '{model}': {load_ms:.0f} ms")
+    if track:
+        flag_request_load(kind, load_duration_ns)
+    return cold
+
+
+def flag_request_load(kind: str, load_duration_ns: Optional[int]):
+    """Mark the current request cold for a load recorded in another task (a shared batch)."""
+    current = _request_cold_loads.get()
+    if current is not None:
+        current[kind] = current.get(kind, False) or is_cold(load_duration_ns)
+
+
+def track_cold_loads() -> Dict[str, bool]:
+    """Start collecting cold-load flags for the current request/task."""
+    flags: Dict[str, bool] = {}
+    _request_cold_loads.set(flags)
+    return flags
+
+
+def model_status() -> Dict[str, Dict]:
+    return {kind: asdict(stats) for kind, stats in _stats.items()}
+
+
+#======== Warm-up / keep-alive ===========================
+async def warm_model(kind: str) -> bool:
+    """Load a model into Ollama memory (or refresh its keep_alive)."""
+    if kind == EMBEDDING:
+        model = cfg.ollama.embed_model
+        url = f"{cfg.ollama.base_url}/api/embeddings"
+        data = {"model": model, "prompt": "warm-up", "keep_alive": keep_alive_for(kind)}
+    else:
+        model = cfg.ollama.llm_model
+        url = f"{cfg.ollama.base_url}/api/generate"
+        # Empty prompt only loads the model, nothing is generated
+        data = {"model": model, "prompt": "", "stream": False, "keep_alive": keep_alive_for(kind)}
+
+    try:
+        resp = await http_client.post(url, json=data)
+        if resp.status_code != 200:
+            log.warning(f"⚠ Warm-up of '{model}' failed: {resp.text[:200]}")
+            return False
+        load_ns = resp.json().get("load_duration")
+        _stats_for(kind, model).last_warmed_at = time.time()
+        log.info(f"🔥 {kind} model '{model}' warm (load {(load_ns or 0) / 1e6:.0f} ms)")
+        return True
+    except Exception as e:
+        log.warning(f"⚠ Warm-up of '{model}' failed: {e}")
+        return False
+
+
+class ModelKeeper:
+    """Background task: prewarm both models, then periodically refresh keep_alive."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def warm_all(self):
+        await asyncio.gather(warm_model(EMBEDDING), warm_model(LLM))
+
+    async def _run(self):
+        while True:
+            await self.warm_all()
+            if cfg.ollama.keep_alive_refresh_s <= 0:
+                return
+            await asyncio.sleep(cfg.ollama.keep_alive_refresh_s)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+model_keeper = ModelKeeper()
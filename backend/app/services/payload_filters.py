@@ -0,0 +1,82 @@
+#app/services/payload_filters.py
+import logging
+from typing import Any, Dict, List, Optional
+
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg, qdrant
+from app.services.collection_registry import collection_registry
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+# Payload fields written by the ingestion paths
+BASE_PAYLOAD_INDEXES = {
+    "source": qmodels.PayloadSchemaType.KEYWORD,
+    "collection": qmodels.PayloadSchemaType.KEYWORD,
+    "chunk_index": qmodels.PayloadSchemaType.INTEGER,
+    "uploaded_at": qmodels.PayloadSchemaType.FLOAT,     # epoch seconds
+    "stored_at": qmodels.PayloadSchemaType.FLOAT,       # epoch seconds, when the points landed
+}
+
+
+def payload_indexes() -> Dict[str, qmodels.PayloadSchemaType]:
+    """Base fields + configured metadata.<key> fields."""
+    indexes = dict(BASE_PAYLOAD_INDEXES)
+    for key in cfg.searchsettings.indexed_metadata_keys:
+        indexes[f"metadata.{key}"] = qmodels.PayloadSchemaType.KEYWORD
+    return indexes
+
+
+def ensure_payload_indexes(collection: str):
+    """
+    Create the payload indexes filtered search relies on. Without them
+    Qdrant filters by scanning payloads; with them the filter is applied
+    while traversing HNSW. Creating an existing index is a no-op.
+    """
+    for field_name, schema in payload_indexes().items():
+        try:
+            qdrant.create_payload_index(
+                collection_name=collection,
+                field_name=field_name,
+                field_schema=schema,
+            )
+        except Exception as e:
+            log.warning(f"!!! Payload index '{field_name}' on '{collection}' failed: {str(e)}")
+    log.info(f"🗂 Payload indexes ensured on '{collection}': {list(payload_indexes())}")
+
+
+def create_collection(collection: str, vectors_config: qmodels.VectorParams):
+    """Create a collection together with its payload indexes."""
+    qdrant.create_collection(collection_name=collection, vectors_config=vectors_config)
+    collection_registry.register(collection, vectors_config)
+    ensure_payload_indexes(collection)
+
+
+def _match(key: str, value: Any) -> qmodels.FieldCondition:
+    if isinstance(value, list):
+        return qmodels.FieldCondition(key=key, match=qmodels.MatchAny(any=value))
+    return qmodels.FieldCondition(key=key, match=qmodels.MatchValue(value=value))
+
+
+def build_filter(filters) -> Optional[qmodels.Filter]:
+    """
+    SearchFilter -> Qdrant Filter (all conditions must hold).
+    Lists mean "any of"; upload times are a half-open range.
+    """
+    if filters is None:
+        return None
+    must: List[qmodels.FieldCondition] = []
+    if filters.source:
+        must.append(_match("source", filters.source))
+    for key, value in (filters.metadata or {}).items():
+        must.append(_match(f"metadata.{key}", value))
+    if filters.uploaded_after or filters.uploaded_before:
+        must.append(qmodels.FieldCondition(
+            key="uploaded_at",
+            range=qmodels.Range(
+                gte=filters.uploaded_after.timestamp() if filters.uploaded_after else None,
+                lt=filters.uploaded_before.timestamp() if filters.uploaded_before else None,
+            ),
+        ))
+    return qmodels.Filter(must=must) if must else None
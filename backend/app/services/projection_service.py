@@ -0,0 +1,266 @@
+#app/services/projection_service.py
+import io
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from sklearn.decomposition import PCA, IncrementalPCA
+
+from app.clients import cfg, qdrant
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+N_COMPONENTS = 2
+# Above this many points the PNG drops per-point labels
+MAX_LABELED_POINTS = 200
+
+
+@dataclass
+class Projection:
+    """2D PCA projection of one collection."""
+    collection: str
+    ids: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    coords: np.ndarray = field(
+        default_factory=lambda: np.empty((0, N_COMPONENTS), dtype=np.float32)
+    )
+    explained_variance: List[float] = field(default_factory=list)
+    method: str = "none"
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    def sample(self, limit: Optional[int]) -> "Projection":
+        """Evenly strided subset of at most `limit` points."""
+        if not limit or limit >= self.count:
+            return self
+        idx = np.linspace(0, self.count - 1, num=limit).astype(np.int64)
+        return Projection(
+            collection=self.collection,
+            ids=[self.ids[i] for i in idx],
+            sources=[self.sources[i] for i in idx],
+            coords=self.coords[idx],
+            explained_variance=self.explained_variance,
+            method=self.method,
+            created_at=self.created_at,
+        )
+
+    def to_dict(self, decimals: int = 4) -> Dict:
+        """Compact column-oriented JSON payload."""
+        coords = np.round(self.coords.astype(np.float64), decimals)
+        return {
+            "collection": self.collection,
+            "count": self.count,
+            "method": self.method,
+            "explained_variance": [round(v, 4) for v in self.explained_variance],
+            "ids": self.ids,
+            "sources": self.sources,
+            "x": coords[:, 0].tolist(),
+            "y": coords[:, 1].tolist(),
+        }
+
+
+#======== 1. Paging through Qdrant ===========================
+def iter_vector_pages(
+        collection: str,
+        page_size: int = None
+        ) -> Iterator[Tuple[List[str], List[str], np.ndarray]]:
+    """
+    Scroll through the whole collection.
+    Yields (ids, sources, float32 matrix) per page.
+    """
+    page_size = page_size or cfg.projection.page_size
+    offset = None
+    while True:
+        points, offset = qdrant.scroll(
+            collection_name=collection,
+            limit=page_size,
+            offset=offset,
+            with_payload=["source"],
+            with_vectors=True,
+        )
+        ids, sources, vectors = [], [], []
+        for p in points:
+            if not isinstance(p.vector, list) or not p.vector:
+                continue
+            ids.append(str(p.id))
+            sources.append((p.payload or {}).get("source", "unknown"))
+            vectors.append(p.vector)
+        if vectors:
+            yield ids, sources, np.asarray(vectors, dtype=np.float32)
+        if offset is None:
+            break
+
+
+#======== 2. Fitting ===========================
+def compute_projection(collection: str) -> Projection:
+    """
+    Project every vector of a collection to 2D.
+
+    Pages are buffered as float32 while they fit in `max_memory_mb` and
+    projected with randomized PCA. Bigger collections switch to
+    IncrementalPCA: fit while streaming, then a second pass to transform.
+    """
+    t0 = time.perf_counter()
+    budget = cfg.projection.max_memory_mb * 1024 * 1024
+    ipca = IncrementalPCA(n_components=N_COMPONENTS)
+    buffered: List[np.ndarray] = []
+    buffered_bytes = 0
+    pending = None  # pages smaller than n_components are carried over
+    held = None     # last full batch, fitted once the next one (or the remainder) is known
+    streaming = False
+    ids: List[str] = []
+    sources: List[str] = []
+
+    def _partial_fit(batch: np.ndarray):
+        nonlocal pending, held
+        if pending is not None:
+            batch = np.vstack([pending, batch])
+            pending = None
+        if len(batch) < N_COMPONENTS:
+            pending = batch
+            return
+        if held is not None:
+            ipca.partial_fit(held)
+        held = batch
+
+    for page_ids, page_sources, vectors in iter_vector_pages(collection):
+        ids.extend(page_ids)
+        sources.extend(page_sources)
+        if streaming:
+            _partial_fit(vectors)
+            continue
+        buffered.append(vectors)
+        buffered_bytes += vectors.nbytes
+        if buffered_bytes > budget:
+            streaming = True
+            for b in buffered:
+                _partial_fit(b)
+            buffered = []
+
+    if len(ids) < N_COMPONENTS:
+        coords = np.zeros((len(ids), N_COMPONENTS), dtype=np.float32)
+        return Projection(collection, ids, sources, coords, [], "none")
+
+    if not streaming:
+        pca = PCA(n_components=N_COMPONENTS, svd_solver="randomized", random_state=0)
+        coords = pca.fit_transform(np.vstack(buffered))
+        explained, method = pca.explained_variance_ratio_, "randomized_pca"
+    else:
+        # Rows too few to fit on their own go with the held-back batch, each row fitted once
+        ipca.partial_fit(np.vstack([b for b in (held, pending) if b is not None]))
+        # Second pass: the collection may have changed, so ids are re-read too
+        ids, sources, parts = [], [], []
+        for page_ids, page_sources, vectors in iter_vector_pages(collection):
+            ids.extend(page_ids)
+            sources.extend(page_sources)
+            parts.append(ipca.transform(vectors))
+        # Emptied between the two passes
+        coords = np.vstack(parts) if parts else np.zeros((0, N_COMPONENTS), dtype=np.float32)
+        explained, method = ipca.explained_variance_ratio_, "incremental_pca"
+
+    log.info(
+        f"📉 Projected {len(ids)} vectors from '{collection}' "
+        f"with {method} in {(time.perf_counter() - t0):.2f} s"
+    )
+    return Projection(
+        collection=collection,
+        ids=ids,
+        sources=sources,
+        coords=coords.astype(np.float32),
+        explained_variance=[float(v) for v in explained],
+        method=method,
+    )
+
+
+#======== 3. Rendering ===========================
+def render_png(projection: Projection) -> bytes:
+    """
+    Render a projection to PNG.
+    Uses the object-oriented Figure API (no pyplot global state),
+    so it is safe to call from worker threads.
+    """
+    fig = Figure(figsize=(7, 7))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    if not projection.count:
+        ax.text(0.5, 0.5, "No vectors found", ha="center", va="center")
+    else:
+        x, y = projection.coords[:, 0], projection.coords[:, 1]
+        size = 40 if projection.count <= MAX_LABELED_POINTS else 4
+        ax.scatter(x, y, s=size, alpha=0.7, linewidths=0)
+        if projection.count <= MAX_LABELED_POINTS:
+            for i, (px, py) in enumerate(zip(x, y)):
+                ax.text(px + 0.02, py + 0.02, f"v{i}", fontsize=8)
+        ax.set_title(
+            f"PCA projection of {projection.count} vectors "
+            f"from '{projection.collection}'"
+        )
+        ax.grid(True, linestyle="--", alpha=0.3)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=150)
+    return buf.getvalue()
+
+
+#======== 4. Cached service ===========================
+class ProjectionService:
+    """
+    Per-collection projection cache.
+    Concurrent requests for the same collection share one computation;
+    ingestion calls `invalidate()` so the next request recomputes.
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, Projection] = {}
+        self._versions: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def invalidate(self, collection: str):
+        """Drop the cached projection of a collection."""
+        self._versions[collection] = self._versions.get(collection, 0) + 1
+        self._cache.pop(collection, None)
+
+    def clear(self):
+        for name in list(self._cache):
+            self.invalidate(name)
+
+    def _fresh(self, collection: str) -> Optional[Projection]:
+        cached = self._cache.get(collection)
+        if cached and time.time() - cached.created_at < cfg.projection.cache_ttl_s:
+            return cached
+        return None
+
+    async def get(self, collection: str) -> Projection:
+        """Cached projection, computed off the event loop on a miss."""
+        cached = self._fresh(collection)
+        if cached:
+            return cached
+
+        lock = self._locks.setdefault(collection, asyncio.Lock())
+        async with lock:
+            cached = self._fresh(collection)
+            if cached:
+                return cached
+            version = self._versions.get(collection, 0)
+            projection = await asyncio.to_thread(compute_projection, collection)
+            # Don't cache a result that was invalidated while computing
+            if self._versions.get(collection, 0) == version:
+                self._cache[collection] = projection
+            return projection
+
+    async def render(self, projection: Projection) -> bytes:
+        return await asyncio.to_thread(render_png, projection)
+
+
+projection_service = ProjectionService()
@@ -0,0 +1,198 @@
+#app/services/query_log.py
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.clients import cfg
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+COLUMNS = (
+    "ts", "endpoint", "query", "collection", "top_k", "request",
+    "hit_ids", "scores", "embedding_ms", "search_ms", "llm_ms", "total_ms",
+    "answer_chars", "degraded", "status",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    query TEXT NOT NULL,
+    collection TEXT,
+    top_k INTEGER,
+    request TEXT,           -- JSON body, re-sent verbatim by replay
+    hit_ids TEXT,           -- JSON list
+    scores TEXT,            -- JSON list
+    embedding_ms REAL,
+    search_ms REAL,
+    llm_ms REAL,
+    total_ms REAL,
+    answer_chars INTEGER,
+    degraded INTEGER,
+    status INTEGER
+);
+CREATE INDEX IF NOT EXISTS queries_ts ON queries (ts);
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def entry_from_result(
+        endpoint: str,
+        request: Dict[str, Any],
+        result: Dict[str, Any],
+        total_ms: float,
+        status: int = 200
+        ) -> Dict[str, Any]:
+    """Flatten a /search or /search_with_llm response into one log row."""
+    hits = result.get("results") or []
+    timing = result.get("timing") or {}
+    answer = result.get("answer")
+    return {
+        "ts": time.time(),
+        "endpoint": endpoint,
+        "query": request.get("query", ""),
+        "collection": result.get("collection") or request.get("collection"),
+        "top_k": request.get("top_k"),
+        "request": json.dumps(request, ensure_ascii=False),
+        "hit_ids": json.dumps([str(h.get("id")) for h in hits]),
+        "scores": json.dumps([h.get("score") for h in hits]),
+        "embedding_ms": timing.get("embedding", result.get("embedding_time_ms")),
+        "search_ms": timing.get("search"),
+        # generate_rag_answer reports llm/total in seconds
+        "llm_ms": timing["llm"] * 1000 if "llm" in timing else None,
+        "total_ms": round(total_ms, 1),
+        "answer_chars": len(answer) if isinstance(answer, str) else None,
+        "degraded": int(bool(result.get("degraded"))),
+        "status": status,
+    }
+
+
+class QueryLog:
+    """
+    Append-only query log. `record()` only enqueues; one background
+    task writes batches to SQLite in a worker thread, so the request
+    path never waits on disk. When the queue is full entries are dropped
+    (and counted) rather than slowing requests down.
+    """
+
+    def __init__(self, path: str = None, enabled: bool = None):
+        self.path = path or cfg.query_log.path
+        self.enabled = cfg.query_log.enabled if enabled is None else enabled
+        self.written = 0
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def record(self, entry: Dict[str, Any]):
+        if not self.enabled:
+            return
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=cfg.query_log.queue_size)
+            self._task = asyncio.create_task(self._writer(), name="query-log")
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        if self._conn is None:
+            self._conn = connect(self.path)
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO queries ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [tuple(row.get(c) for c in COLUMNS) for row in rows],
+            )
+        self.written += len(rows)
+
+    async def _writer(self):
+        queue = self._queue
+        while True:
+            rows = [await queue.get()]
+            while len(rows) < cfg.query_log.batch_size and not queue.empty():
+                rows.append(queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception as e:
+                self.dropped += len(rows)
+                log.warning(f"!!! Query log write failed: {str(e)}")
+            finally:
+                for _ in rows:
+                    queue.task_done()
+
+    async def flush(self):
+        if self._queue is not None and self._task is not None and not self._task.done():
+            await self._queue.join()
+
+    async def stop(self):
+        """Write what's queued, then stop the writer."""
+        await self.flush()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+def read_window(
+        path: str,
+        since: float = None,
+        until: float = None,
+        endpoint: str = None,
+        limit: int = None
+        ) -> List[Dict[str, Any]]:
+    """Logged requests (oldest first) within [since, until)."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Query log not found: {path}")
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("ts >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("ts < ?")
+        params.append(until)
+    if endpoint:
+        clauses.append("endpoint = ?")
+        params.append(endpoint)
+    sql = "SELECT * FROM queries"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY ts"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+query_log = QueryLog()
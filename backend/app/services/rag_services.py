@@ -2,11 +2,36 @@
 import os
 import time
 import uuid
-from typing import List, Dict, Any
+import asyncio
+import httpx
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 from fastapi import HTTPException
 
-from app.clients import cfg, qdrant, http_client
+from app.clients import cfg, qdrant, http_client, ollama_breaker
+from app.services.model_lifecycle import (
+    EMBEDDING,
+    LLM,
+    keep_alive_for,
+    record_load,
+    flag_request_load,
+    track_cold_loads,
+)
+from app.services.resilience import (
+    CircuitOpenError,
+    Deadline,
+    LatencyTracker,
+    RetryableError,
+    hedged,
+    retry_async,
+)
+from app.services.payload_filters import build_filter, create_collection as create_indexed_collection
+from app.services.local_index import local_index
+from app.services.lexical_index import lexical_index, is_identifier_query, rrf_fuse
+from app.services.context_compression import compress_context
+from app.services.cache import answer_cache, embedding_cache
+from app.services.concurrency import MicroBatcher
+from app.services.collection_registry import collection_registry
 from qdrant_client.http import models as qmodels
 
 # ========= Logger setup =========
@@ -14,50 +39,480 @@ log = logging.getLogger(__name__)
 
 
 #======== 1.  _get embedding ===========================
-async def _get_embedding(text: str) -> List[float]:
-    """ Get text embedding via Ollama  """
-    t0 = time.perf_counter()
-    data = {"model": cfg.ollama.embed_model, "prompt":text}    
-    resp = await http_client.post(f"{cfg.ollama.base_url}/api/embeddings", json=data)
-    elapsed_embedding = (time.perf_counter() - t0) * 1000
+# Recent embedding latencies, used to pick the hedging delay
+embed_latency = LatencyTracker(window=200)
+embed_transport_stats: Dict[str, int] = {}
+
+
+def _embed_backends() -> List[str]:
+    return [cfg.ollama.base_url] + [
+        u for u in cfg.ollama.embed_hedge_urls if u != cfg.ollama.base_url
+    ]
+
 
-    if resp.status_code != 200:    
+def _hedge_delay_s() -> float:
+    """p95 (configurable) of recent embedding latency, at least hedge_min_delay_ms."""
+    observed = embed_latency.percentile(cfg.ollama.hedge_percentile) if len(embed_latency) >= 20 else 0
+    return max(observed, cfg.ollama.hedge_min_delay_ms) / 1000
+
+
+async def _post_embedding(base_url: str, text: str, model: str = None) -> Dict[str, Any]:
+    """One embedding call against one Ollama backend, bounded by embed_timeout_s."""
+    data = {
+        "model": model or cfg.ollama.embed_model,
+        "prompt": text,
+        "keep_alive": keep_alive_for(EMBEDDING)
+    }
+    try:
+        resp = await asyncio.wait_for(
+            http_client.post(f"{base_url}/api/embeddings", json=data),
+            timeout=cfg.ollama.embed_timeout_s
+        )
+    except asyncio.TimeoutError:
+        # The transport only sees a cancellation; a missed deadline is an upstream failure
+        ollama_breaker(base_url).record_failure()
+        raise
+    if resp.status_code == 429 or resp.status_code >= 500:
+        raise RetryableError(f"Ollama embedding error {resp.status_code}: {resp.text}")
+    if resp.status_code != 200:
         raise HTTPException(
             status_code=500, detail=f"Ollama enbedding error: {resp.text}"
             )
-    embedding = resp.json(). get("embedding", [])
+    return resp.json()
+
+
+async def _get_embedding(text: str, model: str = None) -> List[float]:
+    """
+    Get text embedding via Ollama (`model` defaults to OLLAMA_EMBED_MODEL).
+    Embeddings are idempotent, so slow calls are hedged to another
+    backend and failed ones retried with jittered backoff.
+    """
+    model = model or cfg.ollama.embed_model
+    t0 = time.perf_counter()
+    try:
+        body = await retry_async(
+            lambda: hedged(
+                lambda url: _post_embedding(url, text, model),
+                _embed_backends(),
+                _hedge_delay_s(),
+                stats=embed_transport_stats
+            ),
+            retries=cfg.ollama.embed_retries,
+            base_delay_s=cfg.ollama.retry_base_delay_s,
+            max_delay_s=cfg.ollama.retry_max_delay_s,
+            stats=embed_transport_stats
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Ollama embedding timed out after {cfg.ollama.embed_timeout_s} s"
+            )
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=f"Ollama unavailable: {e}")
+    except (RetryableError, httpx.TransportError) as e:
+        raise HTTPException(status_code=500, detail=f"Ollama enbedding error: {e}")
+    elapsed_embedding = (time.perf_counter() - t0) * 1000
+    embed_latency.observe(elapsed_embedding)
+
+    embedding = body.get("embedding", [])
+    # /api/embeddings only reports load_duration on newer Ollama versions
+    if "load_duration" in body:
+        record_load(EMBEDDING, model, body["load_duration"])
 
     # check for empty embedding
     if not embedding:
         raise HTTPException(status_code=500, detail="LLM returned empty embedding")
+    collection_registry.record_embed_dim(model, len(embedding))
     log.info(
         f" Embedding done in {elapsed_embedding:.1f} ms"
         f" ({len(embedding)} dims, {len(text)} chars)"
         )
     return embedding, elapsed_embedding
+
+
+async def _post_embedding_batch(base_url: str, texts: List[str]) -> Dict[str, Any]:
+    """One batched /api/embed call against one Ollama backend."""
+    data = {
+        "model": cfg.ollama.embed_model,
+        "input": texts,
+        "keep_alive": keep_alive_for(EMBEDDING)
+    }
+    try:
+        resp = await asyncio.wait_for(
+            http_client.post(f"{base_url}/api/embed", json=data),
+            timeout=cfg.ollama.embed_timeout_s
+        )
+    except asyncio.TimeoutError:
+        ollama_breaker(base_url).record_failure()
+        raise
+    if resp.status_code == 429 or resp.status_code >= 500:
+        raise RetryableError(f"Ollama embedding error {resp.status_code}: {resp.text}")
+    if resp.status_code != 200:
+        raise HTTPException(
+            status_code=500, detail=f"Ollama enbedding error: {resp.text}"
+            )
+    return resp.json()
+
+
+async def _embed_batch(texts: List[str]) -> Tuple[List[List[float]], Optional[int]]:
+    """
+    Embeddings of several texts in one call, hedged and retried like
+    _get_embedding, with Ollama's load_duration (recorded by the caller).
+    """
+    t0 = time.perf_counter()
+    try:
+        body = await retry_async(
+            lambda: hedged(
+                lambda url: _post_embedding_batch(url, texts),
+                _embed_backends(),
+                _hedge_delay_s(),
+                stats=embed_transport_stats
+            ),
+            retries=cfg.ollama.embed_retries,
+            base_delay_s=cfg.ollama.retry_base_delay_s,
+            max_delay_s=cfg.ollama.retry_max_delay_s,
+            stats=embed_transport_stats
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Ollama embedding timed out after {cfg.ollama.embed_timeout_s} s"
+            )
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=f"Ollama unavailable: {e}")
+    except (RetryableError, httpx.TransportError) as e:
+        raise HTTPException(status_code=500, detail=f"Ollama enbedding error: {e}")
+    elapsed = (time.perf_counter() - t0) * 1000
+    embed_latency.observe(elapsed)
+
+    embeddings = body.get("embeddings") or []
+    if len(embeddings) != len(texts) or not all(embeddings):
+        raise HTTPException(status_code=500, detail="LLM returned empty embedding")
+    collection_registry.record_embed_dim(cfg.ollama.embed_model, len(embeddings[0]))
+    log.info(f" Batch embedding of {len(texts)} texts done in {elapsed:.1f} ms")
+    return embeddings, body.get("load_duration")
+
+
+async def _get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Embeddings of several texts in one call."""
+    embeddings, load_ns = await _embed_batch(texts)
+    record_load(EMBEDDING, cfg.ollama.embed_model, load_ns)
+    return embeddings
+
+
+async def _send_query_batch(texts: List[str]) -> List[Tuple[List[float], Optional[int]]]:
+    """
+    The batch task runs in the context of whichever query opened it, so
+    the load duration goes back with every result and each caller flags
+    its own request.
+    """
+    embeddings, load_ns = await _embed_batch(texts)
+    record_load(EMBEDDING, cfg.ollama.embed_model, load_ns, track=False)
+    return [(embedding, load_ns) for embedding in embeddings]
+
+
+# Concurrent query embeddings share one /api/embed call (OLLAMA_EMBED_BATCHING)
+query_embed_batcher = MicroBatcher(
+    "query-embedding",
+    _send_query_batch,
+    max_size=cfg.ollama.embed_batch_max_size,
+    max_wait_ms=cfg.ollama.embed_batch_window_ms,
+)
    
     
 #========= 2. generate response  via llm   ========================
-async def _generate_llm_response(prompt: str) -> str:
-    """Generate answer via LLM"""
+class LlmThroughput:
+    """EWMA of Ollama prefill / decode speed (tokens/s), from generate timings."""
+
+    def __init__(self, prefill: float, decode: float, alpha: float = 0.3):
+        self.prefill = prefill
+        self.decode = decode
+        self.alpha = alpha
+
+    def _ewma(self, old: float, count, duration_ns) -> float:
+        if not count or not duration_ns:
+            return old
+        return (1 - self.alpha) * old + self.alpha * (count / (duration_ns / 1e9))
+
+    def observe(self, body: Dict[str, Any]):
+        self.prefill = self._ewma(self.prefill, body.get("prompt_eval_count"), body.get("prompt_eval_duration"))
+        self.decode = self._ewma(self.decode, body.get("eval_count"), body.get("eval_duration"))
+
+
+llm_throughput = LlmThroughput(cfg.budget.prefill_tokens_per_s, cfg.budget.decode_tokens_per_s)
+
+
+async def _ollama_generate(
+        prompt: str,
+        context: List[int] = None,
+        options: Dict[str, Any] = None,
+        timeout: float = None
+        ) -> Tuple[Dict[str, Any], float]:
+    """
+    One /api/generate call (single attempt, bounded by llm_timeout_s
+    or a shorter per-request `timeout`).
+    `context` is the token state Ollama returned for a previous turn:
+    passing it back skips re-prefilling that conversation.
+    Returns (response body, elapsed seconds).
+    """
     t0 = time.perf_counter()
-    data = {"model": cfg.ollama.llm_model, "prompt": prompt, "stream": False}
-    resp = await http_client.post(f"{cfg.ollama.base_url}/api/generate", json=data)
+    data = {
+        "model": cfg.ollama.llm_model,
+        "prompt": prompt,
+        "stream": False,
+        "keep_alive": keep_alive_for(LLM)
+    }
+    if context:
+        data["context"] = context
+    if options:
+        data["options"] = options
+    limit_s = cfg.ollama.llm_timeout_s if timeout is None else min(timeout, cfg.ollama.llm_timeout_s)
+    try:
+        resp = await asyncio.wait_for(
+            http_client.post(f"{cfg.ollama.base_url}/api/generate", json=data),
+            timeout=limit_s
+        )
+    except asyncio.TimeoutError:
+        # A caller's short deadline says nothing about Ollama's health
+        if limit_s >= cfg.ollama.llm_timeout_s:
+            ollama_breaker().record_failure()
+        raise HTTPException(
+            status_code=504,
+            detail=f"Ollama generation timed out after {limit_s:.1f} s"
+            )
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=f"Ollama unavailable: {e}")
     elapsed_generated = (time.perf_counter() - t0)
     if resp.status_code != 200:
         raise HTTPException(
             status_code=500, detail=f"Ollama generation error: {resp.text}"
             ) 
-    answer = resp.json().get("response", "").strip() or "No answer generated."  
+    body = resp.json()
+    record_load(LLM, cfg.ollama.llm_model, body.get("load_duration"))
+    llm_throughput.observe(body)
+    return body, elapsed_generated
+
+
+async def _generate_llm_response(prompt: str) -> str:
+    """Generate answer via LLM (single attempt, bounded by llm_timeout_s)"""
+    body, elapsed_generated = await _ollama_generate(prompt)
+    answer = body.get("response", "").strip() or "No answer generated."  
     log.info(f" LLM response ready in {elapsed_generated:.2f} s ({len(answer)} chars)")
     return answer, elapsed_generated
 
 
+def select_context(texts: List[str], max_chars: int = None) -> List[str]:
+    """Take chunks in rank order until the character budget is used up."""
+    max_chars = cfg.budget.max_context_chars if max_chars is None else max_chars
+    parts = []
+    current_length = 0
+    for text in texts:
+        if current_length + len(text) > max_chars:
+            break
+        parts.append(text)
+        current_length += len(text)
+    return parts
+
+
+def build_prompt(context: str, query: str) -> str:
+    return f"""
+        You are a scientific assistant. 
+        Use ONLY the information from the context below to answer the question.
+        Do NOT repeat the question, do NOT speculate, and do NOT answer philosophically.
+        If the answer is not clearly in the context, say: "Answer not found in the documents."
+
+        Context:
+        {context}
+
+        Question: {query}
+
+        Answer concisely and factually (in the same language as the question):
+        """
+
+
+# Rough chars-per-token ratio for budgeting prompts
+CHARS_PER_TOKEN = 4
+RETRIEVAL_ONLY_ANSWER = "Not enough time left to generate an answer; see the retrieved documents."
+
+
+def plan_generation(remaining_s: float) -> Dict[str, int]:
+    """
+    Split the time left between prefill and decoding, using measured
+    Ollama throughput: how many context chars we can afford to prefill
+    and how many tokens we can afford to generate.
+    """
+    b = cfg.budget
+    decode_s = remaining_s * b.decode_share
+    num_predict = int(llm_throughput.decode * decode_s)
+    num_predict = max(b.min_num_predict, min(b.max_num_predict, num_predict))
+    prefill_s = max(0.0, remaining_s - num_predict / max(llm_throughput.decode, 1e-6))
+    context_chars = int(llm_throughput.prefill * prefill_s * CHARS_PER_TOKEN)
+    return {
+        "num_predict": num_predict,
+        "context_chars": max(0, min(b.max_context_chars, context_chars)),
+    }
+
+
+def size_num_ctx(prompt_chars: int, num_predict: int) -> int:
+    """
+    Smallest power-of-two window that fits prompt + answer. Rounding keeps
+    the set of sizes small: Ollama reloads the model when num_ctx changes.
+    """
+    needed = prompt_chars // CHARS_PER_TOKEN + num_predict
+    num_ctx = cfg.budget.min_num_ctx
+    while num_ctx < needed and num_ctx < cfg.budget.max_num_ctx:
+        num_ctx *= 2
+    return min(num_ctx, cfg.budget.max_num_ctx)
+
+
 #=============== 3. Main RAG pipeline =============
+def hit_text(payload: Dict[str, Any], result_mode: str, preview_chars: int = None) -> Dict[str, str]:
+    """Text fields of one search hit for the requested result_mode."""
+    text = (payload or {}).get("text", "")
+    if result_mode == "full":
+        return {"text": text}
+    if result_mode == "preview":
+        return {"text_preview": text[:preview_chars or cfg.response.preview_chars]}
+    return {}
+
+
+def format_hits(hits, result_mode: str, preview_chars: int = None) -> List[Dict[str, Any]]:
+    """Ranked search hits as returned by the API."""
+    return [
+        {
+            "id": h.id,
+            "rank": i + 1,
+            "score": round(h.score, 3),
+            "source": h.payload.get("source", "unknown"),
+            **hit_text(h.payload, result_mode, preview_chars),
+        }
+        for i, h in enumerate(hits)
+    ]
+
+
+def payload_selector(result_mode: str):
+    """Don't pull chunk texts out of Qdrant when only IDs are returned."""
+    return ["source", "chunk_index"] if result_mode == "ids" else True
+
+
+async def _get_query_embedding(query: str, model: str = None) -> Tuple[List[float], float]:
+    """
+    Query embedding through the shared embedding cache (0 ms on a hit);
+    misses are micro-batched with concurrent queries when enabled.
+    Collections pinned to another embedding model are embedded one by one.
+    """
+    model = model or cfg.ollama.embed_model
+    key = embedding_cache.key(model, query)
+    cached = await embedding_cache.aget_vector(key)
+    if cached is not None:
+        return cached.tolist(), 0.0
+    if model != cfg.ollama.embed_model:
+        query_vec, embedding_ms = await _get_embedding(query, model=model)
+    elif cfg.ollama.embed_batching:
+        t0 = time.perf_counter()
+        query_vec, load_ns = await query_embed_batcher.submit(query)
+        flag_request_load(EMBEDDING, load_ns)
+        embedding_ms = (time.perf_counter() - t0) * 1000
+    else:
+        query_vec, embedding_ms = await _get_embedding(query)
+    await embedding_cache.aset_vector(key, query_vec)
+    return query_vec, embedding_ms
+
+
+async def _dense_search(
+        collection: str,
+        query_vec: List[float],
+        limit: int,
+        query_filter,
+        with_payload=True,
+        score_threshold: float = None
+        ):
+    score_threshold = cfg.qdrant.score_threshold if score_threshold is None else score_threshold
+    hits = await local_index.asearch(collection, query_vec, limit, score_threshold, query_filter)
+    if hits is None:
+        hits = qdrant.search(
+            collection_name=collection,
+            query_vector=query_vec,
+            query_filter=query_filter,
+            limit=limit,
+            with_payload=with_payload,
+            score_threshold=score_threshold,
+        )
+    return hits
+
+
+async def retrieve(
+        query: str,
+        collection: str,
+        top_k: int,
+        filters=None,
+        mode: str = "auto",
+        with_payload=True,
+        embed_timeout: float = None,
+        score_threshold: float = None,
+        embed_model: str = None
+        ) -> Dict[str, Any]:
+    """
+    Find the top_k chunks for a query.
+    - dense:   embedding + vector search (local index or Qdrant)
+    - lexical: BM25 only, no embedding call
+    - hybrid:  both, fused by reciprocal rank
+    - auto:    lexical for identifier-like queries that have lexical
+               hits, dense otherwise
+    Lexical needs the index to be loaded and no payload filters; when it
+    can't answer, the request falls back to dense.
+    score_threshold / embed_model default to the collection's (see
+    collection_registry.defaults()); an alias is resolved to its collection.
+    Returns {"hits", "embedding_ms", "search_ms", "retrieval", "query_vec"}.
+    """
+    if score_threshold is None or embed_model is None:
+        defaults = collection_registry.defaults(collection)
+        score_threshold = defaults.score_threshold if score_threshold is None else score_threshold
+        embed_model = embed_model or defaults.embed_model
+    # Aliases resolve on every query (blue/green re-indexing)
+    collection = collection_registry.resolve(collection)
+
+    lexical_hits = None
+    lexical_ms = 0.0
+    if mode != "dense" and filters is None and (mode != "auto" or is_identifier_query(query)):
+        t0 = time.perf_counter()
+        # hybrid fuses deeper lists than it returns
+        lexical_hits = await lexical_index.asearch(collection, query, top_k if mode != "hybrid" else top_k * 3)
+        lexical_ms = (time.perf_counter() - t0) * 1000
+
+    if lexical_hits is not None and (mode == "lexical" or (mode == "auto" and lexical_hits)):
+        return {"hits": lexical_hits, "embedding_ms": 0.0, "search_ms": lexical_ms, "retrieval": "lexical", "query_vec": None}
+
+    if embed_timeout is not None:
+        query_vec, embedding_ms = await asyncio.wait_for(
+            _get_query_embedding(query, embed_model), timeout=embed_timeout
+        )
+    else:
+        query_vec, embedding_ms = await _get_query_embedding(query, embed_model)
+
+    t0 = time.perf_counter()
+    query_filter = build_filter(filters)
+    if mode == "hybrid" and lexical_hits is not None:
+        dense_hits = await _dense_search(collection, query_vec, top_k * 3, query_filter, score_threshold=score_threshold)
+        hits = rrf_fuse([dense_hits, lexical_hits], top_k)
+        used = "hybrid"
+    else:
+        hits = await _dense_search(collection, query_vec, top_k, query_filter, with_payload, score_threshold)
+        used = "dense"
+    search_ms = (time.perf_counter() - t0) * 1000 + lexical_ms
+    return {"hits": hits, "embedding_ms": embedding_ms, "search_ms": search_ms, "retrieval": used, "query_vec": query_vec}
+
+
 async def generate_rag_answer(
         query: str,
         top_k: int = None,
-        collection: str = None
+        collection: str = None,
+        result_mode: str = "preview",
+        preview_chars: int = None,
+        deadline_ms: int = None,
+        filters=None,
+        retrieval: str = "auto",
+        compress: bool = None
         ) -> Dict[str, Any]:
     """
     Full RAG-pipeline:
@@ -65,79 +520,179 @@ async def generate_rag_answer(
     2. Find in Qdrant
     3. Promt formig
     4. Answer generation
+
+    With a deadline the context size, num_predict and num_ctx are
+    sized to the time left; if generation can't fit (or times out)
+    the retrieval results are returned with degraded=True.
+    `filters` (models.SearchFilter) restricts the search by payload;
+    `retrieval` picks dense / lexical / hybrid / auto (see retrieve()).
+    `compress` (default COMPRESSION_ENABLED) sends only the sentences
+    most relevant to the query instead of whole chunks.
+    With CACHE_ANSWER_TTL set, complete answers are served from the
+    shared cache for identical requests.
     """
     if not query:
         raise ValueError("Query cannot be empty")
     
-    # Using parametrs or fallback on cfg
-    top_k = top_k if top_k is None else cfg.searchsettings.top_k
-    collection = collection or cfg.qdrant.collections
+    # Using parametrs or fallback on the collection's defaults / cfg
+    requested = collection or cfg.qdrant.collection
+    if await collection_registry.amissing(requested):
+        raise HTTPException(status_code=404, detail=f"Collection '{requested}' not found")
+    defaults = collection_registry.defaults(requested)
+    top_k = top_k or defaults.top_k
+    # Aliases resolve on every query, so a re-index switch applies at once
+    collection = collection_registry.resolve(requested)
+    deadline_ms = cfg.budget.default_deadline_ms if deadline_ms is None else deadline_ms
+    deadline = Deadline(deadline_ms / 1000) if deadline_ms else None
     
     log.info(f"Starting RAG for query: '{query[:80]}..' (top_k={top_k})")
     total_start = time.perf_counter()
-    
-    # 1.request embedding=================
-    query_vec, embedding_ms = await _get_embedding(query)
 
-    # 2. Search in Qdrant =================
-    t0 = time.perf_counter()
-    hits = qdrant.search(
-        collection_name=collection,
-        query_vector=query_vec,
-        limit=top_k,
-        with_payload=True,
-        score_threshold=cfg.qdrant.score_threshold,
-    )
-    search_ms = (time.perf_counter() - t0) * 1000
+    cache_key = None
+    if answer_cache.ttl_s > 0:
+        compress = cfg.compression.enabled if compress is None else compress
+        cache_key = answer_cache.key(
+            query, top_k, collection, result_mode, preview_chars, retrieval, compress,
+            filters.model_dump_json() if filters is not None else None,
+            cfg.ollama.llm_model, defaults.embed_model, defaults.score_threshold,
+        )
+        cached = await answer_cache.aget_json(cache_key)
+        if cached is not None:
+            log.info(f"⚡ Answer served from cache")
+            # Nothing was embedded, searched or generated for this request
+            cached["cached"] = True
+            cached["timing"] = {
+                "embedding": 0.0, "search": 0.0, "llm": 0.0,
+                "total": round(time.perf_counter() - total_start, 4),
+            }
+            cached["cold_load"] = {"embedding": False, "llm": False}
+            return cached
+    cold_loads = track_cold_loads()
+    
+    # 1-2. request embedding + search (or lexical fast path) =================
+    try:
+        retrieved = await retrieve(
+            query,
+            collection,
+            top_k,
+            filters=filters,
+            mode=retrieval,
+            embed_timeout=deadline.budget_s * cfg.budget.embed_share if deadline else None,
+            score_threshold=defaults.score_threshold,
+            embed_model=defaults.embed_model
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Deadline of {deadline_ms} ms exceeded while embedding")
+    hits = retrieved["hits"]
+    embedding_ms, search_ms = retrieved["embedding_ms"], retrieved["search_ms"]
     context_texts = [h.payload["text"] for h in hits if "text" in h.payload]
     scores = [h.score for h in hits]
 
     log.info(
-        f" Qdrant search done in {search_ms:.1f} ms"
+        f" {retrieved['retrieval'].capitalize()} search done in {search_ms:.1f} ms"
         f"({len(context_texts)} chunks, scores: {[f'{s:.3f}' for s in scores]})"
         )
     
     if not context_texts:
         log.warning("!!! No relevant documents found.")
+        # Same shape as a generated answer, without the LLM call
         return {
             "query": query,
             "answer": "No relevant documents found.",
             "context_used": 0,
             "model": cfg.ollama.llm_model,
+            "results": format_hits(hits, result_mode, preview_chars),
+            "models": {
+                "llm": cfg.ollama.llm_model,
+                "embedding": defaults.embed_model
+            },
             "collection": collection,
+            "retrieval": retrieved["retrieval"],
+            "timing": {
+                "embedding": round(embedding_ms, 1),
+                "search": round(search_ms, 1),
+                "llm": 0.0,
+                "total": round(time.perf_counter() - total_start, 2),
+            },
+            "cold_load": {
+                "embedding": cold_loads.get(EMBEDDING, False),
+                "llm": False,
+            },
+            "degraded": False,
+            "degraded_reason": None,
+            "budget": {"deadline_ms": deadline_ms, "context_chars": 0} if deadline else None,
             }
         
     
     # 3. Build prompt ==============
-    # We limit by the numbers of chunks, not by characters
-    max_context_chars = 6000
-    context_parts = []
-    current_length = 0
-
-    for text in context_texts:
-        if current_length + len(text) > max_context_chars:
-            break
-        context_parts.append(text)
-        current_length += len(text)
-
-    context = "\n\n".join(context_parts)
-
-    prompt = f"""
-        You are a scientific assistant. 
-        Use ONLY the information from the context below to answer the question.
-        Do NOT repeat the question, do NOT speculate, and do NOT answer philosophically.
-        If the answer is not clearly in the context, say: "Answer not found in the documents."
-
-        Context:
-        {context}
-
-        Question: {query}
-
-        Answer concisely and factually (in the same language as the question):
-        """
+    plan, options, degraded_reason = None, None, None
+    if deadline:
+        remaining_s = deadline.remaining()
+        if remaining_s * 1000 < cfg.budget.min_llm_ms:
+            degraded_reason = f"only {remaining_s * 1000:.0f} ms left for generation"
+        else:
+            plan = plan_generation(remaining_s)
+            if plan["context_chars"] < cfg.budget.min_context_chars:
+                # An answer without its context would be ungrounded
+                degraded_reason = (
+                    f"only {plan['context_chars']} context chars fit in the "
+                    f"{remaining_s * 1000:.0f} ms left for generation"
+                )
+                plan = None
+    compress = cfg.compression.enabled if compress is None else compress
+    # Nothing to compress for when the LLM won't be called
+    compress = compress and degraded_reason is None
+    compression, compression_ms = None, 0.0
+    if compress:
+        t0 = time.perf_counter()
+        budget_chars = cfg.compression.max_tokens * CHARS_PER_TOKEN
+        compression = await compress_context(
+            query,
+            [h for h in hits if "text" in h.payload],
+            min(budget_chars, plan["context_chars"]) if plan else budget_chars,
+            query_vec=retrieved["query_vec"],
+            embed=lambda text: _get_embedding(text, model=defaults.embed_model),
+            # The time plan_generation reserved for the LLM isn't the compressor's to spend
+            timeout=max(0.0, deadline.remaining() - cfg.budget.min_llm_ms / 1000) if deadline else None
+        )
+        compression_ms = (time.perf_counter() - t0) * 1000
+        context = compression["context"]
+        context_used = compression["chunks"]
+    if not compress or not context:
+        context_parts = select_context(context_texts, plan["context_chars"] if plan else None)
+        if plan and not context_parts:
+            # Budget smaller than the best chunk: send its head rather than nothing
+            context_parts = [context_texts[0][:plan["context_chars"]]]
+        context = "\n\n".join(context_parts)
+        context_used, compression = len(context_parts), None
+    prompt = build_prompt(context, query)
+    if plan:
+        options = {
+            "num_predict": plan["num_predict"],
+            "num_ctx": size_num_ctx(len(prompt), plan["num_predict"]),
+        }
     
     # 4. Generate final answer ===============
-    answer, llm_s = await _generate_llm_response(prompt)
+    answer, llm_s = RETRIEVAL_ONLY_ANSWER, 0.0
+    if degraded_reason is None:
+        t_llm = time.perf_counter()
+        try:
+            body, llm_s = await _ollama_generate(
+                prompt,
+                options=options,
+                timeout=deadline.remaining() if deadline else None
+            )
+            answer = body.get("response", "").strip() or "No answer generated."
+            log.info(f" LLM response ready in {llm_s:.2f} s ({len(answer)} chars)")
+            if options and body.get("done_reason") == "length":
+                degraded_reason = f"answer cut at num_predict={options['num_predict']}"
+        except HTTPException as e:
+            if not deadline or e.status_code != 504:
+                raise
+            degraded_reason = f"generation exceeded the {deadline_ms} ms deadline"
+            llm_s = time.perf_counter() - t_llm
+    if degraded_reason:
+        log.warning(f"⏱ Degraded RAG answer: {degraded_reason}")
 
 
      #  Log summary =======
@@ -146,10 +701,10 @@ async def generate_rag_answer(
     log.info(f"\n🚀 RAG pipeline complete")
     log.info(f"{'='*60}")
     log.info(f"🔍 LLM model: {cfg.ollama.llm_model}")
-    log.info(f"🔹 Embedding model: {cfg.ollama.embed_model}")
+    log.info(f"🔹 Embedding model: {defaults.embed_model}")
     log.info(f"📦 Collection: {collection}")
-    log.info(f"📚 Context chunks used: {len(context_parts)}/{len(context_texts)}")
-    log.info(f"Relevance scores: {[f'{s:.3f}' for s in scores[:len(context_parts)]]}")
+    log.info(f"📚 Context chunks used: {context_used}/{len(context_texts)}")
+    log.info(f"Relevance scores: {[f'{s:.3f}' for s in scores[:context_used]]}")
     log.info(f"🧩 Context preview: {context[:150].replace(chr(10), ' ')}...")
     log.info(f"💬 Final answer preview: {answer[:150].replace(chr(10), ' ')}...")
     log.info(f"Total duration: {total_time:.2f} s")
@@ -158,46 +713,56 @@ async def generate_rag_answer(
 
 
     # 5. Result return section ==================
-    results = [
-        {
-            "rank": i + 1,
-            "score": round(h.score, 3),
-            "source": h.payload.get("source", "unknown"),
-            "text_preview": h.payload.get("text", ""[:300]),
-        }
-        for i, h in enumerate(hits)
-    ]
-    return {
+    results = format_hits(hits, result_mode, preview_chars)
+    result = {
         "query": query,
         "answer": answer.strip(),
-        "context_used": len(context_parts),
+        "context_used": context_used,
         "results": results,        
         "models": {
             "llm": cfg.ollama.llm_model,
-            "embedding": cfg.ollama.embed_model
+            "embedding": defaults.embed_model
         },
         "collection": collection,        
+        "retrieval": retrieved["retrieval"],
         "timing": {
             "embedding": round(embedding_ms, 1),
             "search": round(search_ms, 1),
             "llm": round(llm_s, 2),
             "total": round(total_time, 2),
+            **({
+                "compression": round(compression_ms, 1),
+                "compression_ratio": compression["ratio"],
+            } if compression else {}),
+        },
+        "cold_load": {
+            "embedding": cold_loads.get(EMBEDDING, False),
+            "llm": cold_loads.get(LLM, False),
         },
+        "degraded": degraded_reason is not None,
+        "degraded_reason": degraded_reason,
+        "budget": {
+            "deadline_ms": deadline_ms,
+            "context_chars": len(context),
+            **(options or {}),
+        } if deadline else None,
     }
+    if cache_key and degraded_reason is None:
+        await answer_cache.aset_json(cache_key, result)
+    return result
 
 
 def create_collection(name: str, vector_size: int = 768):
     """
     Create a new Qdrant collection if it doesn't exist.
     """
-    collections = [c.name for c in qdrant.get_collections().collections]
-    if name in collections:
+    if collection_registry.get(name) is not None:
         log.warning(f"! Collection '{name}' already exists.")
         return
     
-    qdrant.create_collection(
-        collection_name=name,
-        vectors_config=qmodels.VectorParams(
+    create_indexed_collection(
+        name,
+        qmodels.VectorParams(
             size=vector_size,
             distance=qmodels.Distance.COSINE
         )
@@ -0,0 +1,457 @@
+#app/services/reindex.py
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import logging
+import contextlib
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Any, Dict, List, Optional, Tuple
+
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg, qdrant
+from app.utils import chunk_text_by_sentences
+from app.services.rag_services import _get_embedding
+from app.services.concurrency import ingest_limiter, write_gate
+from app.services.dedup import content_hash
+from app.services.payload_filters import create_collection
+from app.services.collection_registry import CollectionInfo, CollectionNotFound, collection_registry
+from app.services.cancellation import Job, JobRegistry
+from app.services.local_index import local_index
+from app.services.lexical_index import lexical_index
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+# Same sentence boundary as app.utils.chunk_text_by_sentences
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def generation_name(alias: str, existing) -> str:
+    """Next physical collection behind an alias: docs__v1, docs__v2, ..."""
+    pattern = re.compile(rf"^{re.escape(alias)}__v(\d+)$")
+    versions = [int(m.group(1)) for m in map(pattern.match, existing) if m]
+    return f"{alias}__v{max(versions, default=0) + 1}"
+
+
+def merge_chunks(texts: List[str]) -> str:
+    """Rebuild a document from its chunks (in order), dropping the sentences repeated by overlap."""
+    sentences: List[str] = []
+    for text in texts:
+        parts = _SENTENCE_RE.split(text.strip())
+        overlap = next(
+            (k for k in range(min(len(parts), len(sentences)), 0, -1) if sentences[-k:] == parts[:k]), 0
+        )
+        sentences.extend(parts[overlap:])
+    return " ".join(sentences)
+
+
+def rebuild_chunks(
+        records: List[qmodels.Record],
+        chunk_size: Optional[int],
+        overlap: int
+        ) -> List[Tuple[Any, Dict[str, Any]]]:
+    """
+    (id, payload) to embed for one source. Without chunk_size the chunks
+    (and their ids) are kept; otherwise each upload of the source is
+    merged back into a document and chunked again.
+    """
+    with_text = [r for r in records if (r.payload or {}).get("text")]
+    if chunk_size is None:
+        return [(r.id, r.payload) for r in with_text]
+
+    items = []
+    with_text.sort(key=lambda r: (r.payload.get("uploaded_at") or 0, r.payload.get("chunk_index") or 0))
+    for _, upload in groupby(with_text, key=lambda r: r.payload.get("uploaded_at")):
+        upload = list(upload)
+        base = {k: v for k, v in upload[0].payload.items() if k not in ("text", "chunk_index", "content_hash")}
+        text = merge_chunks([r.payload["text"] for r in upload])
+        for idx, chunk in enumerate(chunk_text_by_sentences(text, max_chunk_size=chunk_size, overlap_sentences=overlap), 1):
+            items.append((str(uuid.uuid4()), {**base, "text": chunk, "chunk_index": idx, "content_hash": content_hash(chunk)}))
+    return items
+
+
+class Throttle:
+    """At most `rate` items per second on average (0 = no limit)."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._free_at = time.monotonic()
+
+    async def acquire(self, n: int):
+        if self.rate <= 0:
+            return
+        delay = self._free_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._free_at = max(self._free_at, time.monotonic()) + n / self.rate
+
+
+#======== Qdrant helpers (blocking, run in a thread) ======
+def _source_filter(source: Optional[str]) -> qmodels.Filter:
+    if source is None:
+        return qmodels.Filter(must=[qmodels.IsEmptyCondition(is_empty=qmodels.PayloadField(key="source"))])
+    return qmodels.Filter(must=[qmodels.FieldCondition(key="source", match=qmodels.MatchValue(value=source))])
+
+
+def _scroll(collection: str, scroll_filter=None, with_payload=True) -> List[qmodels.Record]:
+    records, offset = [], None
+    while True:
+        points, offset = qdrant.scroll(
+            collection_name=collection,
+            scroll_filter=scroll_filter,
+            limit=cfg.snapshot.page_size,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=False,
+        )
+        records.extend(points)
+        if offset is None:
+            return records
+
+
+def fingerprint(records: List[qmodels.Record]) -> int:
+    """
+    Changes when a point of the source is added, deleted or rewritten:
+    ids plus stored_at, stamped when the point lands (uploaded_at is
+    stamped when its upload starts, which may be long before).
+    """
+    return hash(frozenset((r.id, (r.payload or {}).get("stored_at")) for r in records))
+
+
+def _fingerprints(collection: str) -> Dict[Optional[str], int]:
+    """Fingerprint of every source (None: chunks without one)."""
+    by_source: Dict[Optional[str], List[qmodels.Record]] = {}
+    for record in _scroll(collection, None, ["source", "stored_at"]):
+        by_source.setdefault((record.payload or {}).get("source"), []).append(record)
+    return {source: fingerprint(records) for source, records in by_source.items()}
+
+
+def _source_order(source: Optional[str]):
+    return (source is None, source or "")
+
+
+def _delete_source(collection: str, source: Optional[str]):
+    qdrant.delete(collection_name=collection, points_selector=qmodels.FilterSelector(filter=_source_filter(source)))
+
+
+def _drop_collection(name: str):
+    qdrant.delete_collection(collection_name=name)
+    collection_registry.invalidate(name)
+    local_index.invalidate(name)
+    lexical_index.invalidate(name)
+
+
+@dataclass
+class ReindexPlan:
+    alias: str
+    source: str                     # collection serving the alias now
+    target: str                     # shadow collection being built
+    embed_model: str
+    chunk_size: Optional[int]       # None: keep the existing chunks
+    overlap: int
+    switch: bool                    # point the alias at target when done
+    replace_collection: bool        # alias is a plain collection, deleted at the switch
+
+
+class ReindexService:
+    """
+    Blue/green re-indexing: every chunk of the collection behind an alias
+    is re-embedded (optionally re-chunked) into a new shadow collection at
+    REINDEX_MAX_CHUNKS_PER_S, while queries keep hitting the old one.
+    Sources written meanwhile are copied again until a pass finds none;
+    the last pass runs with writes paused, then the alias is switched in
+    one Qdrant call. The old collection is kept for rollback until the
+    next switch.
+    """
+
+    def __init__(self):
+        self.jobs = JobRegistry("reindex")
+        self._active: Dict[str, Job] = {}           # alias -> running job
+        self._state: Optional[Dict[str, Dict[str, Any]]] = None
+
+    #======== alias state: current / previous collection ======
+    def state(self) -> Dict[str, Dict[str, Any]]:
+        if self._state is None:
+            try:
+                with open(cfg.reindex.state_path, encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except FileNotFoundError:
+                self._state = {}
+            except (OSError, ValueError) as e:
+                log.warning(f"!!! Re-index state not loaded: {str(e)}")
+                self._state = {}
+        return self._state
+
+    def _save_state(self, state: Dict[str, Dict[str, Any]]):
+        path = cfg.reindex.state_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, path)
+        self._state = state
+
+    #======== start / progress ======
+    def _check_idle(self, alias: str):
+        running = self._active.get(alias)
+        if running is not None and not running.task.done():
+            raise RuntimeError(f"'{alias}' is already being re-indexed (job {running.id})")
+
+    def _plan(
+            self,
+            alias: str,
+            embed_model: Optional[str],
+            chunk_size: Optional[int],
+            overlap: int,
+            switch: bool,
+            replace_collection: bool
+            ) -> Tuple[ReindexPlan, CollectionInfo]:
+        """Validate against a fresh view of Qdrant (blocking)."""
+        collection_registry.refresh()
+        source = collection_registry.resolve(alias)
+        info = collection_registry.require(source)
+        if info.vector_size is None:
+            raise ValueError(f"Collection '{source}' uses named vectors, not supported")
+        if source == alias and switch and not replace_collection:
+            raise ValueError(
+                f"'{alias}' is a collection, not an alias. Its data is deleted when the alias "
+                f"takes its name (no rollback): pass replace_collection=true to accept that"
+            )
+        plan = ReindexPlan(
+            alias=alias,
+            source=source,
+            target=generation_name(alias, collection_registry.names()),
+            embed_model=embed_model or collection_registry.defaults(alias).embed_model,
+            chunk_size=chunk_size,
+            overlap=overlap,
+            switch=switch,
+            replace_collection=replace_collection,
+        )
+        return plan, info
+
+    async def start(
+            self,
+            alias: str,
+            embed_model: str = None,
+            chunk_size: int = None,
+            overlap: int = 1,
+            switch: bool = True,
+            replace_collection: bool = False
+            ) -> Job:
+        """Validate and start a re-index job (returns once it is running)."""
+        self._check_idle(alias)
+        plan, info = await asyncio.to_thread(
+            self._plan, alias, embed_model, chunk_size, overlap, switch, replace_collection
+        )
+        # Another start for this alias may have been planned meanwhile
+        self._check_idle(alias)
+
+        progress = {
+            "phase": "starting",
+            "source_points": info.points_count,
+            "sources_total": None,
+            "sources_done": 0,
+            "chunks_done": 0,
+            "chunks_failed": 0,
+            "skipped_no_text": 0,
+            "catch_up_passes": 0,
+            "caught_up_sources": 0,
+            "chunks_per_s": None,
+            "percent": 0.0,
+        }
+        job = self.jobs.start(
+            self._run(plan, progress),
+            alias=alias,
+            source=plan.source,
+            target=plan.target,
+            embed_model=plan.embed_model,
+            chunk_size=chunk_size,
+            progress=progress,
+        )
+        self._active[alias] = job
+        log.info(f"🔁 Re-indexing '{alias}': {plan.source} -> {plan.target} ({plan.embed_model}), job {job.id}")
+        return job
+
+    async def _embed(self, text: str, model: str) -> List[float]:
+        # Shares the ingest concurrency limit, so re-indexing backs off with uploads
+        async with ingest_limiter.slot():
+            vector, _ = await _get_embedding(text, model=model)
+        return vector
+
+    async def _copy_source(self, plan: ReindexPlan, source: Optional[str], progress: Dict[str, Any], throttle: Throttle, t0: float) -> int:
+        """Re-embed one source into the target; returns the fingerprint of what was copied."""
+        records = await asyncio.to_thread(_scroll, plan.source, _source_filter(source))
+        progress["skipped_no_text"] += sum(1 for r in records if not (r.payload or {}).get("text"))
+        items = rebuild_chunks(records, plan.chunk_size, plan.overlap)
+        for start in range(0, len(items), cfg.reindex.batch_size):
+            batch = items[start:start + cfg.reindex.batch_size]
+            await throttle.acquire(len(batch))
+            vectors = await asyncio.gather(
+                *(self._embed(payload["text"], plan.embed_model) for _, payload in batch),
+                return_exceptions=True
+            )
+            points = []
+            for (point_id, payload), vector in zip(batch, vectors):
+                if isinstance(vector, asyncio.CancelledError):
+                    raise vector
+                if isinstance(vector, Exception):
+                    log.warning(f"!!! Re-index embedding failed for a chunk of '{source}': {str(vector)}")
+                    progress["chunks_failed"] += 1
+                    continue
+                points.append(qmodels.PointStruct(id=point_id, vector=vector, payload=payload))
+            if points:
+                await asyncio.to_thread(qdrant.upsert, collection_name=plan.target, points=points)
+            progress["chunks_done"] += len(points)
+            progress["chunks_per_s"] = round(progress["chunks_done"] / max(time.perf_counter() - t0, 1e-6), 1)
+        return fingerprint(records)
+
+    async def _catch_up(self, plan: ReindexPlan, copied: Dict[Optional[str], int], progress: Dict[str, Any], throttle: Throttle, t0: float) -> int:
+        """One pass: re-copy the sources changed since they were copied, drop the gone ones. Returns how many."""
+        current = await asyncio.to_thread(_fingerprints, plan.source)
+        changed = [s for s in {*current, *copied} if current.get(s) != copied.get(s)]
+        for source in sorted(changed, key=_source_order):
+            await asyncio.to_thread(_delete_source, plan.target, source)
+            if source in current:
+                copied[source] = await self._copy_source(plan, source, progress, throttle, t0)
+            else:
+                copied.pop(source, None)
+        if changed:
+            progress["catch_up_passes"] += 1
+            progress["caught_up_sources"] += len(changed)
+        return len(changed)
+
+    async def _run(self, plan: ReindexPlan, progress: Dict[str, Any]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        throttle = Throttle(cfg.reindex.max_chunks_per_s)
+        try:
+            # The new model decides the vector size of the shadow collection
+            probe, _ = await _get_embedding("dimension probe", model=plan.embed_model)
+            distance = (await collection_registry.arequire(plan.source)).distance or qmodels.Distance.COSINE
+            await asyncio.to_thread(
+                create_collection, plan.target, qmodels.VectorParams(size=len(probe), distance=distance)
+            )
+
+            progress["phase"] = "embedding"
+            copied = await asyncio.to_thread(_fingerprints, plan.source)
+            progress["sources_total"] = len(copied)
+            for source in sorted(copied, key=_source_order):
+                copied[source] = await self._copy_source(plan, source, progress, throttle, t0)
+                progress["sources_done"] += 1
+                progress["percent"] = round(100 * progress["sources_done"] / len(copied), 1)
+
+            # Writes continue while copying: catch up until a pass finds nothing
+            progress["phase"] = "catching_up"
+            for _ in range(cfg.reindex.max_catchup_passes):
+                if not await self._catch_up(plan, copied, progress, throttle, t0):
+                    break
+
+            # The last pass and the switch run with writes to the source paused,
+            # so nothing lands in it between the two
+            pause = write_gate.paused(plan.source) if plan.switch else contextlib.nullcontext()
+            async with pause:
+                if plan.switch:
+                    progress["phase"] = "final_catch_up"
+                    await self._catch_up(plan, copied, progress, throttle, t0)
+
+                if progress["chunks_failed"]:
+                    raise RuntimeError(f"{progress['chunks_failed']} chunks failed to embed, '{plan.alias}' not switched")
+
+                # Queries through the alias must embed with the model the vectors came from
+                collection_registry.set_defaults(plan.target, embed_model=plan.embed_model)
+                count = (await asyncio.to_thread(qdrant.count, collection_name=plan.target, exact=True)).count
+                report = {
+                    "alias": plan.alias,
+                    "source": plan.source,
+                    "target": plan.target,
+                    "embed_model": plan.embed_model,
+                    "points": count,
+                    "duration_s": round(time.perf_counter() - t0, 2),
+                    "switched": False,
+                }
+                if plan.switch:
+                    progress["phase"] = "switching"
+                    report["switch"] = await asyncio.to_thread(
+                        self.switch, plan.alias, plan.target, plan.replace_collection
+                    )
+                    report["switched"] = True
+                    # Writes that waited were embedded for the source, not the target
+                    write_gate.retire(
+                        plan.source, f"'{plan.alias}' moved to '{plan.target}' during this write, retry it"
+                    )
+            progress["phase"] = "done"
+            log.info(f"✅ Re-indexed '{plan.alias}' into {plan.target}: {count} points in {report['duration_s']} s")
+            return report
+        except BaseException:
+            progress["phase"] = "failed"
+            if collection_registry.resolve(plan.alias) != plan.target:
+                try:
+                    await asyncio.to_thread(_drop_collection, plan.target)
+                except Exception as e:
+                    log.warning(f"!!! Shadow collection '{plan.target}' not dropped: {str(e)}")
+            raise
+
+    #======== switch / rollback ======
+    def switch(self, alias: str, collection: str, replace_collection: bool = False) -> Dict[str, Any]:
+        """
+        Point `alias` at `collection` in one Qdrant call: readers see the old
+        or the new collection, never neither. The collection it pointed at
+        is kept for rollback; the one before that is dropped.
+        """
+        if collection_registry.get(collection) is None or collection_registry.resolve(collection) != collection:
+            raise CollectionNotFound(f"Collection '{collection}' not found")
+        current = {a.alias_name: a.collection_name for a in qdrant.get_aliases().aliases}.get(alias)
+        operations = []
+        if current is not None:
+            operations.append(qmodels.DeleteAliasOperation(delete_alias=qmodels.DeleteAlias(alias_name=alias)))
+        elif collection_registry.get(alias) is not None:
+            if not replace_collection:
+                raise ValueError(f"'{alias}' is a collection, not an alias (see replace_collection)")
+            # One-time migration from a plain collection: it can't be kept under its own name
+            log.warning(f"⚠ Dropping collection '{alias}' so the alias can take its name")
+            _drop_collection(alias)
+        operations.append(qmodels.CreateAliasOperation(
+            create_alias=qmodels.CreateAlias(collection_name=collection, alias_name=alias)
+        ))
+        qdrant.update_collection_aliases(change_aliases_operations=operations)
+        collection_registry.set_alias(alias, collection)
+        write_gate.reopen(collection)
+
+        state = dict(self.state())
+        entry = state.get(alias, {})
+        stale = entry.get("previous")
+        stale = stale if stale not in (None, current, collection) else None
+        state[alias] = {"current": collection, "previous": current, "switched_at": time.time()}
+        self._save_state(state)
+        if stale is not None:
+            try:
+                _drop_collection(stale)
+            except Exception as e:
+                log.warning(f"!!! Old collection '{stale}' not dropped: {str(e)}")
+        log.info(f"🔀 Alias '{alias}' -> {collection} (was {current})")
+        return {"alias": alias, "collection": collection, "previous": current, "dropped": stale}
+
+    def rollback(self, alias: str) -> Dict[str, Any]:
+        """Point the alias back at the collection it served before the last switch."""
+        running = self._active.get(alias)
+        if running is not None and not running.task.done():
+            raise RuntimeError(f"'{alias}' is being re-indexed (job {running.id}); cancel it first")
+        previous = self.state().get(alias, {}).get("previous")
+        if previous is None:
+            raise ValueError(f"No previous collection to roll '{alias}' back to")
+        return self.switch(alias, previous)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_chunks_per_s": cfg.reindex.max_chunks_per_s,
+            "aliases": self.state(),
+            "writes": write_gate.snapshot(),
+            "jobs": self.jobs.list(),
+        }
+
+
+reindex_service = ReindexService()
@@ -0,0 +1,104 @@
+#app/services/replay.py
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+
+def schedule(entries: List[Dict[str, Any]], speed: float = 1.0) -> List[float]:
+    """Send offsets (s) preserving original inter-arrival gaps, compressed by `speed`."""
+    if not entries:
+        return []
+    t0 = entries[0]["ts"]
+    return [(e["ts"] - t0) / speed for e in entries]
+
+
+def latency_stats(values: List[Optional[float]]) -> Dict[str, float]:
+    arr = np.asarray([v for v in values if v is not None], dtype=np.float64)
+    if not arr.size:
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+    return {
+        "count": int(arr.size),
+        "mean": round(float(arr.mean()), 1),
+        "p50": round(float(p50), 1),
+        "p90": round(float(p90), 1),
+        "p99": round(float(p99), 1),
+        "max": round(float(arr.max()), 1),
+    }
+
+
+async def replay(
+        entries: List[Dict[str, Any]],
+        base_url: str,
+        speed: float = 1.0,
+        max_in_flight: int = 64,
+        timeout_s: float = 120.0
+        ) -> List[Dict[str, Any]]:
+    """
+    Open-loop replay: requests go out on the original schedule whether
+    or not earlier ones have finished, so queueing shows up as latency.
+    `max_in_flight` only guards the client; requests delayed by it are
+    counted as `late`.
+    """
+    offsets = schedule(entries, speed)
+    sem = asyncio.Semaphore(max_in_flight)
+    results: List[Dict[str, Any]] = [None] * len(entries)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout_s) as client:
+        async def send(i: int, entry: Dict[str, Any], due: float):
+            async with sem:
+                late_ms = max(0.0, (time.perf_counter() - due) * 1000)
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.post(entry["endpoint"], json=json.loads(entry["request"]))
+                    status = resp.status_code
+                except httpx.HTTPError as e:
+                    log.warning(f"!!! Replay request {entry.get('id')} failed: {e}")
+                    status = None
+                results[i] = {
+                    "id": entry.get("id"),
+                    "status": status,
+                    "latency_ms": (time.perf_counter() - t0) * 1000,
+                    "late_ms": late_ms,
+                }
+
+        start = time.perf_counter()
+        tasks = []
+        for i, (entry, offset) in enumerate(zip(entries, offsets)):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(i, entry, start + offset)))
+        await asyncio.gather(*tasks)
+    return results
+
+
+def compare(entries: List[Dict[str, Any]], results: List[Dict[str, Any]], speed: float) -> Dict[str, Any]:
+    """Original vs replayed latency distribution (ms)."""
+    ok = [r for r in results if r["status"] == 200]
+    span_s = entries[-1]["ts"] - entries[0]["ts"] if len(entries) > 1 else 0.0
+    original = latency_stats([e.get("total_ms") for e in entries])
+    replayed = latency_stats([r["latency_ms"] for r in ok])
+    report = {
+        "requests": len(entries),
+        "speed": speed,
+        "original_rps": round(len(entries) / span_s, 2) if span_s else None,
+        "replay_rps": round(len(entries) * speed / span_s, 2) if span_s else None,
+        "errors": len(results) - len(ok),
+        "late": sum(1 for r in results if r["late_ms"] > 100),
+        "original_ms": original,
+        "replay_ms": replayed,
+    }
+    if original.get("count") and replayed.get("count"):
+        report["delta_ms"] = {
+            k: round(replayed[k] - original[k], 1) for k in ("p50", "p90", "p99")
+        }
+    return report
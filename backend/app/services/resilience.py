@@ -0,0 +1,317 @@
+#app/services/resilience.py
+import time
+import random
+import asyncio
+import logging
+import functools
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Sequence, Tuple, Type, TypeVar
+
+import httpx
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RetryableError(Exception):
+    """Upstream failure that is safe to retry (5xx, 429, overloaded)."""
+
+
+# Transport-level failures worth another attempt
+RETRYABLE_EXCEPTIONS: Tuple[Type[BaseException], ...] = (
+    RetryableError,
+    httpx.TransportError,
+    asyncio.TimeoutError,
+)
+
+
+class LatencyTracker:
+    """Rolling window of call latencies (ms) with percentile lookup."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def observe(self, ms: float):
+        self._samples.append(ms)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, q: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+
+class Deadline:
+    """Wall-clock budget of one request, shared by its stages."""
+
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self._end = time.monotonic() + budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self._end - time.monotonic())
+
+    def elapsed(self) -> float:
+        return self.budget_s - self.remaining()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+def backoff_delay(attempt: int, base_s: float, max_s: float) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2^attempt))."""
+    return random.uniform(0, min(max_s, base_s * (2 ** attempt)))
+
+
+async def retry_async(
+        fn: Callable[[], Awaitable[T]],
+        retries: int,
+        base_delay_s: float,
+        max_delay_s: float,
+        stats: Dict[str, int] = None,
+        retry_on: Tuple[Type[BaseException], ...] = RETRYABLE_EXCEPTIONS
+        ) -> T:
+    """Call `fn` up to `retries + 1` times, sleeping with jitter in between."""
+    for attempt in range(retries + 1):
+        try:
+            return await fn()
+        except retry_on as e:
+            if attempt >= retries:
+                raise
+            delay = backoff_delay(attempt, base_delay_s, max_delay_s)
+            if stats is not None:
+                stats["retries"] = stats.get("retries", 0) + 1
+            log.warning(
+                f"🔁 Attempt {attempt + 1} failed ({type(e).__name__}: {e}), "
+                f"retrying in {delay * 1000:.0f} ms"
+            )
+            await asyncio.sleep(delay)
+
+
+async def hedged(
+        call: Callable[[str], Awaitable[T]],
+        backends: Sequence[str],
+        delay_s: float,
+        stats: Dict[str, int] = None
+        ) -> T:
+    """
+    Send `call(backends[0])`; if it hasn't finished after `delay_s`,
+    send a duplicate to the next backend (immediately if the primary
+    already failed). The first successful response wins and the other
+    request is cancelled.
+    """
+    primary = asyncio.create_task(call(backends[0]))
+    if len(backends) < 2:
+        return await primary
+
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay_s)
+        # Hedge when the primary is slow, or failed fast (e.g. circuit open)
+        if not done or primary.exception() is not None:
+            if stats is not None:
+                stats["hedges"] = stats.get("hedges", 0) + 1
+            hedge = asyncio.create_task(call(backends[1]))
+            tasks.add(hedge)
+
+        last_error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if stats is not None and task is not primary:
+                        stats["hedge_wins"] = stats.get("hedge_wins", 0) + 1
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+#======== Circuit breaker ===========================
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker.
+
+    closed    — calls pass; the last `window` outcomes are tracked and the
+                breaker opens once `failure_rate` is reached (after `min_calls`)
+    open      — calls fail fast with CircuitOpenError for `open_s` seconds
+    half_open — up to `half_open_max_calls` trial calls; success closes
+                the breaker, failure opens it again
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+            self,
+            name: str,
+            failure_rate: float = 0.5,
+            window: int = 20,
+            min_calls: int = 5,
+            open_s: float = 10.0,
+            half_open_max_calls: int = 1
+            ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_s = open_s
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError if the call must not go upstream."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_s:
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self._to_half_open()
+            if self.state == self.HALF_OPEN:
+                if self._trial_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open, probe in flight")
+                self._trial_calls += 1
+
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                log.info(f"✅ {self.name} circuit closed")
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (
+                self.state == self.CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._trip()
+
+    def release(self):
+        """Call was abandoned without an outcome: free its half-open slot."""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._trial_calls > 0:
+                self._trial_calls -= 1
+
+    def half_open(self):
+        """Let the next call through early (e.g. a health probe succeeded)."""
+        with self._lock:
+            if self.state == self.OPEN:
+                self._to_half_open()
+
+    def _to_half_open(self):
+        self.state = self.HALF_OPEN
+        self._trial_calls = 0
+
+    def _trip(self):
+        log.warning(f"🚧 {self.name} circuit opened for {self.open_s:.0f} s")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = self._outcomes.count(False)
+            return {
+                "state": self.state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": failures,
+            }
+
+
+class BreakerProxy:
+    """
+    Wraps a synchronous client (QdrantClient): every method call goes
+    through the breaker. `is_failure(exc)` decides which errors count
+    as upstream failures (a 404 for a missing collection doesn't).
+    """
+
+    def __init__(self, client, breaker: CircuitBreaker, is_failure: Callable[[Exception], bool]):
+        self.unwrapped = client
+        self.breaker = breaker
+        self._is_failure = is_failure
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.unwrapped, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def guarded(*args, **kwargs):
+            self.breaker.allow()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                if self._is_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
+
+        return guarded
+
+
+class BreakerTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport with one circuit breaker per upstream host.
+    Transport errors and 5xx responses count as failures. Requests sent
+    with extensions={"circuit_breaker_bypass": True} (health probes)
+    skip the breaker.
+    """
+
+    def __init__(self, breaker_factory: Callable[[str], CircuitBreaker], transport: httpx.AsyncBaseTransport = None):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+        self._factory = breaker_factory
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker_for(self, host: str) -> CircuitBreaker:
+        if host not in self.breakers:
+            self.breakers[host] = self._factory(host)
+        return self.breakers[host]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.extensions.get("circuit_breaker_bypass"):
+            return await self._transport.handle_async_request(request)
+
+        breaker = self.breaker_for(request.url.netloc.decode())
+        breaker.allow()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except asyncio.CancelledError:
+            # Cancelled by us (hedge lost, deadline), not an upstream outcome
+            breaker.release()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
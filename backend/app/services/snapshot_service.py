@@ -0,0 +1,267 @@
+#app/services/snapshot_service.py
+import json
+import os
+import shutil
+import struct
+import time
+import logging
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg, qdrant
+from app.services.payload_filters import create_collection
+from app.services.cache import metadata_cache
+from app.services.collection_registry import collection_registry
+
+# ========= Logger setup =========
+log = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+PAYLOADS_FILE = "payloads.jsonl"
+META_FILE = "meta.json"
+SNAPSHOT_FILES = (VECTORS_FILE, PAYLOADS_FILE, META_FILE)
+FORMAT_VERSION = 1
+
+# Fixed-size .npy header: lets us stream rows first and patch the shape at the end
+NPY_HEADER_SIZE = 128
+
+
+def snapshot_path(collection: str) -> str:
+    """Default snapshot directory of a collection."""
+    if not collection or collection.startswith(".") or os.sep in collection:
+        raise ValueError(f"Invalid collection name '{collection}'")
+    return os.path.join(cfg.snapshot.dir, collection)
+
+
+def _npy_header(rows: int, dim: int) -> bytes:
+    """Version 1.0 .npy header for a C-contiguous float32 (rows, dim) array."""
+    prefix = np.lib.format.magic(1, 0)
+    header_len = NPY_HEADER_SIZE - len(prefix) - 2
+    header = repr({"descr": "<f4", "fortran_order": False, "shape": (rows, dim)})
+    header = header.ljust(header_len - 1) + "\n"
+    return prefix + struct.pack("<H", header_len) + header.encode("latin1")
+
+
+def get_vector_params(collection: str) -> qmodels.VectorParams:
+    """Vector size and distance of a single-vector collection (cached, see CACHE_METADATA_TTL)."""
+    info = collection_registry.get(collection, reload=False)
+    if info is not None and info.vector_size is not None:
+        return qmodels.VectorParams(size=info.vector_size, distance=info.distance)
+    key = metadata_cache.key("vectors", collection)
+    cached = metadata_cache.get_json(key)
+    if cached is not None:
+        return qmodels.VectorParams(**cached)
+    info = qdrant.get_collection(collection_name=collection)
+    params = info.config.params.vectors
+    if not isinstance(params, qmodels.VectorParams):
+        raise ValueError(f"Collection '{collection}' uses named vectors, not supported")
+    metadata_cache.set_json(key, params.model_dump(mode="json", exclude_none=True))
+    return params
+
+
+#======== 1. Export ===========================
+def _iter_points(collection: str, page_size: int) -> Iterator[List[qmodels.Record]]:
+    offset = None
+    while True:
+        points, offset = qdrant.scroll(
+            collection_name=collection,
+            limit=page_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if points:
+            yield points
+        if offset is None:
+            break
+
+
+def export_collection(collection: str, out_dir: str = None, page_size: int = None) -> Dict[str, Any]:
+    """
+    Stream a collection to `out_dir`:
+      vectors.npy     — contiguous float32 (count, dim), np.load(mmap_mode="r")-able
+      payloads.jsonl  — one {"id", "payload"} per line, same order as vectors
+      meta.json       — collection, vector size, distance, count
+    Files are written to a temp dir next to `out_dir` and swapped in at
+    the end: a failed export leaves the previous snapshot in place.
+    """
+    out_dir = os.path.abspath(out_dir or snapshot_path(collection))
+    page_size = page_size or cfg.snapshot.page_size
+    params = get_vector_params(collection)
+    parent = os.path.dirname(out_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = _sibling(out_dir, "new")
+    os.makedirs(tmp_dir)
+    try:
+        meta = _write_snapshot(collection, params, tmp_dir, page_size)
+        _swap_dir(tmp_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return {**meta, "path": out_dir}
+
+
+def _sibling(out_dir: str, tag: str) -> str:
+    """Hidden name next to `out_dir` (snapshot_path() never yields a dot name)."""
+    name = f".{os.path.basename(out_dir)}.{tag}.{os.getpid()}.{time.time_ns()}"
+    return os.path.join(os.path.dirname(out_dir), name)
+
+
+def _swap_dir(new_dir: str, out_dir: str):
+    """Put `new_dir` at `out_dir`; os.replace can't overwrite a non-empty dir, so the old one steps aside first."""
+    old_dir = None
+    if os.path.exists(out_dir):
+        old_dir = _sibling(out_dir, "old")
+        os.replace(out_dir, old_dir)
+    try:
+        os.replace(new_dir, out_dir)
+    except OSError:
+        if old_dir:
+            os.replace(old_dir, out_dir)
+        raise
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _write_snapshot(collection: str, params: qmodels.VectorParams, out_dir: str, page_size: int) -> Dict[str, Any]:
+    dim = params.size
+    t0 = time.perf_counter()
+    rows = 0
+    vectors_path = os.path.join(out_dir, VECTORS_FILE)
+    payloads_path = os.path.join(out_dir, PAYLOADS_FILE)
+
+    with open(vectors_path, "wb") as vf, open(payloads_path, "w", encoding="utf-8") as pf:
+        vf.write(_npy_header(0, dim))
+        for points in _iter_points(collection, page_size):
+            matrix = np.asarray([p.vector for p in points], dtype="<f4")
+            if matrix.ndim != 2 or matrix.shape[1] != dim:
+                raise ValueError(f"Unexpected vector shape {matrix.shape} in '{collection}'")
+            vf.write(matrix.tobytes())
+            pf.writelines(
+                json.dumps({"id": p.id, "payload": p.payload or {}}, ensure_ascii=False) + "\n"
+                for p in points
+            )
+            rows += len(points)
+        # Patch the real row count into the header
+        vf.seek(0)
+        vf.write(_npy_header(rows, dim))
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "collection": collection,
+        "vector_size": dim,
+        "distance": params.distance.value,
+        "count": rows,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    log.info(
+        f"📦 Exported {rows} points from '{collection}' "
+        f"in {(time.perf_counter() - t0):.2f} s"
+    )
+    return meta
+
+
+#======== 2. Import ===========================
+def load_snapshot(src_dir: str) -> Tuple[Dict[str, Any], np.ndarray]:
+    """Read meta.json and memory-map vectors.npy."""
+    with open(os.path.join(src_dir, META_FILE), encoding="utf-8") as f:
+        meta = json.load(f)
+    vectors = np.load(os.path.join(src_dir, VECTORS_FILE), mmap_mode="r")
+    if vectors.ndim != 2 or vectors.shape[1] != meta["vector_size"]:
+        raise ValueError(f"vectors.npy shape {vectors.shape} doesn't match meta.json")
+    return meta, vectors
+
+
+def count_records(path: str) -> int:
+    """Non-empty lines of payloads.jsonl (one per point)."""
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def import_collection(
+        src_dir: str,
+        collection: str = None,
+        batch_size: int = None,
+        recreate: bool = False
+        ) -> Dict[str, Any]:
+    """
+    Restore a snapshot into `collection` (default: the exported name)
+    with large columnar batch upserts. No embeddings are computed.
+    """
+    meta, vectors = load_snapshot(src_dir)
+    collection = collection or meta["collection"]
+    batch_size = batch_size or cfg.snapshot.batch_size
+    dim = meta["vector_size"]
+    # Checked before anything is deleted or upserted: a truncated snapshot
+    # must not leave a half-imported collection behind
+    records = count_records(os.path.join(src_dir, PAYLOADS_FILE))
+    if records != len(vectors):
+        raise ValueError(f"payloads.jsonl has {records} records, vectors.npy has {len(vectors)}")
+
+    existing = [c.name for c in qdrant.get_collections().collections]
+    if collection in existing and recreate:
+        qdrant.delete_collection(collection_name=collection)
+        collection_registry.invalidate(collection)
+        existing.remove(collection)
+    if collection not in existing:
+        log.info(f"Creating Qdrant collection '{collection}' ({dim} dims)")
+        create_collection(
+            collection,
+            qmodels.VectorParams(
+                size=dim,
+                distance=qmodels.Distance(meta["distance"])
+            ),
+        )
+    else:
+        params = get_vector_params(collection)
+        if params.size != dim:
+            raise ValueError(f"Collection '{collection}' vector size doesn't match snapshot ({dim})")
+        if params.distance.value != meta["distance"]:
+            raise ValueError(
+                f"Collection '{collection}' uses {params.distance.value} distance, snapshot uses {meta['distance']}"
+            )
+
+    t0 = time.perf_counter()
+    total = len(vectors)
+    imported = 0
+
+    def _flush(ids, payloads):
+        nonlocal imported
+        if imported + len(ids) > total:
+            raise ValueError(f"payloads.jsonl has more records than vectors.npy ({total})")
+        batch = np.ascontiguousarray(vectors[imported:imported + len(ids)])
+        qdrant.upsert(
+            collection_name=collection,
+            points=qmodels.Batch(ids=ids, vectors=batch.tolist(), payloads=payloads),
+            wait=imported + len(ids) >= total,
+        )
+        imported += len(ids)
+
+    ids, payloads = [], []
+    with open(os.path.join(src_dir, PAYLOADS_FILE), encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            ids.append(record["id"])
+            payloads.append(record.get("payload") or {})
+            if len(ids) >= batch_size:
+                _flush(ids, payloads)
+                ids, payloads = [], []
+                log.info(f" Imported {imported}/{total} points")
+    if ids:
+        _flush(ids, payloads)
+
+    if imported != total:
+        raise ValueError(f"payloads.jsonl has {imported} records, vectors.npy has {total}")
+
+    log.info(
+        f"📥 Imported {imported} points into '{collection}' "
+        f"in {(time.perf_counter() - t0):.2f} s"
+    )
+    return {"collection": collection, "imported": imported, "vector_size": dim}
@@ -0,0 +1,95 @@
+#benchmarks/bench_qdrant_transport.py
+"""
+REST vs gRPC Qdrant transport benchmark (needs a running Qdrant).
+
+    cd backend
+    python -m benchmarks.bench_qdrant_transport --points 20000 --queries 500
+
+For each transport: bulk upsert of random vectors in batches, then
+single-query search. Reports wall time and backend-process CPU time,
+which is where JSON float encoding/decoding shows up.
+"""
+import argparse
+import time
+import uuid
+
+import numpy as np
+from qdrant_client.http import models as qmodels
+
+from app.clients import make_qdrant_client
+
+
+def _timed(fn):
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    fn()
+    return time.perf_counter() - wall0, time.process_time() - cpu0
+
+
+def run(prefer_grpc: bool, vectors: np.ndarray, queries: np.ndarray, batch_size: int, top_k: int):
+    client = make_qdrant_client(prefer_grpc=prefer_grpc)
+    name = f"bench_transport_{'grpc' if prefer_grpc else 'rest'}_{uuid.uuid4().hex[:6]}"
+    client.create_collection(
+        collection_name=name,
+        vectors_config=qmodels.VectorParams(size=vectors.shape[1], distance=qmodels.Distance.COSINE),
+    )
+    try:
+        def upsert():
+            for start in range(0, len(vectors), batch_size):
+                batch = vectors[start:start + batch_size]
+                client.upsert(
+                    collection_name=name,
+                    points=qmodels.Batch(
+                        ids=list(range(start, start + len(batch))),
+                        vectors=batch.tolist(),
+                        payloads=[{"text": f"chunk {i}"} for i in range(start, start + len(batch))],
+                    ),
+                    wait=True,
+                )
+
+        def search():
+            for q in queries:
+                client.search(collection_name=name, query_vector=q.tolist(), limit=top_k, with_payload=True)
+
+        upsert_wall, upsert_cpu = _timed(upsert)
+        search_wall, search_cpu = _timed(search)
+    finally:
+        client.delete_collection(collection_name=name)
+        client.close()
+
+    return {
+        "upsert_pts_per_s": len(vectors) / upsert_wall,
+        "upsert_cpu_s": upsert_cpu,
+        "search_ms_avg": search_wall / len(queries) * 1000,
+        "search_cpu_s": search_cpu,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.points, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    results = {
+        "rest": run(False, vectors, queries, args.batch_size, args.top_k),
+        "grpc": run(True, vectors, queries, args.batch_size, args.top_k),
+    }
+
+    print(f"\n{args.points} points x {args.dim} dims, {args.queries} searches (top_k={args.top_k})")
+    print(f"{'transport':<10}{'upsert pts/s':>14}{'upsert CPU s':>14}{'search ms':>12}{'search CPU s':>14}")
+    for name, r in results.items():
+        print(
+            f"{name:<10}{r['upsert_pts_per_s']:>14.0f}{r['upsert_cpu_s']:>14.2f}"
+            f"{r['search_ms_avg']:>12.2f}{r['search_cpu_s']:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
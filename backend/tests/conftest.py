@@ -7,6 +7,8 @@ from unittest.mock import AsyncMock, MagicMock
 
 from app.main import app
 from app.clients import cfg
+from app.services.cache import cache_backend
+from app.services.collection_registry import collection_registry
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -71,4 +73,12 @@ def reset_config():
     """Reset config before each test"""
     original_collection = cfg.qdrant.collection
     yield
-    cfg.qdrant.collection = original_collection
\ No newline at end of file
+    cfg.qdrant.collection = original_collection
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Cached embeddings / metadata must not leak between tests"""
+    cache_backend.clear()
+    collection_registry.invalidate()
+    yield
+    cache_backend.clear()
@@ -0,0 +1,85 @@
+# backend/tests/test_bulk_ingest.py
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+
+from app.services.bulk_ingest import ingest_jsonl, iter_lines
+
+
+async def byte_stream(data: bytes, chunk_size: int = 7):
+    """Deliver bytes in small chunks, splitting lines mid-way"""
+    for i in range(0, len(data), chunk_size):
+        yield data[i:i + chunk_size]
+
+
+def jsonl(records) -> bytes:
+    return b"".join(json.dumps(r).encode() + b"\n" for r in records)
+
+
+@pytest.mark.unit
+class TestBulkIngest:
+    """Tests for JSONL bulk vector ingestion"""
+
+    @pytest.mark.asyncio
+    async def test_iter_lines_rejoins_chunks(self):
+        """Lines split across chunks are reassembled"""
+        lines = [line async for line in iter_lines(byte_stream(b"ab\ncdef\ng"))]
+        assert lines == [b"ab", b"cdef", b"g"]
+
+    @pytest.mark.asyncio
+    async def test_batches_and_payload(self):
+        """Records are upserted in batches with extra keys as payload"""
+        records = [
+            {"id": i, "vector": [0.1, 0.2, 0.3], "text": f"t{i}", "source": "offline", "lang": "en"}
+            for i in range(5)
+        ]
+        with patch("app.services.bulk_ingest.qdrant") as mock_qdrant:
+            mock_qdrant.upsert = MagicMock()
+
+            result = await ingest_jsonl(byte_stream(jsonl(records)), "docs", dim=3, batch_size=2)
+
+            assert result["points_indexed"] == 5
+            assert result["points_rejected"] == 0
+            assert mock_qdrant.upsert.call_count == 3
+            point = mock_qdrant.upsert.call_args_list[0].kwargs["points"][0]
+            assert isinstance(point.payload.pop("uploaded_at"), float)
+            assert isinstance(point.payload.pop("stored_at"), float)
+            assert point.payload == {"text": "t0", "source": "offline", "lang": "en"}
+
+    @pytest.mark.asyncio
+    async def test_rejects_wrong_dimensions(self):
+        """Vectors with the wrong size are reported, not upserted"""
+        records = [
+            {"id": 1, "vector": [0.1, 0.2, 0.3], "text": "ok"},
+            {"id": 2, "vector": [0.1, 0.2], "text": "short"},
+        ]
+        data = jsonl(records) + b"not json\n"
+        with patch("app.services.bulk_ingest.qdrant") as mock_qdrant:
+            mock_qdrant.upsert = MagicMock()
+
+            result = await ingest_jsonl(byte_stream(data), "docs", dim=3)
+
+            assert result["points_indexed"] == 1
+            assert result["points_rejected"] == 2
+            assert result["errors"][0].startswith("line 2:")
+
+    @pytest.mark.asyncio
+    async def test_ids_validated_per_record(self):
+        """Id 0 is kept; ids Qdrant can't store are rejected per line"""
+        uid = "5c56c793-69f3-4fbf-87e6-c4bf54c28c26"
+        records = [
+            {"id": 0, "vector": [0.1, 0.2, 0.3]},
+            {"id": uid, "vector": [0.1, 0.2, 0.3]},
+            {"id": "doc-7", "vector": [0.1, 0.2, 0.3]},
+            {"id": -1, "vector": [0.1, 0.2, 0.3]},
+            {"vector": [0.1, 0.2, 0.3]},
+        ]
+        with patch("app.services.bulk_ingest.qdrant") as mock_qdrant:
+            mock_qdrant.upsert = MagicMock()
+
+            result = await ingest_jsonl(byte_stream(jsonl(records)), "docs", dim=3)
+
+            ids = [p.id for p in mock_qdrant.upsert.call_args.kwargs["points"]]
+            assert ids[:2] == [0, uid] and len(ids) == 3
+            assert result["points_rejected"] == 2
+            assert [e.split(":")[0] for e in result["errors"]] == ["line 3", "line 4"]
@@ -0,0 +1,161 @@
+# backend/tests/test_cache.py
+import asyncio
+import numpy as np
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg
+from app.services.cache import (
+    Cache,
+    FakeRedis,
+    MemoryBackend,
+    RedisBackend,
+    SQLiteBackend,
+    encode_vector,
+)
+from app.services.rag_services import generate_rag_answer, retrieve
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(max_items=100)
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_items=100)
+    return RedisBackend(client=FakeRedis(), prefix="test:")
+
+
+@pytest.mark.unit
+class TestCacheBackends:
+    """Same behaviour from every backend"""
+
+    def test_roundtrip_and_delete(self, backend):
+        assert backend.get("k") is None
+        backend.set("k", b"\x00\x01value")
+        assert backend.get("k") == b"\x00\x01value"
+        backend.delete("k")
+        assert backend.get("k") is None
+
+    def test_ttl(self, backend):
+        backend.set("k", b"v", ttl_s=5)
+        assert backend.get("k") == b"v"
+        with patch("app.services.cache.time.time", return_value=1e12):
+            assert backend.get("k") is None
+
+    def test_clear(self, backend):
+        backend.set("a", b"1")
+        backend.set("b", b"2")
+        backend.clear()
+        assert backend.get("a") is None and backend.get("b") is None
+
+    def test_vectors_are_float32_bytes(self, backend):
+        cache = Cache("emb", backend=backend)
+        key = cache.key("model", "query")
+        cache.set_vector(key, [0.5] * 768)
+        assert len(backend.get(key)) == 768 * 4
+        vec = cache.get_vector(key)
+        assert vec.dtype == np.float32 and vec[0] == 0.5
+        assert cache.snapshot()["hits"] == 1
+
+
+@pytest.mark.unit
+class TestSharedStores:
+    """Cross-process sharing and bounds"""
+
+    def test_sqlite_shared_between_connections(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        SQLiteBackend(path).set("k", encode_vector([1.0, 2.0]))
+        assert np.frombuffer(SQLiteBackend(path).get("k"), dtype=np.float32).tolist() == [1.0, 2.0]
+
+    def test_sqlite_trims_oldest(self, tmp_path):
+        backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_items=10)
+        for i in range(256):
+            backend.set(f"k{i}", b"v")
+        assert backend.snapshot()["items"] == 10
+        assert backend.get("k255") == b"v" and backend.get("k0") is None
+
+    def test_memory_lru(self):
+        backend = MemoryBackend(max_items=2)
+        backend.set("a", b"1")
+        backend.set("b", b"2")
+        backend.get("a")
+        backend.set("c", b"3")
+        assert backend.get("b") is None and backend.get("a") == b"1"
+
+    def test_redis_errors_are_misses(self):
+        client = MagicMock()
+        client.get.side_effect = ConnectionError("down")
+        backend = RedisBackend(client=client)
+        assert backend.get("k") is None
+        backend.set("k", b"v")
+        assert backend.snapshot()["errors"] == 1
+
+
+@pytest.mark.integration
+class TestPipelineCaching:
+    """Embedding and answer caches inside the RAG pipeline"""
+
+    @pytest.mark.asyncio
+    async def test_query_embedding_cached(self):
+        embed = AsyncMock(return_value=([0.25, 0.5], 12.0))
+        qdrant = MagicMock()
+        qdrant.search.return_value = []
+        with patch("app.services.rag_services._get_embedding", embed), \
+             patch("app.services.rag_services.qdrant", qdrant):
+            first = await retrieve("where is alice", "docs", 3, mode="dense")
+            second = await retrieve("where is alice", "docs", 3, mode="dense")
+
+        assert embed.await_count == 1
+        assert second["embedding_ms"] == 0.0 and second["query_vec"] == [0.25, 0.5]
+
+    @pytest.mark.asyncio
+    async def test_answer_cache(self):
+        qdrant = MagicMock()
+        qdrant.search.return_value = [
+            qmodels.ScoredPoint(id=1, version=0, score=0.9, payload={"text": "Alice is in Wonderland.", "source": "a.txt"})
+        ]
+        generate = AsyncMock(return_value=({"response": "Wonderland."}, 0.1))
+        with patch("app.services.rag_services.qdrant", qdrant), \
+             patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([1.0, 0.0], 1.0))), \
+             patch("app.services.rag_services._ollama_generate", generate), \
+             patch("app.services.rag_services.answer_cache", Cache("answer", ttl_s=60)):
+            first = await generate_rag_answer("Where is Alice?", top_k=1, collection="docs")
+            second = await generate_rag_answer("Where is Alice?", top_k=1, collection="docs")
+            other = await generate_rag_answer("Where is Alice?", top_k=2, collection="docs")
+
+        assert generate.await_count == 2
+        assert second["cached"] is True and second["answer"] == first["answer"]
+        assert "cached" not in other
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_reports_its_own_timings(self):
+        qdrant = MagicMock()
+        qdrant.search.return_value = [
+            qmodels.ScoredPoint(id=1, version=0, score=0.9, payload={"text": "Alice is in Wonderland.", "source": "a.txt"})
+        ]
+        cold = MagicMock(get=lambda kind, default=False: True)      # first request loads both models
+        with patch("app.services.rag_services.qdrant", qdrant), \
+             patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([1.0, 0.0], 800.0))), \
+             patch("app.services.rag_services._ollama_generate", AsyncMock(return_value=({"response": "Wonderland."}, 2.5))), \
+             patch("app.services.rag_services.track_cold_loads", return_value=cold), \
+             patch("app.services.rag_services.answer_cache", Cache("answer", ttl_s=60)):
+            first = await generate_rag_answer("Where is Alice?", top_k=1, collection="docs")
+            second = await generate_rag_answer("Where is Alice?", top_k=1, collection="docs")
+
+        assert first["cold_load"] == {"embedding": True, "llm": True}
+        assert second["cold_load"] == {"embedding": False, "llm": False}
+        assert second["timing"]["embedding"] == second["timing"]["llm"] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_async_access_offloads_shared_backends(self, tmp_path):
+        memory = Cache("t", backend=MemoryBackend(max_items=4))
+        sqlite = Cache("t", backend=SQLiteBackend(path=str(tmp_path / "c.db"), max_items=4))
+        with patch("app.services.cache.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            await memory.aset_json("k", {"a": 1})
+            assert await memory.aget_json("k") == {"a": 1}
+            assert to_thread.call_count == 0
+
+            await sqlite.aset_vector("v", [0.5, 0.25])
+            assert (await sqlite.aget_vector("v")).tolist() == [0.5, 0.25]
+            assert to_thread.call_count == 2
@@ -0,0 +1,164 @@
+# backend/tests/test_cancellation.py
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock, MagicMock
+from qdrant_client.http import models as qmodels
+
+from app.services.cancellation import (
+    ClientDisconnected,
+    JobRegistry,
+    WorkCancelled,
+    cancel_on_disconnect,
+    disconnect_stats,
+)
+from app.services.collection_registry import collection_registry
+from app.services.rag_services import generate_rag_answer
+
+
+class FakeRequest:
+    """Just enough of starlette's Request: receive() yields http.disconnect once `gone` is set"""
+
+    def __init__(self):
+        self.gone = asyncio.Event()
+        self.url = SimpleNamespace(path="/api/test")
+
+    async def receive(self):
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+
+@pytest.mark.unit
+class TestCancelOnDisconnect:
+    """Tests for disconnect-driven cancellation"""
+
+    @pytest.mark.asyncio
+    async def test_result_when_client_stays(self):
+        async def work():
+            await asyncio.sleep(0.01)
+            return 42
+
+        assert await cancel_on_disconnect(FakeRequest(), work()) == 42
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_work(self):
+        request = FakeRequest()
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        asyncio.get_running_loop().call_later(0.01, request.gone.set)
+        before = disconnect_stats.get("/api/test", 0)
+        with pytest.raises(ClientDisconnected):
+            await cancel_on_disconnect(request, work())
+        assert cancelled.is_set()
+        assert disconnect_stats["/api/test"] == before + 1
+
+    @pytest.mark.asyncio
+    async def test_disconnect_reaches_ollama_call(self):
+        """Cancelling the pipeline cancels the in-flight /api/generate request"""
+        request = FakeRequest()
+        generate_cancelled = asyncio.Event()
+
+        async def slow_post(url, json=None, **kwargs):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                generate_cancelled.set()
+                raise
+
+        qdrant = MagicMock()
+        qdrant.search.return_value = [
+            SimpleNamespace(id=1, score=0.9, payload={"text": "Alice is in Wonderland.", "source": "a.txt"})
+        ]
+        with patch("app.services.rag_services.http_client") as mock_http, \
+             patch("app.services.rag_services.qdrant", qdrant), \
+             patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([1.0, 0.0], 1.0))):
+            mock_http.post = slow_post
+            asyncio.get_running_loop().call_later(0.02, request.gone.set)
+            with pytest.raises(ClientDisconnected):
+                await cancel_on_disconnect(request, generate_rag_answer("Where is Alice?", top_k=1, collection="docs"))
+
+        assert generate_cancelled.is_set()
+
+
+@pytest.mark.unit
+class TestJobRegistry:
+    """Tests for cancellable upload jobs"""
+
+    @pytest.mark.asyncio
+    async def test_job_outcomes(self):
+        jobs = JobRegistry("upload")
+
+        async def ok():
+            return {"chunks_indexed": 3}
+
+        async def broken():
+            raise RuntimeError("disk full")
+
+        done = jobs.start(ok(), filename="a.txt")
+        failed = jobs.start(broken())
+        await asyncio.wait({done.task, failed.task})
+        await asyncio.sleep(0)
+
+        assert done.to_dict()["status"] == "done"
+        assert done.to_dict()["result"] == {"chunks_indexed": 3}
+        assert done.to_dict()["filename"] == "a.txt"
+        assert failed.status == "failed" and failed.error == "disk full"
+
+    @pytest.mark.asyncio
+    async def test_cancel_running_job(self):
+        jobs = JobRegistry("upload")
+        job = jobs.start(asyncio.sleep(10))
+        waiter = asyncio.ensure_future(cancel_on_disconnect(FakeRequest(), job.task))
+        await asyncio.sleep(0)
+
+        assert jobs.cancel(job.id) is job
+        with pytest.raises(WorkCancelled):
+            await waiter
+        await asyncio.sleep(0)
+        assert job.status == "cancelled"
+        assert jobs.cancel("missing") is None
+
+
+@pytest.mark.api
+class TestUploadJobEndpoints:
+    """Background uploads and DELETE /api/upload_jobs/{id}"""
+
+    def test_background_upload_can_be_cancelled(self, test_client):
+        async def slow_store(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        collection_registry.register("docs", qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+        with patch("app.routes.base.embed_and_store", slow_store):
+            response = test_client.post(
+                "/api/upload_docs",
+                files={"file": ("a.txt", b"Alice was tired. She sat by her sister.", "text/plain")},
+                data={"collection": "docs", "background": "true", "dedup": "false"},
+            )
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+            assert test_client.get(f"/api/upload_jobs/{job_id}").json()["status"] == "running"
+
+            cancelled = test_client.delete(f"/api/upload_jobs/{job_id}")
+            assert cancelled.status_code == 200
+            assert cancelled.json()["status"] == "cancelled"
+
+        assert test_client.delete("/api/upload_jobs/unknown").status_code == 404
+
+    def test_waiting_upload_returns_job_id(self, test_client):
+        collection_registry.register("docs", qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+        with patch("app.routes.base.embed_and_store", AsyncMock(return_value=(1, 0))):
+            response = test_client.post(
+                "/api/upload_docs",
+                files={"file": ("a.txt", b"Alice was tired.", "text/plain")},
+                data={"collection": "docs", "dedup": "false"},
+            )
+        assert response.status_code == 200
+        assert response.json()["chunks_indexed"] == 1
+        assert test_client.get(f"/api/upload_jobs/{response.json()['job_id']}").json()["status"] == "done"
@@ -0,0 +1,155 @@
+# backend/tests/test_chat_sessions.py
+import time
+import asyncio
+import numpy as np
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.clients import cfg
+from app.services.chat_sessions import ChatSession, SessionStore, chat_turn
+
+
+def hit(point_id, text, score=0.9):
+    h = MagicMock()
+    h.id = point_id
+    h.score = score
+    h.payload = {"text": text, "source": "doc.txt"}
+    return h
+
+
+def generate_body(context):
+    return {"response": "An answer.", "context": context}
+
+
+@pytest.mark.unit
+class TestSessionStore:
+    """Tests for TTL expiry and memory-budget eviction"""
+
+    def test_ttl_expiry(self):
+        store = SessionStore(ttl_s=60, max_memory_mb=1)
+        session = store.create("docs")
+        assert store.get(session.id) is session
+
+        session.last_used = time.monotonic() - 120
+        assert store.get(session.id) is None
+        assert store.snapshot()["expired"] == 1
+
+    def test_memory_budget_evicts_least_recent(self):
+        store = SessionStore(ttl_s=60, max_memory_mb=0.01)   # ~10 KB
+        old, mid, new = store.create("docs"), store.create("docs"), store.create("docs")
+        for s in (old, mid, new):
+            s.chunks["1"] = "x" * 4000
+        store.get(old.id)                                    # old becomes most recent
+
+        store.sweep(keep=new.id)
+
+        assert store.get(mid.id) is None
+        assert store.get(old.id) is old
+        assert store.get(new.id) is new
+        assert store.snapshot()["evicted"] == 1
+
+
+@pytest.mark.integration
+class TestChatTurn:
+    """Tests for retrieval and Ollama context reuse across turns"""
+
+    @pytest.mark.asyncio
+    async def test_followup_reuses_context_and_skips_seen_chunks(self):
+        session = ChatSession(id="s1", collection="docs")
+        generate = AsyncMock(side_effect=[
+            (generate_body([1, 2, 3]), 0.1),
+            (generate_body([1, 2, 3, 4, 5]), 0.1),
+        ])
+        with patch("app.services.chat_sessions._get_query_embedding", AsyncMock(return_value=([0.1] * 4, 1.0))), \
+             patch("app.services.chat_sessions._ollama_generate", generate), \
+             patch("app.services.chat_sessions.qdrant") as mock_qdrant:
+            mock_qdrant.search = MagicMock(side_effect=[
+                [hit(1, "Alice fell down the rabbit hole."), hit(2, "The hole was deep.")],
+                [hit(2, "The hole was deep."), hit(3, "She met a white rabbit.")],
+            ])
+
+            first = await chat_turn(session, "Where did Alice fall?")
+            second = await chat_turn(session, "What did she meet?")
+
+        assert first["context_reused"] is False
+        assert second["context_reused"] is True
+        assert (second["new_chunks"], second["reused_chunks"]) == (1, 1)
+
+        prompt, context = generate.call_args_list[1].args
+        assert context == [1, 2, 3]
+        assert generate.call_args_list[1].kwargs["options"]["num_ctx"] >= 3 + len(prompt) // 4
+        assert "white rabbit" in prompt
+        assert "The hole was deep" not in prompt
+        assert session.ollama_context.dtype == np.int32
+        assert set(session.chunks) == {"1", "2", "3"}
+
+    @pytest.mark.asyncio
+    async def test_window_fits_the_reused_context(self):
+        session = ChatSession(id="s5", collection="docs")
+        session.chunks["1"] = "Old chunk."
+        session.ollama_context = np.zeros(3000, dtype=np.int32)
+        generate = AsyncMock(return_value=(generate_body([9]), 0.1))
+
+        with patch("app.services.chat_sessions._get_query_embedding", AsyncMock(return_value=([0.1] * 4, 1.0))), \
+             patch("app.services.chat_sessions._ollama_generate", generate), \
+             patch("app.services.chat_sessions.qdrant") as mock_qdrant:
+            mock_qdrant.search = MagicMock(return_value=[hit(1, "Old chunk.")])
+            result = await chat_turn(session, "Tell me more")
+
+        assert result["context_reused"] is True
+        # 3000 reused tokens + prompt + answer don't fit the default 2048 window
+        assert generate.call_args.kwargs["options"]["num_ctx"] == 4096
+
+    @pytest.mark.asyncio
+    async def test_full_context_starts_over(self):
+        session = ChatSession(id="s2", collection="docs")
+        session.chunks["1"] = "Old chunk."
+        session.ollama_context = np.zeros(cfg.chat.max_context_tokens, dtype=np.int32)
+        generate = AsyncMock(return_value=(generate_body([9]), 0.1))
+
+        with patch("app.services.chat_sessions._get_query_embedding", AsyncMock(return_value=([0.1] * 4, 1.0))), \
+             patch("app.services.chat_sessions._ollama_generate", generate), \
+             patch("app.services.chat_sessions.qdrant") as mock_qdrant:
+            mock_qdrant.search = MagicMock(return_value=[hit(1, "Old chunk."), hit(5, "New chunk.")])
+
+            result = await chat_turn(session, "Tell me more")
+
+        assert result["context_reused"] is False
+        prompt, context = generate.call_args.args
+        assert context is None
+        assert "Old chunk." in prompt and "New chunk." in prompt
+        assert session.context_tokens == 1
+
+    @pytest.mark.asyncio
+    async def test_first_turn_without_hits_skips_the_llm(self):
+        session = ChatSession(id="s3", collection="docs")
+        generate = AsyncMock(return_value=(generate_body([1]), 0.1))
+
+        with patch("app.services.chat_sessions._get_query_embedding", AsyncMock(return_value=([0.1] * 4, 1.0))), \
+             patch("app.services.chat_sessions._ollama_generate", generate), \
+             patch("app.services.chat_sessions.qdrant") as mock_qdrant:
+            mock_qdrant.search = MagicMock(return_value=[])
+
+            result = await chat_turn(session, "Where did Alice fall?")
+
+        assert result["answer"] == "No relevant documents found."
+        generate.assert_not_called()
+        assert session.turns == []
+
+    @pytest.mark.asyncio
+    async def test_cancelled_turn_leaves_session_unchanged(self):
+        session = ChatSession(id="s4", collection="docs")
+        session.chunks["1"] = "Old chunk."
+        session.ollama_context = np.zeros(cfg.chat.max_context_tokens, dtype=np.int32)
+        generate = AsyncMock(side_effect=asyncio.CancelledError)
+
+        with patch("app.services.chat_sessions._get_query_embedding", AsyncMock(return_value=([0.1] * 4, 1.0))), \
+             patch("app.services.chat_sessions._ollama_generate", generate), \
+             patch("app.services.chat_sessions.qdrant") as mock_qdrant:
+            mock_qdrant.search = MagicMock(return_value=[hit(5, "New chunk.")])
+            with pytest.raises(asyncio.CancelledError):
+                await chat_turn(session, "Tell me more")
+
+        assert session.chunks == {"1": "Old chunk."}
+        assert session.context_tokens == cfg.chat.max_context_tokens
+        assert session.turns == []
@@ -0,0 +1,198 @@
+# backend/tests/test_collection_registry.py
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi import HTTPException
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg
+from app.services.collection_registry import CollectionNotFound, CollectionRegistry, collection_registry
+from app.services.payload_filters import create_collection
+from app.services.rag_services import generate_rag_answer
+
+
+def counting(client):
+    """Wrap a client so Qdrant round-trips can be counted"""
+    return MagicMock(wraps=client)
+
+
+@pytest.fixture
+def local_qdrant():
+    client = QdrantClient(location=":memory:")
+    client.create_collection("docs", vectors_config=qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+    client.upsert("docs", points=[qmodels.PointStruct(id=i, vector=[1.0, i / 10], payload={"text": f"chunk {i}"}) for i in range(3)])
+    client.create_collection("wiki", vectors_config=qmodels.VectorParams(size=4, distance=qmodels.Distance.DOT))
+    return counting(client)
+
+
+@pytest.fixture
+def registry(local_qdrant, tmp_path):
+    with patch("app.services.collection_registry.qdrant", local_qdrant), \
+         patch.object(cfg.registry, "defaults_path", str(tmp_path / "defaults.json")), \
+         patch.object(cfg.registry, "defaults", {}):
+        yield CollectionRegistry()
+
+
+@pytest.mark.unit
+class TestCollectionRegistry:
+    """Cached names, vector configs and counts"""
+
+    def test_refresh_describes_collections(self, registry):
+        registry.refresh()
+        docs = registry.get("docs")
+        assert registry.names() == ["docs", "wiki"]
+        assert (docs.vector_size, docs.distance, docs.points_count) == (2, "Cosine", 3)
+        assert registry.get("wiki").distance == "Dot"
+
+    def test_known_names_need_no_round_trip(self, registry, local_qdrant):
+        registry.refresh()
+        local_qdrant.reset_mock()
+        for _ in range(5):
+            assert registry.require("docs").vector_size == 2
+        registry.names()
+        assert local_qdrant.method_calls == []
+
+    @pytest.mark.asyncio
+    async def test_async_lookups_leave_the_loop_only_for_qdrant(self, registry):
+        with patch("app.services.collection_registry.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            assert await registry.anames() == ["docs", "wiki"]      # first listing
+            assert (await registry.arequire("docs")).vector_size == 2
+            assert to_thread.call_count == 1
+
+            with pytest.raises(CollectionNotFound):
+                await registry.arequire("new")
+            assert await registry.amissing("new") is True
+            assert to_thread.call_count == 3
+
+    def test_unknown_names_rechecked_at_most_every_recheck_s(self, registry, local_qdrant):
+        registry.refresh()
+        local_qdrant.reset_mock()
+        with patch.object(cfg.registry, "recheck_s", 60):
+            assert registry.get("new") is None
+            assert registry.get("new") is None
+            assert local_qdrant.get_collections.call_count == 1
+            with pytest.raises(CollectionNotFound):
+                registry.require("new")
+
+        # Created by another worker: found once the recheck interval is over
+        local_qdrant.create_collection("new", vectors_config=qmodels.VectorParams(size=8, distance=qmodels.Distance.COSINE))
+        with patch.object(cfg.registry, "recheck_s", 0):
+            assert registry.get("new").vector_size == 8
+
+    def test_missing_only_after_a_refresh(self, registry):
+        assert registry.missing("nope") is False
+        registry.refresh()
+        assert registry.missing("nope") is True
+        assert registry.missing("docs") is False
+
+    def test_create_registers_and_invalidate_forgets(self, local_qdrant):
+        with patch("app.services.payload_filters.qdrant", local_qdrant), \
+             patch("app.services.collection_registry.qdrant", local_qdrant):
+            create_collection("fresh", qmodels.VectorParams(size=3, distance=qmodels.Distance.COSINE))
+            local_qdrant.reset_mock()
+            assert collection_registry.get("fresh").vector_size == 3
+            assert local_qdrant.method_calls == []
+
+            local_qdrant.delete_collection("fresh")
+            collection_registry.invalidate("fresh")
+            assert collection_registry.get("fresh") is None
+
+
+@pytest.mark.unit
+class TestCollectionDefaults:
+    """Per-collection top_k / score_threshold / embed_model"""
+
+    def test_falls_back_to_global_settings(self, registry):
+        defaults = registry.defaults("docs")
+        assert defaults.top_k == cfg.searchsettings.top_k
+        assert defaults.score_threshold == cfg.qdrant.score_threshold
+        assert defaults.embed_model == cfg.ollama.embed_model
+
+    def test_env_then_overrides(self, registry, tmp_path):
+        with patch.object(cfg.registry, "defaults", {"docs": {"top_k": 7, "score_threshold": 0.5}}):
+            registry.set_defaults("docs", score_threshold=0.0, embed_model="mxbai-embed-large")
+            defaults = registry.defaults("docs")
+            assert (defaults.top_k, defaults.score_threshold, defaults.embed_model) == (7, 0.0, "mxbai-embed-large")
+
+            # Persisted: a new registry (another worker, a restart) sees them
+            assert CollectionRegistry().defaults("docs").embed_model == "mxbai-embed-large"
+
+            registry.set_defaults("docs", embed_model=None)
+            assert registry.defaults("docs").embed_model == cfg.ollama.embed_model
+
+        with pytest.raises(ValueError):
+            registry.set_defaults("docs", chunk_size=10)
+
+    @pytest.mark.asyncio
+    async def test_validate_ingest_checks_dimensions(self, registry):
+        registry.refresh()
+        registry.record_embed_dim(cfg.ollama.embed_model, 2)
+        assert (await registry.validate_ingest("docs")).vector_size == 2
+        registry.record_embed_dim(cfg.ollama.embed_model, 768)
+        with pytest.raises(ValueError, match="2-dim"):
+            await registry.validate_ingest("docs")
+        with pytest.raises(CollectionNotFound):
+            await registry.validate_ingest("nope")
+
+    @pytest.mark.asyncio
+    async def test_unknown_model_size_is_probed_once(self, registry):
+        registry.refresh()
+        embed = AsyncMock(return_value=([0.1] * 768, 1.0))
+        with patch("app.services.rag_services._get_embedding", embed):
+            with pytest.raises(ValueError, match="768-dim"):
+                await registry.validate_ingest("docs")
+            with pytest.raises(ValueError):
+                await registry.validate_ingest("docs")
+        embed.assert_awaited_once()
+
+        # Ollama down: the check is skipped rather than blocking uploads
+        registry.invalidate()
+        registry.refresh()
+        with patch("app.services.rag_services._get_embedding", AsyncMock(side_effect=RuntimeError("down"))):
+            assert (await registry.validate_ingest("docs")).vector_size == 2
+
+
+@pytest.mark.integration
+class TestRegistryInPipeline:
+    """Query defaults and validation in the RAG pipeline and upload route"""
+
+    @pytest.mark.asyncio
+    async def test_unknown_collection_is_404_before_embedding(self, local_qdrant):
+        embed = AsyncMock(return_value=([1.0, 0.0], 1.0))
+        with patch("app.services.collection_registry.qdrant", local_qdrant), \
+             patch("app.services.rag_services._get_embedding", embed):
+            collection_registry.refresh()
+            with pytest.raises(HTTPException) as exc:
+                await generate_rag_answer("Where is Alice?", collection="nope")
+        assert exc.value.status_code == 404
+        embed.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_collection_defaults_used(self, tmp_path):
+        qdrant = MagicMock()
+        qdrant.search.return_value = []
+        embed = AsyncMock(return_value=([1.0, 0.0], 1.0))
+        with patch("app.services.rag_services.qdrant", qdrant), \
+             patch("app.services.rag_services._get_embedding", embed), \
+             patch.object(cfg.registry, "defaults_path", str(tmp_path / "defaults.json")), \
+             patch.object(cfg.registry, "defaults", {"docs": {"top_k": 6, "score_threshold": 0.1, "embed_model": "bge-m3"}}):
+            await generate_rag_answer("Where is Alice?", collection="docs", retrieval="dense")
+
+        assert qdrant.search.call_args.kwargs["limit"] == 6
+        assert qdrant.search.call_args.kwargs["score_threshold"] == 0.1
+        assert embed.call_args.kwargs["model"] == "bge-m3"
+
+    def test_upload_rejected_on_dimension_mismatch(self, test_client):
+        store = AsyncMock(return_value=(1, 0))
+        collection_registry.register("docs", qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+        collection_registry.record_embed_dim(cfg.ollama.embed_model, 768)
+        with patch("app.routes.base.embed_and_store", store):
+            response = test_client.post(
+                "/api/upload_docs",
+                files={"file": ("a.txt", b"Alice was tired.", "text/plain")},
+                data={"collection": "docs", "dedup": "false"},
+            )
+        assert response.status_code == 400
+        assert "768-dim" in response.json()["detail"]
+        store.assert_not_called()
@@ -0,0 +1,167 @@
+# backend/tests/test_context_compression.py
+import numpy as np
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg
+from app.services.context_compression import (
+    SentenceEmbeddingCache,
+    compress_context,
+    lexical_scores,
+    split_sentences,
+)
+from app.services.rag_services import generate_rag_answer
+
+ALICE = (
+    "Alice was beginning to get very tired of sitting by her sister on the bank. "
+    "Once or twice she had peeped into the book her sister was reading. "
+    "The White Rabbit wore a waistcoat and carried a pocket watch. "
+    "It was a hot day, and she felt very sleepy and stupid."
+)
+RECIPE = "Mix the flour with two eggs and a cup of milk. Bake the cake for forty minutes at 180 degrees."
+
+
+def hit(pid, text, source):
+    return qmodels.ScoredPoint(id=pid, version=0, score=1.0 - pid / 10, payload={"text": text, "source": source})
+
+
+@pytest.mark.unit
+class TestSentenceSelection:
+    """Tests for splitting, scoring and budgeted selection"""
+
+    def test_split_sentences(self):
+        assert len(split_sentences(ALICE)) == 4
+        assert split_sentences("Dr. Who arrived. Fine.", min_chars=10) == ["Dr. Who arrived. Fine."]
+        assert split_sentences("First paragraph\n\nSecond paragraph", min_chars=1) == ["First paragraph", "Second paragraph"]
+
+    def test_lexical_scores_prefer_query_terms(self):
+        sentences = split_sentences(ALICE)
+        scores = lexical_scores("What did the White Rabbit carry?", sentences)
+        assert int(np.argmax(scores)) == 2
+        assert lexical_scores("", sentences).tolist() == [0.0] * 4
+
+    @pytest.mark.asyncio
+    async def test_keeps_best_sentences_in_order_with_source(self):
+        hits = [hit(0, ALICE, "alice.txt"), hit(1, RECIPE, "cake.txt")]
+        result = await compress_context("rabbit waistcoat watch and sister", hits, max_chars=200)
+
+        assert result["context"].startswith("[alice.txt] ")
+        assert "waistcoat" in result["context"]
+        assert "cake.txt" not in result["context"]        # nothing relevant there
+        assert len(result["context"]) <= 200 + len("[alice.txt] ")
+        # document order is kept
+        if "sister" in result["context"]:
+            assert result["context"].index("sister") < result["context"].index("waistcoat")
+        assert 0 < result["ratio"] < 1
+        assert result["method"] == "lexical"
+
+    @pytest.mark.asyncio
+    async def test_embedding_scores_use_cache(self):
+        vectors = {s: [float(i == 2), 1.0] for i, s in enumerate(split_sentences(ALICE))}
+        embed = AsyncMock(side_effect=lambda text: (vectors[text], 1.0))
+        cache = SentenceEmbeddingCache(max_items=100)
+        with patch("app.services.context_compression.sentence_cache", cache), \
+             patch.object(cfg.compression, "method", "embedding"):
+            first = await compress_context("q", [hit(0, ALICE, "a.txt")], 80, query_vec=[1.0, 0.0], embed=embed)
+            second = await compress_context("q", [hit(0, ALICE, "a.txt")], 80, query_vec=[1.0, 0.0], embed=embed)
+
+        assert first["method"] == "embedding"
+        assert "waistcoat" in first["context"] and first["context"] == second["context"]
+        assert embed.await_count == 4                      # second call served from the cache
+        assert cache.snapshot()["items"] == 4
+
+
+    @pytest.mark.asyncio
+    async def test_slow_embeddings_fall_back_to_lexical(self):
+        async def slow(text):
+            await asyncio.sleep(1)
+
+        with patch("app.services.context_compression.sentence_cache", SentenceEmbeddingCache(max_items=100)), \
+             patch.object(cfg.compression, "method", "embedding"):
+            result = await compress_context(
+                "white rabbit", [hit(0, ALICE, "a.txt")], 80, query_vec=[1.0, 0.0], embed=slow, timeout=0.05
+            )
+
+        assert result["method"] == "lexical"
+        assert result["context"]
+
+
+    @pytest.mark.asyncio
+    async def test_failed_embeddings_fall_back_to_lexical(self):
+        async def down(text):
+            raise RuntimeError("qdrant circuit is open")
+
+        with patch("app.services.context_compression.sentence_cache", SentenceEmbeddingCache(max_items=100)), \
+             patch.object(cfg.compression, "method", "embedding"):
+            result = await compress_context(
+                "white rabbit", [hit(0, ALICE, "a.txt")], 80, query_vec=[1.0, 0.0], embed=down
+            )
+
+        assert result["method"] == "lexical" and result["context"]
+
+
+@pytest.mark.integration
+class TestCompressedPipeline:
+    """Compression inside generate_rag_answer"""
+
+    @pytest.mark.asyncio
+    async def test_prompt_contains_only_selected_sentences(self):
+        qdrant = MagicMock()
+        qdrant.search.return_value = [hit(0, ALICE, "alice.txt"), hit(1, RECIPE, "cake.txt")]
+        generate = AsyncMock(return_value=({"response": "A pocket watch."}, 0.1))
+        with patch("app.services.rag_services.qdrant", qdrant), \
+             patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([1.0, 0.0], 1.0))), \
+             patch("app.services.rag_services._ollama_generate", generate), \
+             patch.object(cfg.compression, "max_tokens", 40):
+            result = await generate_rag_answer("What did the rabbit carry?", top_k=2, collection="docs", compress=True)
+
+        prompt = generate.call_args.args[0]
+        assert "pocket watch" in prompt and "flour" not in prompt
+        assert result["context_used"] == 1
+        assert 0 < result["timing"]["compression_ratio"] < 0.5
+        assert "compression" in result["timing"]
+
+    @pytest.mark.asyncio
+    async def test_skipped_when_generation_is_skipped(self):
+        qdrant = MagicMock()
+        qdrant.search.return_value = [hit(0, ALICE, "alice.txt")]
+        compress = AsyncMock()
+        with patch("app.services.rag_services.qdrant", qdrant), \
+             patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([1.0, 0.0], 1.0))), \
+             patch("app.services.rag_services.compress_context", compress), \
+             patch.object(cfg.budget, "min_llm_ms", 60000):
+            result = await generate_rag_answer("Who?", collection="docs", compress=True, deadline_ms=5000)
+
+        assert result["degraded"] is True
+        compress.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_leaves_the_generation_budget_alone(self):
+        qdrant = MagicMock()
+        qdrant.search.return_value = [hit(0, ALICE, "alice.txt")]
+        compress = AsyncMock(return_value={"context": ALICE, "chunks": 1, "ratio": 1.0})
+        generate = AsyncMock(return_value=({"response": "ok"}, 0.1))
+        with patch("app.services.rag_services.qdrant", qdrant), \
+             patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([1.0, 0.0], 1.0))), \
+             patch("app.services.rag_services.compress_context", compress), \
+             patch("app.services.rag_services._ollama_generate", generate), \
+             patch.object(cfg.budget, "min_llm_ms", 4000):
+            await generate_rag_answer("Who?", collection="docs", compress=True, deadline_ms=10000)
+
+        assert compress.call_args.kwargs["timeout"] <= 6.0
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self):
+        qdrant = MagicMock()
+        qdrant.search.return_value = [hit(0, ALICE, "alice.txt")]
+        generate = AsyncMock(return_value=({"response": "ok"}, 0.1))
+        with patch("app.services.rag_services.qdrant", qdrant), \
+             patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([1.0, 0.0], 1.0))), \
+             patch("app.services.rag_services._ollama_generate", generate), \
+             patch.object(cfg.compression, "enabled", False):
+            result = await generate_rag_answer("What did the rabbit carry?", top_k=1, collection="docs")
+
+        assert ALICE in generate.call_args.args[0]
+        assert "compression_ratio" not in result["timing"]
@@ -0,0 +1,79 @@
+# backend/tests/test_dedup.py
+import pytest
+from unittest.mock import patch, MagicMock
+
+from app.services.dedup import DedupService, MinHasher, content_hash
+
+LICENSE = (
+    "Licensed under the Apache License, Version 2.0 (the License); you may not use "
+    "this file except in compliance with the License. You may obtain a copy of the "
+    "License at http://www.apache.org/licenses/LICENSE-2.0 unless required by law."
+)
+
+
+def stored_point(text, source="old.txt", chunk_index=1):
+    point = MagicMock()
+    point.id = chunk_index
+    point.payload = {"text": text, "source": source, "chunk_index": chunk_index}
+    return point
+
+
+@pytest.mark.unit
+class TestMinHash:
+    """Tests for MinHash signatures"""
+
+    def test_similar_texts_have_similar_signatures(self):
+        hasher = MinHasher(num_perm=128, shingle_size=3)
+        a = hasher.signature(LICENSE)
+        b = hasher.signature(LICENSE + " See NOTICE.")
+        c = hasher.signature("Alice was beginning to get very tired of sitting by her sister.")
+
+        assert (a == b).mean() > 0.85
+        assert (a == c).mean() < 0.2
+
+    def test_content_hash_ignores_formatting(self):
+        assert content_hash("Hello   World\n") == content_hash("hello world")
+
+
+@pytest.mark.unit
+class TestDedupService:
+    """Tests for chunk filtering before embedding"""
+
+    @pytest.mark.asyncio
+    async def test_filters_against_collection_and_upload(self):
+        """Exact, near and in-file duplicates are skipped"""
+        service = DedupService()
+        with patch("app.services.dedup.qdrant") as mock_qdrant:
+            mock_qdrant.scroll = MagicMock(return_value=([stored_point(LICENSE)], None))
+
+            chunks = [
+                LICENSE.upper(),                            # exact (normalized)
+                LICENSE + " See NOTICE.",                   # near
+                "Brand new content about vector search.",
+                "Brand new content about vector search.",   # repeated in upload
+            ]
+            await service.get_index("docs")
+            with patch.object(service.hasher, "signature", wraps=service.hasher.signature) as signature:
+                kept, duplicates = await service.filter_chunks("docs", chunks)
+
+        # One signature per chunk, shared by the collection and upload lookups
+        assert signature.call_count == len(chunks)
+        assert [idx for idx, _, _ in kept] == [3]
+        reasons = {d.chunk_index: (d.reason, d.duplicate_of) for d in duplicates}
+        assert reasons[1] == ("exact", "old.txt#1")
+        assert reasons[2][0] == "near"
+        assert reasons[4] == ("exact", "this upload#3")
+
+    @pytest.mark.asyncio
+    async def test_added_chunks_are_indexed(self):
+        """Chunks stored after loading are seen by later uploads"""
+        service = DedupService()
+        with patch("app.services.dedup.qdrant") as mock_qdrant:
+            mock_qdrant.scroll = MagicMock(return_value=([], None))
+            await service.get_index("docs")
+
+            service.add("docs", LICENSE, "new.txt#1")
+            kept, duplicates = await service.filter_chunks("docs", [LICENSE])
+
+        assert kept == []
+        assert duplicates[0].duplicate_of == "new.txt#1"
@@ -0,0 +1,174 @@
+# backend/tests/test_dir_sync.py
+import os
+import asyncio
+import pytest
+from unittest.mock import patch
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg
+from app.services.dir_sync import DirectorySync, Manifest, SyncLock, SyncService, scan
+from app.cli import main as cli_main
+
+
+async def fake_embedding(text, model=None):
+    return [1.0, float(len(text) % 7)], 1.0
+
+
+def write(path, text, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+def stored_sources(client):
+    points, _ = client.scroll("docs", limit=1000, with_payload=True)
+    return sorted(p.payload["source"] for p in points)
+
+
+@pytest.fixture
+def local_qdrant():
+    client = QdrantClient(location=":memory:")
+    client.create_collection("docs", vectors_config=qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+    # The in-memory client is not thread-safe: sync one file at a time
+    with patch("app.services.dir_sync.qdrant", client), \
+         patch("app.services.ingest_service.qdrant", client), \
+         patch("app.services.ingest_service._get_embedding", side_effect=fake_embedding), \
+         patch.object(cfg.sync, "file_concurrency", 1):
+        yield client
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "docs"
+    write(root / "a.txt", "Alice was tired. She sat by her sister.", mtime=1_000)
+    write(root / "guide" / "b.md", "The rabbit had a watch.", mtime=1_000)
+    write(root / "image.png", "not text")
+    write(root / ".hidden" / "c.txt", "skip me")
+    return root
+
+
+@pytest.fixture
+def syncer(tmp_path):
+    return DirectorySync(Manifest(str(tmp_path / "manifest.sqlite3")))
+
+
+@pytest.mark.unit
+class TestScan:
+    """Tests for the directory scan"""
+
+    def test_supported_files_only(self, tree):
+        assert sorted(scan(str(tree))) == ["a.txt", "guide/b.md"]
+
+
+@pytest.mark.integration
+class TestDirectorySync:
+    """Incremental sync against an in-memory Qdrant"""
+
+    @pytest.mark.asyncio
+    async def test_initial_then_noop(self, local_qdrant, tree, syncer):
+        first = await syncer.sync("docs", str(tree))
+        assert first["added"] == ["a.txt", "guide/b.md"]
+        assert first["chunks_stored"] == 2
+        assert stored_sources(local_qdrant) == ["a.txt", "guide/b.md"]
+
+        second = await syncer.sync("docs", str(tree))
+        assert second["added"] == second["changed"] == second["removed"] == []
+        assert second["chunks_stored"] == 0
+
+    @pytest.mark.asyncio
+    async def test_changed_touched_and_removed(self, local_qdrant, tree, syncer):
+        await syncer.sync("docs", str(tree))
+        old_ids = {p.id for p in local_qdrant.scroll("docs", limit=100)[0] if p.payload["source"] == "a.txt"}
+
+        write(tree / "a.txt", "Alice fell down the hole.", mtime=2_000)       # new content
+        os.utime(tree / "guide" / "b.md", ns=(3_000, 3_000))                   # same content, new mtime
+        write(tree / "new.md", "A new page.", mtime=1_000)
+        report = await syncer.sync("docs", str(tree))
+
+        assert report["changed"] == ["a.txt"] and report["added"] == ["new.md"]
+        assert report["touched"] == 1
+        points = local_qdrant.scroll("docs", limit=100, with_payload=True)[0]
+        a_points = [p for p in points if p.payload["source"] == "a.txt"]
+        assert [p.payload["text"] for p in a_points] == ["Alice fell down the hole."]
+        assert not old_ids & {p.id for p in a_points}
+
+        (tree / "guide" / "b.md").unlink()
+        report = await syncer.sync("docs", str(tree))
+        assert report["removed"] == ["guide/b.md"] and report["chunks_deleted"] == 1
+        assert stored_sources(local_qdrant) == ["a.txt", "new.md"]
+
+    @pytest.mark.asyncio
+    async def test_dry_run_changes_nothing(self, local_qdrant, tree, syncer):
+        report = await syncer.sync("docs", str(tree), dry_run=True)
+        assert report["added"] == ["a.txt", "guide/b.md"]
+        assert local_qdrant.count("docs").count == 0
+        assert syncer.manifest.load("docs") == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_embeddings_retried_next_time(self, local_qdrant, tree, syncer):
+        async def broken(text, model=None):
+            raise RuntimeError("ollama down")
+
+        with patch("app.services.ingest_service._get_embedding", side_effect=broken):
+            report = await syncer.sync("docs", str(tree))
+        assert sorted(report["failed"]) == ["a.txt", "guide/b.md"]
+
+        report = await syncer.sync("docs", str(tree))
+        assert report["added"] == ["a.txt", "guide/b.md"]
+
+    @pytest.mark.asyncio
+    async def test_partly_failed_new_file_leaves_no_duplicates(self, local_qdrant, tree, syncer):
+        write(tree / "a.txt", "Alice was tired. She sat by her sister. The book had no pictures.")
+        # Same file name uploaded by hand: not the sync's to delete
+        local_qdrant.upsert("docs", points=[qmodels.PointStruct(id=1, vector=[1.0, 0.0], payload={"source": "a.txt"})])
+
+        async def flaky(text, model=None):
+            if "pictures" in text:
+                raise RuntimeError("ollama down")
+            return await fake_embedding(text, model)
+
+        with patch.object(cfg.sync, "chunk_size", 40), patch.object(cfg.sync, "overlap", 0):
+            with patch("app.services.ingest_service._get_embedding", side_effect=flaky):
+                report = await syncer.sync("docs", str(tree))
+            assert "a.txt" in report["failed"]
+            await syncer.sync("docs", str(tree))
+
+            synced = [p for p in local_qdrant.scroll("docs", limit=100, with_payload=True)[0]
+                      if p.payload["source"] == "a.txt" and "sync_root" in p.payload]
+            assert sorted(p.payload["chunk_index"] for p in synced) == [1, 2]
+
+            (tree / "a.txt").unlink()
+            await syncer.sync("docs", str(tree))
+        assert stored_sources(local_qdrant) == ["a.txt", "guide/b.md"]
+        assert local_qdrant.retrieve("docs", ids=[1])
+
+    def test_cli_dry_run(self, local_qdrant, tree, tmp_path, capsys):
+        code = cli_main(["sync", str(tree), "--collection", "docs", "--dry-run",
+                         "--manifest", str(tmp_path / "m.sqlite3")])
+        assert code == 0
+        assert '"added": 2' in capsys.readouterr().out
+
+
+@pytest.mark.unit
+class TestSyncLock:
+    """Only one worker runs the background sync"""
+
+    @pytest.mark.asyncio
+    async def test_second_worker_skips_start(self, tmp_path):
+        lock_path = str(tmp_path / "manifest.lock")
+        owner = SyncService(DirectorySync(Manifest(str(tmp_path / "m.sqlite3"))), SyncLock(lock_path))
+        other = SyncService(DirectorySync(Manifest(str(tmp_path / "m.sqlite3"))), SyncLock(lock_path))
+        with patch.object(cfg.sync, "targets", {"docs": str(tmp_path)}), \
+             patch.object(SyncService, "_run", side_effect=lambda *args: asyncio.sleep(3600)):
+            owner.start()
+            other.start()
+            assert owner.snapshot()["running"] == ["docs"] and owner.snapshot()["owner"] is True
+            assert other.snapshot()["running"] == [] and other.snapshot()["owner"] is False
+            with pytest.raises(RuntimeError):
+                await other.run_once("docs")
+
+            await owner.stop()
+            assert other.lock.acquire()
+            other.lock.release()
@@ -0,0 +1,137 @@
+# backend/tests/test_embed_batching.py
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi import HTTPException
+
+from app.clients import cfg
+from app.services.concurrency import MicroBatcher
+from app.services.model_lifecycle import EMBEDDING, track_cold_loads
+from app.services.rag_services import _get_embeddings, _get_query_embedding, query_embed_batcher
+
+
+def recording_sender(calls):
+    async def send(items):
+        calls.append(list(items))
+        await asyncio.sleep(0)
+        return [f"vec:{item}" for item in items]
+    return send
+
+
+@pytest.mark.unit
+class TestMicroBatcher:
+    """Tests for the generic micro-batcher"""
+
+    @pytest.mark.asyncio
+    async def test_window_collects_concurrent_items(self):
+        calls = []
+        batcher = MicroBatcher("test", recording_sender(calls), max_size=10, max_wait_ms=5)
+        results = await asyncio.gather(*(batcher.submit(q) for q in ["a", "b", "a", "c"]))
+
+        assert results == ["vec:a", "vec:b", "vec:a", "vec:c"]
+        assert calls == [["a", "b", "c"]]               # one call, duplicates sent once
+        stats = batcher.snapshot()
+        assert stats["batches"] == 1 and stats["items"] == 4
+        assert stats["batch_size"]["max"] == 4
+        assert stats["wait_ms"]["max"] >= 0
+
+    @pytest.mark.asyncio
+    async def test_full_batch_dispatched_without_waiting(self):
+        calls = []
+        batcher = MicroBatcher("test", recording_sender(calls), max_size=2, max_wait_ms=10_000)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(q) for q in ["a", "b", "c", "d"])), timeout=1
+        )
+        assert results == ["vec:a", "vec:b", "vec:c", "vec:d"]
+        assert calls == [["a", "b"], ["c", "d"]]
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_caller(self):
+        async def broken(items):
+            raise RuntimeError("ollama down")
+
+        batcher = MicroBatcher("test", broken, max_size=10, max_wait_ms=1)
+        results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert batcher.snapshot()["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_is_skipped(self):
+        calls = []
+        batcher = MicroBatcher("test", recording_sender(calls), max_size=10, max_wait_ms=20)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(batcher.submit("gone"), timeout=0.001)
+        assert await batcher.submit("kept") == "vec:kept"
+        assert calls == [["kept"]]
+
+
+    @pytest.mark.asyncio
+    async def test_batch_tasks_are_referenced_until_done(self):
+        release = asyncio.Event()
+
+        async def slow(items):
+            await release.wait()
+            return items
+
+        batcher = MicroBatcher("test", slow, max_size=1, max_wait_ms=1)
+        future = batcher.submit("a")
+        assert len(batcher._tasks) == 1
+        release.set()
+        assert await future == "a"
+        await asyncio.sleep(0)
+        assert batcher._tasks == set()
+
+
+@pytest.mark.integration
+class TestBatchedQueryEmbeddings:
+    """Query embeddings through /api/embed"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_call(self):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"embeddings": [[1.0, 0.0], [0.0, 1.0]]}
+        with patch("app.services.rag_services.http_client") as mock_http, \
+             patch.object(cfg.ollama, "embed_batching", True), \
+             patch.object(cfg.ollama, "embed_hedge_urls", []):
+            mock_http.post = AsyncMock(return_value=response)
+            (vec_a, _), (vec_b, _) = await asyncio.gather(
+                _get_query_embedding("first query"), _get_query_embedding("second query")
+            )
+
+        assert mock_http.post.await_count == 1
+        call = mock_http.post.call_args
+        assert call.args[0].endswith("/api/embed")
+        assert call.kwargs["json"]["input"] == ["first query", "second query"]
+        assert (vec_a, vec_b) == ([1.0, 0.0], [0.0, 1.0])
+        assert query_embed_batcher.snapshot()["batches"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_every_caller_sees_a_shared_cold_load(self):
+        """The batch task runs in the first caller's context; the flag must reach both requests"""
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"embeddings": [[1.0, 0.0], [0.0, 1.0]], "load_duration": 3_000_000_000}
+
+        async def request(query):
+            flags = track_cold_loads()
+            await _get_query_embedding(query)
+            return flags
+
+        with patch("app.services.rag_services.http_client") as mock_http, \
+             patch.object(cfg.ollama, "embed_batching", True), \
+             patch.object(cfg.ollama, "embed_hedge_urls", []):
+            mock_http.post = AsyncMock(return_value=response)
+            first, second = await asyncio.gather(request("cold one"), request("cold two"))
+
+        assert mock_http.post.await_count == 1
+        assert first == second == {EMBEDDING: True}
+
+    @pytest.mark.asyncio
+    async def test_count_mismatch_is_an_error(self):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"embeddings": [[1.0, 0.0]]}
+        with patch("app.services.rag_services.http_client") as mock_http, \
+             patch.object(cfg.ollama, "embed_hedge_urls", []):
+            mock_http.post = AsyncMock(return_value=response)
+            with pytest.raises(HTTPException) as exc:
+                await _get_embeddings(["a", "b"])
+        assert exc.value.status_code == 500
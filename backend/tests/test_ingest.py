@@ -0,0 +1,135 @@
+# backend/tests/test_ingest.py
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.clients import cfg
+from app.services.concurrency import AdaptiveLimiter, WriteGate, WriteRejected
+from app.services.ingest_service import embed_and_store
+
+
+@pytest.mark.unit
+class TestAdaptiveLimiter:
+    """Tests for AIMD concurrency control"""
+
+    def test_additive_increase_on_fast_calls(self):
+        """Steady latency grows the limit up to the ceiling"""
+        limiter = AdaptiveLimiter("test", min_limit=1, max_limit=4, initial=1)
+        for _ in range(50):
+            limiter._update(100.0, ok=True)
+        assert limiter.snapshot()["limit"] == 4
+
+    def test_multiplicative_decrease_on_errors(self):
+        """Errors shrink the limit, never below the floor"""
+        limiter = AdaptiveLimiter("test", min_limit=2, max_limit=8, initial=8, backoff=0.5)
+        limiter._update(0.0, ok=False)
+        assert limiter.snapshot()["limit"] == 4
+        limiter._last_decrease = 0
+        limiter._update(0.0, ok=False)
+        limiter._last_decrease = 0
+        limiter._update(0.0, ok=False)
+        assert limiter.snapshot()["limit"] == 2
+
+    def test_latency_spike_decreases(self):
+        """Latency far above the baseline counts as congestion"""
+        limiter = AdaptiveLimiter("test", min_limit=1, max_limit=8, initial=6, tolerance=2.0)
+        limiter._update(100.0, ok=True)
+        limiter._update(500.0, ok=True)
+        assert limiter.limit < 6
+
+    @pytest.mark.asyncio
+    async def test_limit_caps_in_flight(self):
+        """No more than `limit` slots are held at once"""
+        limiter = AdaptiveLimiter("test", min_limit=2, max_limit=2)
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*[work() for _ in range(6)])
+        assert peak == 2
+        assert limiter.in_flight == 0
+
+
+@pytest.mark.unit
+class TestWriteGate:
+    """Tests for pausing writes during a re-index switch"""
+
+    @pytest.mark.asyncio
+    async def test_pause_drains_then_holds_writes(self):
+        gate = WriteGate()
+        order = []
+        release_writer = asyncio.Event()
+
+        async def in_flight():
+            async with gate.writing("docs"):
+                order.append("in flight")
+                await release_writer.wait()
+                order.append("in flight done")
+
+        async def late():
+            async with gate.writing("docs"):
+                order.append("late")
+
+        first = asyncio.create_task(in_flight())
+        await asyncio.sleep(0)
+        async with gate.writing("other"):        # other collections are not affected
+            pass
+
+        async def pause():
+            async with gate.paused("docs"):
+                order.append("paused")
+                second = asyncio.create_task(late())
+                await asyncio.sleep(0.01)
+                order.append("resuming")
+            await second
+
+        pausing = asyncio.create_task(pause())
+        await asyncio.sleep(0.01)
+        assert order == ["in flight"]
+        release_writer.set()
+        await asyncio.gather(first, pausing)
+        assert order == ["in flight", "in flight done", "paused", "resuming", "late"]
+
+    @pytest.mark.asyncio
+    async def test_retired_collection_rejects_writes(self):
+        gate = WriteGate()
+        gate.retire("docs", "moved")
+        with pytest.raises(WriteRejected, match="moved"):
+            async with gate.writing("docs"):
+                pass
+        gate.reopen("docs")
+        async with gate.writing("docs"):
+            pass
+        assert gate.snapshot() == {"writing": {}, "paused": [], "retired": []}
+
+
+@pytest.mark.integration
+class TestEmbedAndStore:
+    """Tests for the concurrent embed + batched upsert pipeline"""
+
+    @pytest.mark.asyncio
+    async def test_batches_upserts_and_counts_failures(self):
+        """Chunks are upserted in batches; failed embeddings are counted"""
+        async def fake_embedding(text, model=None):
+            if text == "bad":
+                raise RuntimeError("ollama down")
+            return [0.1] * 4, 1.0
+
+        items = [(i, f"chunk {i}", None) for i in range(1, 6)] + [(6, "bad", None)]
+        with patch("app.services.ingest_service._get_embedding", side_effect=fake_embedding), \
+             patch("app.services.ingest_service.qdrant") as mock_qdrant, \
+             patch.object(cfg.ingest, "upsert_batch_size", 2):
+            mock_qdrant.upsert = MagicMock()
+
+            stored, failed = await embed_and_store("docs", "a.txt", items)
+
+        assert (stored, failed) == (5, 1)
+        assert mock_qdrant.upsert.call_count == 3
+        payload = mock_qdrant.upsert.call_args_list[0].kwargs["points"][0].payload
+        assert payload["source"] == "a.txt"
+        assert "content_hash" in payload
+        assert payload["stored_at"] >= payload["uploaded_at"]
@@ -0,0 +1,214 @@
+# backend/tests/test_lexical_index.py
+import time
+import asyncio
+import json
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg
+from app.services.lexical_index import (
+    BM25Index,
+    LexicalIndexService,
+    is_identifier_query,
+    rrf_fuse,
+    tokenize,
+)
+from app.services.rag_services import retrieve
+
+DOCS = {
+    1: "Connection failed with ERR_CONN_RESET after 30 seconds.",
+    2: "Set qdrant.collection in the config to change the target collection.",
+    3: "Alice followed the white rabbit down the hole.",
+    4: "The rabbit was late, the rabbit was always late.",
+}
+
+
+def point(pid, score=1.0, text=None):
+    return qmodels.ScoredPoint(id=pid, version=0, score=score, payload={"text": text or DOCS.get(pid, ""), "source": "a.txt"})
+
+
+@pytest.fixture
+def index():
+    bm25 = BM25Index(k1=1.2, b=0.75)
+    for pid, text in DOCS.items():
+        bm25.add(pid, {"text": text, "source": "a.txt", "chunk_index": pid, "uploaded_at": 0})
+    return bm25
+
+
+@pytest.mark.unit
+class TestTokenizer:
+    """Tests for tokenization and query classification"""
+
+    def test_identifiers_kept_whole_and_split(self):
+        tokens = tokenize("Check ERR_CONN_RESET in qdrant.collection")
+        assert "err_conn_reset" in tokens and "conn" in tokens
+        assert "qdrant.collection" in tokens and "qdrant" in tokens
+
+    @pytest.mark.parametrize("query,expected", [
+        ("ERR_CONN_RESET", True),
+        ("qdrant.collection", True),
+        ("E1234 ERR_CONN_RESET", True),
+        ("IBM", True),
+        ("error E1234", False),
+        ("Who founded IBM?", False),
+        ("where is the white rabbit", False),
+        ("Alice", False),
+        ("", False),
+    ])
+    def test_identifier_queries(self, query, expected):
+        assert is_identifier_query(query) is expected
+
+
+@pytest.mark.unit
+class TestBM25Index:
+    """Tests for BM25 ranking, updates and persistence"""
+
+    def test_ranking(self, index):
+        assert index.search("ERR_CONN_RESET", 3)[0].id == 1
+        hits = index.search("rabbit", 5)
+        assert [h.id for h in hits] == [4, 3]           # higher term frequency wins
+        assert hits[0].payload == {"text": DOCS[4], "source": "a.txt", "chunk_index": 4}
+
+    def test_replace_and_remove(self, index):
+        index.add(3, {"text": "Nothing to see here."})
+        assert [h.id for h in index.search("rabbit", 5)] == [4]
+        index.remove([4, 99])
+        assert index.search("rabbit", 5) == []
+        assert len(index) == 3
+
+    def test_save_load_with_deleted_rows(self, index, tmp_path):
+        path = str(tmp_path / "docs.jsonl")
+        index.save(path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": 4, "deleted": True}) + "\n")
+            f.write(json.dumps({"id": 5, "text": "A rabbit appended later."}) + "\n")
+
+        loaded = BM25Index.load(path)
+        assert not loaded.dirty
+        assert sorted(h.id for h in loaded.search("rabbit", 5)) == [3, 5]
+
+    def test_rrf_fuse(self):
+        dense = [point(3), point(4), point(2)]
+        lexical = [point(4), point(1)]
+        fused = rrf_fuse([dense, lexical], 3, k=60)
+        assert [h.id for h in fused] == [4, 3, 1]
+        assert fused[0].score == pytest.approx(1 / 62 + 1 / 61)
+
+
+@pytest.mark.integration
+class TestLexicalIndexService:
+    """Tests for loading, hooks and fallback"""
+
+    @pytest.mark.asyncio
+    async def test_builds_from_qdrant_then_serves(self, tmp_path):
+        records = [MagicMock(id=pid, payload={"text": text, "source": "a.txt"}) for pid, text in DOCS.items()]
+        client = MagicMock()
+        client.scroll.return_value = (records, None)
+        service = LexicalIndexService()
+        with patch("app.services.lexical_index.qdrant", client), \
+             patch.object(cfg.lexical, "enabled", True), \
+             patch.object(cfg.lexical, "dir", str(tmp_path)):
+            assert service.search("docs", "rabbit", 3) is None
+            service.add_points("docs", [qmodels.PointStruct(id=7, vector=[0.0], payload={"text": "rabbit rabbit rabbit"})])
+            while service.snapshot()["loading"]:
+                await asyncio.sleep(0.01)
+
+            assert [h.id for h in service.search("docs", "rabbit", 3)] == [7, 4, 3]
+            # Async callers score in a worker thread
+            with patch("app.services.lexical_index.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+                assert [h.id for h in await service.asearch("docs", "rabbit", 3)] == [7, 4, 3]
+            to_thread.assert_called_once()
+            service.remove_points("docs", [7])
+            assert service.search("docs", "rabbit", 1)[0].id == 4
+
+            await service.stop()
+            assert (tmp_path / "docs.jsonl").exists()
+            assert client.scroll.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_reconciles_with_uploads_from_other_workers(self, tmp_path):
+        client = QdrantClient(location=":memory:")
+        client.create_collection("docs", vectors_config=qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+        client.upsert("docs", points=[
+            qmodels.PointStruct(id=pid, vector=[1.0, 0.0], payload={"text": text, "stored_at": 100.0})
+            for pid, text in DOCS.items()
+        ])
+        with patch("app.services.lexical_index.qdrant", client), \
+             patch("app.services.local_index.qdrant", client), \
+             patch.object(cfg.lexical, "enabled", True), \
+             patch.object(cfg.lexical, "dir", str(tmp_path)):
+            worker_a, worker_b = LexicalIndexService(), LexicalIndexService()
+            await worker_a._load("docs")
+            await worker_b._load("docs")
+
+            # Uploaded through worker B: worker A catches up on its next reconcile
+            point = qmodels.PointStruct(id=9, vector=[1.0, 0.0], payload={"text": "rabbit rabbit rabbit", "stored_at": time.time()})
+            client.upsert("docs", points=[point])
+            worker_b.add_points("docs", [point])
+            assert worker_a.search("docs", "rabbit", 1)[0].id == 4
+
+            # Worker A writes the file last: a restart rebuilds instead of trusting it
+            worker_a._indexes["docs"].dirty = True
+            await worker_a.persist()
+            restarted = LexicalIndexService()
+            await restarted._load("docs")
+            assert restarted.search("docs", "rabbit", 1)[0].id == 9
+
+            await worker_a.reconcile()
+            assert worker_a.search("docs", "rabbit", 1)[0].id == 9
+
+    def test_disabled_returns_none(self):
+        with patch.object(cfg.lexical, "enabled", False):
+            assert LexicalIndexService().search("docs", "rabbit", 3) is None
+
+
+@pytest.mark.integration
+class TestRetrieve:
+    """Tests for retrieval mode selection"""
+
+    @pytest.mark.asyncio
+    async def test_auto_identifier_query_skips_embedding(self):
+        embed = AsyncMock(return_value=([1.0, 0.0], 5.0))
+        lexical = MagicMock()
+        lexical.asearch = AsyncMock(return_value=[point(1)])
+        with patch("app.services.rag_services._get_embedding", embed), \
+             patch("app.services.rag_services.lexical_index", lexical):
+            result = await retrieve("ERR_CONN_RESET", "docs", 3)
+
+        assert result["retrieval"] == "lexical"
+        assert [h.id for h in result["hits"]] == [1]
+        embed.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_auto_falls_back_to_dense(self):
+        embed = AsyncMock(return_value=([1.0, 0.0], 5.0))
+        lexical = MagicMock()
+        lexical.asearch = AsyncMock(return_value=[])    # no lexical hits
+        qdrant = MagicMock()
+        qdrant.search.return_value = [point(3)]
+        with patch("app.services.rag_services._get_embedding", embed), \
+             patch("app.services.rag_services.lexical_index", lexical), \
+             patch("app.services.rag_services.qdrant", qdrant):
+            result = await retrieve("ERR_CONN_RESET", "docs", 3)
+            natural = await retrieve("where is the rabbit", "docs", 3)
+
+        assert result["retrieval"] == "dense" and natural["retrieval"] == "dense"
+        assert lexical.asearch.await_count == 1           # natural-language query never asks BM25
+        assert result["embedding_ms"] == 5.0
+
+    @pytest.mark.asyncio
+    async def test_hybrid_fuses_both_rankings(self):
+        lexical = MagicMock()
+        lexical.asearch = AsyncMock(return_value=[point(4), point(1)])
+        qdrant = MagicMock()
+        qdrant.search.return_value = [point(3), point(4)]
+        with patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([1.0, 0.0], 5.0))), \
+             patch("app.services.rag_services.lexical_index", lexical), \
+             patch("app.services.rag_services.qdrant", qdrant):
+            result = await retrieve("white rabbit", "docs", 2, mode="hybrid")
+
+        assert result["retrieval"] == "hybrid"
+        assert [h.id for h in result["hits"]] == [4, 3]
+        assert lexical.asearch.call_args.args[2] == 6    # fused lists are deeper than top_k
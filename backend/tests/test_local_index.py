@@ -0,0 +1,158 @@
+# backend/tests/test_local_index.py
+import asyncio
+import numpy as np
+import pytest
+from unittest.mock import patch, AsyncMock
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg
+from app.services.local_index import LocalIndex, LocalIndexService, LocalQdrant
+from app.services.rag_services import generate_rag_answer
+
+
+def random_points(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return list(range(n)), vectors, [{"text": f"chunk {i}", "source": "a.txt"} for i in range(n)]
+
+
+@pytest.fixture
+def local_qdrant():
+    """In-memory Qdrant with 200 random points, used as ground truth"""
+    client = QdrantClient(location=":memory:")
+    client.create_collection("docs", vectors_config=qmodels.VectorParams(size=8, distance=qmodels.Distance.COSINE))
+    ids, vectors, payloads = random_points(200)
+    client.upsert("docs", points=qmodels.Batch(ids=ids, vectors=vectors.tolist(), payloads=payloads))
+    with patch("app.services.local_index.qdrant", client), \
+         patch("app.services.snapshot_service.qdrant", client):
+        yield client
+
+
+@pytest.mark.unit
+class TestLocalIndex:
+    """Tests for the NumPy top-k index"""
+
+    def test_matches_qdrant_ranking(self, local_qdrant):
+        index = LocalIndex(8)
+        index.upsert(*random_points(200))
+        query = np.random.default_rng(1).normal(size=8)
+
+        expected = local_qdrant.search("docs", query_vector=query.tolist(), limit=5)
+        got = index.search(query, 5)
+
+        assert [h.id for h in got] == [h.id for h in expected]
+        assert got[0].score == pytest.approx(expected[0].score, abs=1e-5)
+
+    def test_upsert_replaces_and_remove_hides(self):
+        index = LocalIndex(2)
+        index.upsert([1, 2], [[1.0, 0.0], [0.0, 1.0]], [{"v": 1}, {"v": 2}])
+        index.upsert([1], [[0.0, -1.0]], [{"v": 3}])
+        assert len(index) == 2
+        assert index.search([0.0, -1.0], 1)[0].payload == {"v": 3}
+
+        index.remove([2])
+        assert [h.id for h in index.search([0.0, 1.0], 5, score_threshold=-0.5)] == []
+
+    def test_cache_is_memory_mapped(self, tmp_path):
+        index = LocalIndex(8)
+        index.upsert(*random_points(50))
+        index.save(str(tmp_path / "docs"))
+
+        loaded = LocalIndex.load(str(tmp_path / "docs"))
+        assert isinstance(loaded._vectors, np.memmap)
+        assert [h.id for h in loaded.search(np.ones(8), 3)] == [h.id for h in index.search(np.ones(8), 3)]
+
+        loaded.upsert([999], [np.ones(8)], [{}])        # first write copies out of the memmap
+        assert loaded.search(np.ones(8), 1)[0].id == 999
+
+
+@pytest.mark.integration
+class TestLocalIndexService:
+    """Tests for loading, hooks and fallback"""
+
+    @pytest.mark.asyncio
+    async def test_first_query_falls_back_then_serves_locally(self, local_qdrant, tmp_path):
+        service = LocalIndexService()
+        with patch.object(cfg.local_index, "enabled", True), \
+             patch.object(cfg.local_index, "cache_dir", str(tmp_path)):
+            assert service.search("docs", [1.0] * 8, 3) is None
+            while service.snapshot()["loading"]:
+                await asyncio.sleep(0.01)
+
+            hits = service.search("docs", [1.0] * 8, 3)
+            assert len(hits) == 3
+
+            service.add_points("docs", [qmodels.PointStruct(id=500, vector=[1.0] * 8, payload={"text": "new"})])
+            assert service.search("docs", [1.0] * 8, 1)[0].id == 500
+            assert service.search("docs", [1.0] * 8, 3, query_filter=qmodels.Filter(must=[])) is None
+
+    def test_cache_rebuilt_when_points_replaced(self, local_qdrant, tmp_path):
+        """Same count but points stored since: the cache file is not trusted"""
+        service = LocalIndexService()
+        with patch.object(cfg.local_index, "cache_dir", str(tmp_path)):
+            service.build("docs").save(str(tmp_path / "docs"), synced_at=1000.0)
+            assert isinstance(service.build("docs")._vectors, np.memmap)          # unchanged: mapped
+
+            local_qdrant.upsert("docs", points=[qmodels.PointStruct(
+                id=0, vector=[1.0] * 8, payload={"text": "replaced", "uploaded_at": 500.0, "stored_at": 5000.0}
+            )])
+            rebuilt = service.build("docs")
+            assert not isinstance(rebuilt._vectors, np.memmap)
+            assert rebuilt.search([1.0] * 8, 1)[0].payload["text"] == "replaced"
+
+    def test_upload_start_time_does_not_invalidate_the_cache(self, local_qdrant, tmp_path):
+        """An upload that began just before the save but landed before it is already in the file"""
+        service = LocalIndexService()
+        local_qdrant.upsert("docs", points=[qmodels.PointStruct(
+            id=0, vector=[1.0] * 8, payload={"text": "landed", "uploaded_at": 990.0, "stored_at": 995.0}
+        )])
+        with patch.object(cfg.local_index, "cache_dir", str(tmp_path)):
+            service.build("docs").save(str(tmp_path / "docs"), synced_at=1000.0)
+            assert isinstance(service.build("docs")._vectors, np.memmap)
+
+    @pytest.mark.asyncio
+    async def test_big_indexes_are_searched_off_the_loop(self, local_qdrant, tmp_path):
+        service = LocalIndexService()
+        with patch.object(cfg.local_index, "enabled", True), \
+             patch.object(cfg.local_index, "cache_dir", str(tmp_path)), \
+             patch.object(cfg.local_index, "inline_max_points", 100):
+            service._indexes["docs"] = service.build("docs")
+            with patch("app.services.local_index.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+                hits = await service.asearch("docs", [1.0] * 8, 3)
+        assert len(hits) == 3
+        to_thread.assert_called_once()
+
+    def test_large_collections_are_not_served(self, local_qdrant, tmp_path):
+        service = LocalIndexService()
+        with patch.object(cfg.local_index, "max_points", 100), \
+             patch.object(cfg.local_index, "cache_dir", str(tmp_path)):
+            assert service.build("docs") is None
+            assert "docs" in service.snapshot()["unsupported"]
+
+
+@pytest.mark.integration
+class TestLocalQdrantStandIn:
+    """LocalQdrant replaces Qdrant in pipeline tests"""
+
+    @pytest.mark.asyncio
+    async def test_rag_pipeline_against_local_qdrant(self):
+        store = LocalQdrant()
+        store.create_collection("docs", qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+        store.upsert("docs", [
+            qmodels.PointStruct(id=1, vector=[1.0, 0.0], payload={"text": "Alice is in Wonderland.", "source": "a.txt"}),
+            qmodels.PointStruct(id=2, vector=[0.0, 1.0], payload={"text": "Unrelated.", "source": "b.txt"}),
+        ])
+        records, offset = store.scroll("docs", limit=1)
+        assert len(records) == 1 and offset == 1
+        with pytest.raises(ValueError):
+            store.search("docs", [1.0, 0.0], query_filter=qmodels.Filter(must=[]))
+
+        generate = AsyncMock(return_value=({"response": "Wonderland."}, 0.1))
+        with patch("app.services.rag_services.qdrant", store), \
+             patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([1.0, 0.1], 1.0))), \
+             patch("app.services.rag_services._ollama_generate", generate):
+            result = await generate_rag_answer("Where is Alice?", top_k=1, collection="docs")
+
+        assert result["results"][0]["source"] == "a.txt"
+        assert "Alice is in Wonderland." in generate.call_args.args[0]
@@ -0,0 +1,55 @@
+# backend/tests/test_model_lifecycle.py
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.clients import cfg
+from app.services.model_lifecycle import (
+    EMBEDDING,
+    LLM,
+    keep_alive_value,
+    record_load,
+    track_cold_loads,
+    warm_model,
+)
+from app.services.rag_services import _generate_llm_response
+
+
+@pytest.mark.unit
+class TestModelLifecycle:
+    """Tests for Ollama warm-up and cold-load tracking"""
+
+    @pytest.mark.parametrize("raw,expected", [("30m", "30m"), ("-1", -1), ("0", 0)])
+    def test_keep_alive_value(self, raw, expected):
+        """Numeric keep_alive values are sent as numbers"""
+        assert keep_alive_value(raw) == expected
+
+    def test_record_load_flags_request(self):
+        """Slow load_duration marks the current request as cold"""
+        flags = track_cold_loads()
+        assert record_load(EMBEDDING, "embed", 2_000 * 1_000_000) is True
+        assert record_load(LLM, "llm", 5 * 1_000_000) is False
+        assert flags == {EMBEDDING: True, LLM: False}
+
+    @pytest.mark.asyncio
+    async def test_generate_sends_keep_alive(self):
+        """LLM calls carry the configured keep_alive"""
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {"response": "ok", "load_duration": 3_000_000_000}
+        with patch("app.services.rag_services.http_client") as mock_http, \
+             patch.object(cfg.ollama, "llm_keep_alive", "1h"):
+            mock_http.post = AsyncMock(return_value=response)
+            flags = track_cold_loads()
+
+            answer, _ = await _generate_llm_response("prompt")
+
+            assert answer == "ok"
+            assert mock_http.post.call_args.kwargs["json"]["keep_alive"] == "1h"
+            assert flags[LLM] is True
+
+    @pytest.mark.asyncio
+    async def test_warm_model_handles_errors(self):
+        """Warm-up failures are logged, not raised"""
+        with patch("app.services.model_lifecycle.http_client") as mock_http:
+            mock_http.post = AsyncMock(side_effect=Exception("connection refused"))
+            assert await warm_model(LLM) is False
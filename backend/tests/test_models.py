@@ -2,6 +2,7 @@
 import pytest
 from pydantic import ValidationError
 from app.models import AskRequest, EmbedRequest, SearchRequest, RAGRequest
+from app.clients import cfg
 
 
 class TestAskRequest:
@@ -42,9 +43,9 @@ class TestSearchRequest:
         assert request.top_k == 5
 
     def test_default_top_k(self):
-        """Test default top_k value"""
+        """No top_k: the collection's default applies"""
         request = SearchRequest(query="test")
-        assert request.top_k == 3
+        assert request.top_k is None
 
 
 class TestRAGRequest:
@@ -78,4 +79,18 @@ class TestRAGRequest:
         request = RAGRequest(query=query, top_k=top_k, collection=collection)
         assert request.query == query
         assert request.top_k == top_k
-        assert request.collection == collection
\ No newline at end of file
+        assert request.collection == collection
+
+class TestResultMode:
+    """Tests for result_mode / preview_chars options"""
+
+    def test_defaults(self):
+        assert SearchRequest(query="q").result_mode == "full"
+        assert RAGRequest(query="q").result_mode == "preview"
+        assert RAGRequest(query="q").preview_chars == cfg.response.preview_chars
+
+    def test_invalid_mode(self):
+        with pytest.raises(ValidationError):
+            SearchRequest(query="q", result_mode="everything")
+        with pytest.raises(ValidationError):
+            RAGRequest(query="q", preview_chars=0)
@@ -0,0 +1,78 @@
+# backend/tests/test_payload_filters.py
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from pydantic import ValidationError
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg
+from app.models import SearchFilter, RAGRequest
+from app.services.payload_filters import build_filter, create_collection, payload_indexes
+
+JAN = datetime(2025, 1, 1).timestamp()
+FEB = datetime(2025, 2, 1).timestamp()
+
+
+@pytest.fixture
+def local_qdrant():
+    """In-memory Qdrant with indexed 'docs' from two sources"""
+    client = QdrantClient(location=":memory:")
+    with patch("app.services.payload_filters.qdrant", client), \
+         patch.object(cfg.searchsettings, "indexed_metadata_keys", ["lang"]):
+        create_collection("docs", qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+        client.upsert(
+            collection_name="docs",
+            points=[
+                qmodels.PointStruct(
+                    id=i,
+                    vector=[1.0, i / 10],
+                    payload={
+                        "text": f"chunk {i}",
+                        "source": "a.txt" if i % 2 else "b.txt",
+                        "chunk_index": i,
+                        "uploaded_at": JAN if i < 5 else FEB,
+                        "metadata": {"lang": "en" if i < 8 else "de"},
+                    },
+                )
+                for i in range(10)
+            ],
+        )
+        yield client
+
+
+def search_ids(client, filters):
+    hits = client.search("docs", query_vector=[1.0, 0.0], query_filter=build_filter(filters), limit=10)
+    return sorted(h.id for h in hits)
+
+
+@pytest.mark.unit
+class TestSearchFilter:
+    """Tests for payload filters and indexes"""
+
+    def test_no_filter(self):
+        assert build_filter(None) is None
+        assert build_filter(SearchFilter()) is None
+
+    def test_indexes_include_metadata_keys(self):
+        with patch.object(cfg.searchsettings, "indexed_metadata_keys", ["lang"]):
+            indexes = payload_indexes()
+        assert indexes["source"] == qmodels.PayloadSchemaType.KEYWORD
+        assert indexes["uploaded_at"] == qmodels.PayloadSchemaType.FLOAT
+        assert "metadata.lang" in indexes
+
+    def test_source_and_metadata(self, local_qdrant):
+        assert search_ids(local_qdrant, SearchFilter(source="a.txt")) == [1, 3, 5, 7, 9]
+        assert search_ids(local_qdrant, SearchFilter(source=["a.txt", "b.txt"], metadata={"lang": "de"})) == [8, 9]
+
+    def test_upload_time_range(self, local_qdrant):
+        after = SearchFilter(uploaded_after=datetime(2025, 1, 15))
+        assert search_ids(local_qdrant, after) == [5, 6, 7, 8, 9]
+        before = SearchFilter(source="b.txt", uploaded_before=datetime(2025, 1, 15))
+        assert search_ids(local_qdrant, before) == [0, 2, 4]
+
+    def test_request_model_parses_filters(self):
+        request = RAGRequest(query="q", filters={"source": "a.txt", "uploaded_after": "2025-01-15T00:00:00"})
+        assert request.filters.uploaded_after == datetime(2025, 1, 15)
+        with pytest.raises(ValidationError):
+            RAGRequest(query="q", filters={"metadata": {"lang": {"nested": 1}}})
@@ -0,0 +1,134 @@
+# backend/tests/test_projection_service.py
+import pytest
+import numpy as np
+from unittest.mock import patch, MagicMock
+
+from sklearn.decomposition import IncrementalPCA
+
+from app.clients import cfg
+from app.services.projection_service import (
+    ProjectionService,
+    compute_projection,
+    render_png,
+)
+
+
+def make_scroll(n_points: int, dim: int = 8):
+    """Fake qdrant.scroll paging over n_points random vectors"""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n_points, dim)).tolist()
+
+    def scroll(collection_name, limit, offset=None, **kwargs):
+        start = offset or 0
+        points = []
+        for i in range(start, min(start + limit, n_points)):
+            p = MagicMock()
+            p.id = i
+            p.vector = vectors[i]
+            p.payload = {"source": f"doc{i % 3}.txt"}
+            points.append(p)
+        next_offset = start + limit if start + limit < n_points else None
+        return points, next_offset
+
+    return MagicMock(side_effect=scroll)
+
+
+@pytest.mark.unit
+class TestComputeProjection:
+    """Tests for compute_projection"""
+
+    def test_pages_through_whole_collection(self):
+        """All pages are read, not just the first one"""
+        with patch("app.services.projection_service.qdrant") as mock_qdrant, \
+             patch.object(cfg.projection, "page_size", 10):
+            mock_qdrant.scroll = make_scroll(35)
+
+            projection = compute_projection("docs")
+
+            assert projection.count == 35
+            assert projection.coords.shape == (35, 2)
+            assert projection.coords.dtype == np.float32
+            assert projection.method == "randomized_pca"
+            assert mock_qdrant.scroll.call_count == 4
+
+    def test_incremental_when_over_memory_budget(self):
+        """Large collections fall back to IncrementalPCA"""
+        with patch("app.services.projection_service.qdrant") as mock_qdrant, \
+             patch.object(cfg.projection, "page_size", 10), \
+             patch.object(cfg.projection, "max_memory_mb", 0):
+            mock_qdrant.scroll = make_scroll(31)
+
+            projection = compute_projection("docs")
+
+            assert projection.method == "incremental_pca"
+            assert projection.coords.shape == (31, 2)
+
+    def test_incremental_fits_the_remainder(self):
+        """Rows left over after the last full batch are fitted too"""
+        with patch("app.services.projection_service.qdrant") as mock_qdrant, \
+             patch("app.services.projection_service.IncrementalPCA.partial_fit",
+                   autospec=True, side_effect=IncrementalPCA.partial_fit) as fit, \
+             patch.object(cfg.projection, "page_size", 10), \
+             patch.object(cfg.projection, "max_memory_mb", 0):
+            mock_qdrant.scroll = make_scroll(31)
+            compute_projection("docs")
+
+        # The last full batch is held back and fitted once, with the single leftover row
+        assert [len(call.args[1]) for call in fit.call_args_list] == [10, 10, 11]
+
+    def test_emptied_between_passes(self):
+        """A collection emptied before the transform pass gives an empty projection"""
+        full = make_scroll(31)
+        calls = []
+
+        def scroll(*args, **kwargs):
+            calls.append(1)
+            return full(*args, **kwargs) if len(calls) <= 4 else ([], None)
+
+        with patch("app.services.projection_service.qdrant") as mock_qdrant, \
+             patch.object(cfg.projection, "page_size", 10), \
+             patch.object(cfg.projection, "max_memory_mb", 0):
+            mock_qdrant.scroll = MagicMock(side_effect=scroll)
+            projection = compute_projection("docs")
+
+        assert projection.count == 0 and projection.coords.shape == (0, 2)
+
+    def test_empty_collection(self):
+        """Empty collection gives an empty projection"""
+        with patch("app.services.projection_service.qdrant") as mock_qdrant:
+            mock_qdrant.scroll = MagicMock(return_value=([], None))
+
+            projection = compute_projection("docs")
+
+            assert projection.count == 0
+            assert render_png(projection).startswith(b"\x89PNG")
+
+
+@pytest.mark.unit
+class TestProjectionService:
+    """Tests for projection caching"""
+
+    @pytest.mark.asyncio
+    async def test_cache_and_invalidate(self):
+        """Projection is cached until invalidated"""
+        service = ProjectionService()
+        with patch("app.services.projection_service.qdrant") as mock_qdrant:
+            mock_qdrant.scroll = make_scroll(20)
+
+            first = await service.get("docs")
+            second = await service.get("docs")
+            assert first is second
+            assert mock_qdrant.scroll.call_count == 1
+
+            service.invalidate("docs")
+            third = await service.get("docs")
+            assert third is not first
+
+    def test_sample_and_json(self):
+        """Sampling caps the point count in JSON output"""
+        with patch("app.services.projection_service.qdrant") as mock_qdrant:
+            mock_qdrant.scroll = make_scroll(50)
+            data = compute_projection("docs").sample(10).to_dict()
+
+        assert data["count"] == 10
+        assert len(data["x"]) == len(data["y"]) == len(data["ids"]) == 10
@@ -0,0 +1,108 @@
+# backend/tests/test_query_log.py
+import json
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.services.query_log import QueryLog, entry_from_result, read_window
+from app.services.replay import schedule, replay, compare
+
+
+def rag_result(answer="An answer."):
+    return {
+        "answer": answer,
+        "collection": "docs",
+        "results": [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.7}],
+        "timing": {"embedding": 12.0, "search": 3.0, "llm": 1.5, "total": 1.6},
+        "degraded": False,
+    }
+
+
+@pytest.mark.unit
+class TestQueryLog:
+    """Tests for the async append-only query log"""
+
+    @pytest.mark.asyncio
+    async def test_entries_are_written_off_request_path(self, tmp_path):
+        path = str(tmp_path / "log.sqlite3")
+        qlog = QueryLog(path=path, enabled=True)
+        for i in range(5):
+            entry = entry_from_result("/api/search_with_llm", {"query": f"q{i}", "top_k": 3}, rag_result(), 1600.0)
+            entry["ts"] = 1000.0 + i
+            qlog.record(entry)
+        await qlog.stop()
+
+        rows = read_window(path, since=1001.0, until=1004.0)
+        assert [r["query"] for r in rows] == ["q1", "q2", "q3"]
+        assert json.loads(rows[0]["hit_ids"]) == ["a", "b"]
+        assert rows[0]["llm_ms"] == 1500.0
+        assert rows[0]["answer_chars"] == len("An answer.")
+        assert qlog.snapshot()["written"] == 5
+
+    def test_disabled_log_is_noop(self, tmp_path):
+        qlog = QueryLog(path=str(tmp_path / "log.sqlite3"), enabled=False)
+        qlog.record({"query": "q"})
+        assert qlog.snapshot()["queued"] == 0
+
+
+    def test_search_route_logs_stage_timings(self, test_client):
+        retrieved = {"hits": [], "embedding_ms": 12.0, "search_ms": 3.0, "retrieval": "dense", "query_vec": None}
+        with patch("app.routes.base.retrieve", AsyncMock(return_value=retrieved)), \
+             patch("app.routes.base.query_log") as qlog:
+            response = test_client.post("/api/search", json={"query": "Where is Alice?"})
+
+        assert response.status_code == 200
+        entry = qlog.record.call_args.args[0]
+        assert (entry["embedding_ms"], entry["search_ms"]) == (12.0, 3.0)
+
+    def test_upload_time_filters_are_logged(self, test_client):
+        retrieved = {"hits": [], "embedding_ms": 1.0, "search_ms": 1.0, "retrieval": "dense", "query_vec": None}
+        answer = {"answer": "No relevant documents found.", "results": [], "timing": {}}
+        body = {"query": "Where is Alice?", "filters": {"uploaded_after": "2026-01-01T00:00:00Z"}}
+        with patch("app.routes.base.retrieve", AsyncMock(return_value=retrieved)), \
+             patch("app.routes.base.generate_rag_answer", AsyncMock(return_value=answer)), \
+             patch("app.routes.base.query_log") as qlog:
+            qlog.enabled = True
+            assert test_client.post("/api/search", json=body).status_code == 200
+            assert test_client.post("/api/search_with_llm", json=body).status_code == 200
+
+            logged = [json.loads(call.args[0]["request"]) for call in qlog.record.call_args_list]
+            assert [r["filters"]["uploaded_after"] for r in logged] == ["2026-01-01T00:00:00Z"] * 2
+
+            # Disabled: no entry is even built
+            qlog.enabled = False
+            qlog.record.reset_mock()
+            assert test_client.post("/api/search", json=body).status_code == 200
+            qlog.record.assert_not_called()
+
+
+@pytest.mark.unit
+class TestReplay:
+    """Tests for traffic replay"""
+
+    def test_schedule_scales_rate(self):
+        entries = [{"ts": 100.0}, {"ts": 101.0}, {"ts": 104.0}]
+        assert schedule(entries, speed=2.0) == [0.0, 0.5, 2.0]
+
+    @pytest.mark.asyncio
+    async def test_replay_and_compare(self):
+        entries = [
+            {"id": i, "ts": 100.0 + i * 0.01, "endpoint": "/api/search",
+             "request": json.dumps({"query": f"q{i}"}), "total_ms": 100.0}
+            for i in range(4)
+        ]
+        client = MagicMock()
+        client.post = AsyncMock(return_value=MagicMock(status_code=200))
+        client.__aenter__ = AsyncMock(return_value=client)
+        client.__aexit__ = AsyncMock(return_value=False)
+
+        with patch("app.services.replay.httpx.AsyncClient", return_value=client):
+            results = await replay(entries, "http://test", speed=10.0)
+
+        assert client.post.await_count == 4
+        assert client.post.call_args_list[0].args == ("/api/search",)
+        assert client.post.call_args_list[0].kwargs["json"] == {"query": "q0"}
+
+        report = compare(entries, results, speed=10.0)
+        assert report["errors"] == 0
+        assert report["original_ms"]["p50"] == 100.0
+        assert "p99" in report["delta_ms"]
@@ -1,7 +1,24 @@
 # backend/tests/test_rag_services.py
 import pytest
 from unittest.mock import patch, AsyncMock, MagicMock
-from app.services.rag_services import _get_embedding, generate_rag_answer
+import asyncio
+from fastapi import HTTPException
+from app.clients import cfg
+from app.services.rag_services import (
+    _get_embedding,
+    generate_rag_answer,
+    llm_throughput,
+    plan_generation,
+    size_num_ctx,
+)
+
+
+def search_hit(text, point_id=1):
+    hit = MagicMock()
+    hit.id = point_id
+    hit.score = 0.9
+    hit.payload = {"text": text, "source": "doc.txt"}
+    return hit
 
 
 @pytest.mark.unit
@@ -52,9 +69,109 @@ class TestGenerateRAGAnswer:
             
             assert result["answer"] == "No relevant documents found."
             assert result["context_used"] == 0
+            # Same keys as a generated answer
+            assert result["results"] == [] and result["degraded"] is False
+            assert {"retrieval", "timing", "cold_load", "models"} <= set(result)
+            assert result["timing"]["llm"] == 0.0
 
     @pytest.mark.asyncio
     async def test_rag_pipeline_empty_query(self):
         """Test RAG pipeline with empty query"""
         with pytest.raises(ValueError, match="Query cannot be empty"):
-            await generate_rag_answer(query="", collection="docs")
\ No newline at end of file
+            await generate_rag_answer(query="", collection="docs")
+
+
+@pytest.mark.unit
+class TestGenerationBudget:
+    """Tests for deadline-based generation sizing"""
+
+    def test_tight_budget_shrinks_context_and_answer(self):
+        with patch.object(llm_throughput, "prefill", 100.0), patch.object(llm_throughput, "decode", 10.0):
+            loose = plan_generation(30.0)
+            tight = plan_generation(3.0)
+
+        assert tight["num_predict"] < loose["num_predict"]
+        assert tight["context_chars"] < loose["context_chars"]
+        assert loose["context_chars"] >= cfg.budget.min_context_chars
+        assert loose["num_predict"] <= cfg.budget.max_num_predict
+        assert loose["context_chars"] <= cfg.budget.max_context_chars
+
+    def test_num_ctx_is_rounded_and_capped(self):
+        assert size_num_ctx(400, 64) == cfg.budget.min_num_ctx
+        assert size_num_ctx(4 * 3000, 512) == 4096
+        assert size_num_ctx(10 ** 7, 512) == cfg.budget.max_num_ctx
+
+
+@pytest.mark.integration
+class TestDeadlineRAG:
+    """Tests for degraded answers under a deadline"""
+
+    @pytest.mark.asyncio
+    async def test_options_sent_within_deadline(self):
+        generate = AsyncMock(return_value=({"response": "Answer.", "done_reason": "stop"}, 0.5))
+        with patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([0.1] * 4, 1.0))), \
+             patch("app.services.rag_services._ollama_generate", generate), \
+             patch("app.services.rag_services.qdrant") as mock_qdrant:
+            mock_qdrant.search = MagicMock(return_value=[search_hit("Alice " * 50)])
+
+            result = await generate_rag_answer("Who is Alice?", collection="docs", deadline_ms=10000)
+
+        assert result["degraded"] is False
+        options = generate.call_args.kwargs["options"]
+        assert set(options) == {"num_predict", "num_ctx"}
+        assert generate.call_args.kwargs["timeout"] <= 10
+        assert result["budget"]["deadline_ms"] == 10000
+
+    @pytest.mark.asyncio
+    async def test_no_time_left_returns_retrieval_only(self):
+        generate = AsyncMock()
+        with patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([0.1] * 4, 1.0))), \
+             patch("app.services.rag_services._ollama_generate", generate), \
+             patch("app.services.rag_services.qdrant") as mock_qdrant, \
+             patch.object(cfg.budget, "min_llm_ms", 5000):
+            mock_qdrant.search = MagicMock(return_value=[search_hit("Alice text")])
+
+            result = await generate_rag_answer("Who is Alice?", collection="docs", deadline_ms=1000)
+
+        generate.assert_not_called()
+        assert result["degraded"] is True
+        assert len(result["results"]) == 1
+
+    @pytest.mark.asyncio
+    async def test_no_room_for_context_returns_retrieval_only(self):
+        """A deadline that leaves time to decode but not to prefill any context"""
+        generate = AsyncMock()
+        with patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([0.1] * 4, 1.0))), \
+             patch("app.services.rag_services._ollama_generate", generate), \
+             patch("app.services.rag_services.qdrant") as mock_qdrant, \
+             patch.object(llm_throughput, "prefill", 100.0), patch.object(llm_throughput, "decode", 10.0):
+            mock_qdrant.search = MagicMock(return_value=[search_hit("Alice " * 50)])
+
+            result = await generate_rag_answer("Who is Alice?", collection="docs", deadline_ms=2500)
+
+        generate.assert_not_called()
+        assert result["degraded"] is True
+        assert "context chars" in result["degraded_reason"]
+
+    @pytest.mark.asyncio
+    async def test_generation_timeout_degrades(self):
+        generate = AsyncMock(side_effect=HTTPException(status_code=504, detail="timed out"))
+        with patch("app.services.rag_services._get_embedding", AsyncMock(return_value=([0.1] * 4, 1.0))), \
+             patch("app.services.rag_services._ollama_generate", generate), \
+             patch("app.services.rag_services.qdrant") as mock_qdrant:
+            mock_qdrant.search = MagicMock(return_value=[search_hit("Alice text")])
+
+            result = await generate_rag_answer("Who is Alice?", collection="docs", deadline_ms=5000)
+
+        assert result["degraded"] is True
+        assert "deadline" in result["degraded_reason"]
+
+    @pytest.mark.asyncio
+    async def test_slow_embedding_exceeds_deadline(self):
+        async def slow_embedding(text):
+            await asyncio.sleep(1)
+
+        with patch("app.services.rag_services._get_embedding", slow_embedding):
+            with pytest.raises(HTTPException) as exc:
+                await generate_rag_answer("Who is Alice?", collection="docs", deadline_ms=100)
+        assert exc.value.status_code == 504
@@ -0,0 +1,194 @@
+# backend/tests/test_reindex.py
+import time
+import asyncio
+import pytest
+from unittest.mock import patch
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg
+from app.services.collection_registry import collection_registry
+from app.services.concurrency import WriteRejected, write_gate
+from app.services.rag_services import retrieve
+from app.services.reindex import ReindexService, Throttle, generation_name, merge_chunks, rebuild_chunks
+
+
+async def fake_embedding(text, model=None):
+    # "big" embeds into a larger space than the default model
+    size = 3 if model == "big" else 2
+    return [1.0] + [float(len(text) % 5)] * (size - 1), 1.0
+
+
+def stored(client, collection):
+    points, _ = client.scroll(collection, limit=1000, with_payload=True)
+    return sorted((p.payload["source"], p.payload["text"]) for p in points if "text" in p.payload)
+
+
+@pytest.fixture
+def local_qdrant(tmp_path):
+    client = QdrantClient(location=":memory:")
+    client.create_collection("docs", vectors_config=qmodels.VectorParams(size=2, distance=qmodels.Distance.COSINE))
+    client.upsert("docs", points=[
+        qmodels.PointStruct(id=i, vector=[1.0, float(i)], payload={
+            "text": text, "source": source, "chunk_index": idx, "uploaded_at": 100.0,
+        })
+        for i, (source, idx, text) in enumerate([
+            ("alice.txt", 1, "Alice was tired. She sat by her sister."),
+            ("alice.txt", 2, "She sat by her sister. The book had no pictures."),
+            ("rabbit.md", 1, "The rabbit had a watch."),
+        ])
+    ])
+    client.upsert("docs", points=[qmodels.PointStruct(id=99, vector=[1.0, 0.0], payload={"source": "img.png"})])
+    with patch("app.services.reindex.qdrant", client), \
+         patch("app.services.collection_registry.qdrant", client), \
+         patch("app.services.payload_filters.qdrant", client), \
+         patch("app.services.rag_services.qdrant", client), \
+         patch("app.services.reindex._get_embedding", side_effect=fake_embedding), \
+         patch("app.services.rag_services._get_embedding", side_effect=fake_embedding), \
+         patch.object(cfg.reindex, "max_chunks_per_s", 0), \
+         patch.object(cfg.reindex, "state_path", str(tmp_path / "state.json")), \
+         patch.object(cfg.registry, "defaults_path", str(tmp_path / "defaults.json")):
+        yield client
+    write_gate.reopen("docs")
+
+
+@pytest.mark.unit
+class TestReindexHelpers:
+    """Naming, chunk merging and throttling"""
+
+    def test_generation_name(self):
+        assert generation_name("docs", ["docs", "wiki"]) == "docs__v1"
+        assert generation_name("docs", ["docs__v1", "docs__v3", "docs2__v9"]) == "docs__v4"
+
+    def test_merge_chunks_drops_overlap(self):
+        merged = merge_chunks(["Alice was tired. She sat by her sister.", "She sat by her sister. The book had no pictures."])
+        assert merged == "Alice was tired. She sat by her sister. The book had no pictures."
+
+    def test_rebuild_keeps_or_rechunks(self):
+        records = [
+            qmodels.Record(id=1, payload={"text": "A b. C d.", "source": "x", "chunk_index": 1, "uploaded_at": 1.0}),
+            qmodels.Record(id=2, payload={"text": "C d. E f.", "source": "x", "chunk_index": 2, "uploaded_at": 1.0}),
+            qmodels.Record(id=3, payload={"source": "x"}),
+        ]
+        assert [point_id for point_id, _ in rebuild_chunks(records, None, 1)] == [1, 2]
+
+        rechunked = rebuild_chunks(records, 1000, 0)
+        assert [payload["text"] for _, payload in rechunked] == ["A b. C d. E f."]
+        assert rechunked[0][1]["source"] == "x" and rechunked[0][1]["chunk_index"] == 1
+
+    @pytest.mark.asyncio
+    async def test_throttle_spaces_batches(self):
+        throttle = Throttle(100)
+        t0 = time.monotonic()
+        for _ in range(3):
+            await throttle.acquire(5)
+        assert time.monotonic() - t0 >= 0.09
+
+
+@pytest.mark.integration
+class TestReindex:
+    """Shadow build, alias switch and rollback against an in-memory Qdrant"""
+
+    @pytest.mark.asyncio
+    async def test_reindex_switches_alias_and_rolls_back(self, local_qdrant):
+        service = ReindexService()
+        local_qdrant.update_collection_aliases(change_aliases_operations=[
+            qmodels.CreateAliasOperation(create_alias=qmodels.CreateAlias(collection_name="docs", alias_name="books"))
+        ])
+
+        job = await service.start("books", embed_model="big")
+        report = await job.task
+        assert report["target"] == "books__v1" and report["switched"] is True
+        assert job.to_dict()["progress"]["phase"] == "done"
+        assert job.to_dict()["progress"]["skipped_no_text"] == 1
+
+        # Same chunks in a 3-dim collection, the alias now serves it
+        assert stored(local_qdrant, "books__v1") == stored(local_qdrant, "docs")
+        assert local_qdrant.get_collection("books__v1").config.params.vectors.size == 3
+        assert collection_registry.resolve("books") == "books__v1"
+        assert collection_registry.defaults("books").embed_model == "big"
+
+        # Queries through the alias embed with the new model and search the new collection
+        result = await retrieve("rabbit", "books", top_k=5, mode="dense")
+        assert len(result["query_vec"]) == 3 and len(result["hits"]) == 3
+
+        # Writes embedded for the old collection can't land there any more
+        with pytest.raises(WriteRejected, match="books__v1"):
+            async with write_gate.writing("docs"):
+                pass
+
+        service.rollback("books")
+        async with write_gate.writing("docs"):
+            pass
+        assert collection_registry.resolve("books") == "docs"
+        assert {a.alias_name: a.collection_name for a in local_qdrant.get_aliases().aliases} == {"books": "docs"}
+        assert service.state()["books"]["previous"] == "books__v1"
+
+    @pytest.mark.asyncio
+    async def test_rechunk_and_replace_plain_collection(self, local_qdrant):
+        service = ReindexService()
+        with pytest.raises(ValueError, match="replace_collection"):
+            await service.start("docs")
+
+        job = await service.start("docs", chunk_size=1000, overlap=0, replace_collection=True)
+        report = await job.task
+        assert report["switch"]["previous"] is None
+        assert "docs" not in {c.name for c in local_qdrant.get_collections().collections}
+        assert [text for _, text in stored(local_qdrant, "docs__v1")] == [
+            "Alice was tired. She sat by her sister. The book had no pictures.",
+            "The rabbit had a watch.",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_failed_embeddings_keep_the_alias(self, local_qdrant):
+        async def broken(text, model=None):
+            if text == "The rabbit had a watch.":
+                raise RuntimeError("ollama down")
+            return await fake_embedding(text, model)
+
+        service = ReindexService()
+        local_qdrant.update_collection_aliases(change_aliases_operations=[
+            qmodels.CreateAliasOperation(create_alias=qmodels.CreateAlias(collection_name="docs", alias_name="books"))
+        ])
+        with patch("app.services.reindex._get_embedding", side_effect=broken):
+            job = await service.start("books")
+            with pytest.raises(RuntimeError, match="1 chunks failed"):
+                await job.task
+        await asyncio.sleep(0)
+
+        assert job.to_dict()["status"] == "failed"
+        assert collection_registry.resolve("books") == "docs"
+        assert "books__v1" not in {c.name for c in local_qdrant.get_collections().collections}
+
+    @pytest.mark.asyncio
+    async def test_catches_up_until_nothing_changed(self, local_qdrant):
+        def write(point_id, source, text):
+            # uploaded_at from before the copy: a long upload whose points land late
+            local_qdrant.upsert("docs", points=[qmodels.PointStruct(id=point_id, vector=[1.0, 1.0], payload={
+                "text": text, "source": source, "chunk_index": 1, "uploaded_at": 1.0, "stored_at": time.time(),
+            })])
+
+        async def busy(text, model=None):
+            if text == "The rabbit had a watch.":                # while copying
+                write(10, "alice.txt", "Alice grew tall.")
+                local_qdrant.delete("docs", points_selector=qmodels.PointIdsList(points=[1]))
+            elif text == "Alice grew tall.":                     # during the first catch-up pass
+                write(11, "late.md", "A late page.")
+            return await fake_embedding(text, model)
+
+        service = ReindexService()
+        local_qdrant.update_collection_aliases(change_aliases_operations=[
+            qmodels.CreateAliasOperation(create_alias=qmodels.CreateAlias(collection_name="docs", alias_name="books"))
+        ])
+        with patch("app.services.reindex._get_embedding", side_effect=busy):
+            job = await service.start("books")
+            await job.task
+
+        assert stored(local_qdrant, "books__v1") == stored(local_qdrant, "docs")
+        assert ("late.md", "A late page.") in stored(local_qdrant, "books__v1")
+        progress = job.to_dict()["progress"]
+        assert progress["catch_up_passes"] == 2 and progress["caught_up_sources"] == 2
+
+    def test_unknown_alias_is_404(self, local_qdrant, test_client):
+        response = test_client.post("/api/reindex/nope", json={})
+        assert response.status_code == 404
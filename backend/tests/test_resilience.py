@@ -0,0 +1,229 @@
+# backend/tests/test_resilience.py
+import asyncio
+import grpc
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.clients import cfg, make_qdrant_client, _is_qdrant_failure
+from app.services.resilience import (
+    BreakerProxy,
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    RetryableError,
+    hedged,
+    retry_async,
+)
+from app.services.health_monitor import HealthMonitor
+from app.services.rag_services import _get_embedding
+
+
+@pytest.mark.unit
+class TestRetry:
+    """Tests for jittered retries"""
+
+    @pytest.mark.asyncio
+    async def test_retries_then_succeeds(self):
+        """Retryable failures are retried"""
+        calls = AsyncMock(side_effect=[RetryableError("503"), "ok"])
+        stats = {}
+
+        result = await retry_async(calls, retries=2, base_delay_s=0, max_delay_s=0, stats=stats)
+
+        assert result == "ok"
+        assert stats["retries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_raises(self):
+        """Other errors are raised immediately"""
+        calls = AsyncMock(side_effect=ValueError("bad"))
+        with pytest.raises(ValueError):
+            await retry_async(calls, retries=3, base_delay_s=0, max_delay_s=0)
+        assert calls.await_count == 1
+
+
+@pytest.mark.unit
+class TestHedged:
+    """Tests for hedged requests"""
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_and_cancels_primary(self):
+        """A slow primary is beaten by the hedge, and then cancelled"""
+        cancelled = []
+
+        async def call(url):
+            if url == "slow":
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(url)
+                    raise
+            return url
+
+        stats = {}
+        result = await hedged(call, ["slow", "fast"], delay_s=0.01, stats=stats)
+        await asyncio.sleep(0)
+
+        assert result == "fast"
+        assert stats == {"hedges": 1, "hedge_wins": 1}
+        assert cancelled == ["slow"]
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_primary_fast(self):
+        """Fast primary responses never send a duplicate"""
+        call = AsyncMock(return_value="primary")
+        result = await hedged(call, ["a", "b"], delay_s=1)
+        assert result == "primary"
+        assert call.await_count == 1
+
+    def test_latency_percentile(self):
+        tracker = LatencyTracker(window=100)
+        for ms in range(1, 101):
+            tracker.observe(ms)
+        assert tracker.percentile(95) == 95
+
+
+@pytest.mark.unit
+class TestEmbeddingTransport:
+    """_get_embedding retry / deadline behaviour"""
+
+    @pytest.mark.asyncio
+    async def test_embedding_retried_on_503(self, mock_ollama_embedding):
+        """A 503 from Ollama is retried"""
+        unavailable = MagicMock()
+        unavailable.status_code = 503
+        unavailable.text = "overloaded"
+        with patch("app.services.rag_services.http_client") as mock_http, \
+             patch.object(cfg.ollama, "retry_base_delay_s", 0):
+            mock_http.post = AsyncMock(side_effect=[unavailable, mock_ollama_embedding])
+
+            embedding, _ = await _get_embedding("text")
+
+            assert len(embedding) == 768
+            assert mock_http.post.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_embedding_deadline(self):
+        """Stalled calls fail after the per-call deadline"""
+        async def stall(*args, **kwargs):
+            await asyncio.sleep(5)
+
+        with patch("app.services.rag_services.http_client") as mock_http, \
+             patch.object(cfg.ollama, "embed_timeout_s", 0.01), \
+             patch.object(cfg.ollama, "embed_retries", 0):
+            mock_http.post = stall
+
+            with pytest.raises(Exception, match="timed out"):
+                await _get_embedding("text")
+
+
+@pytest.mark.unit
+class TestCircuitBreaker:
+    """Tests for the failure-rate circuit breaker"""
+
+    def test_opens_and_fails_fast(self):
+        """Breaker opens at the failure rate and then rejects calls"""
+        breaker = CircuitBreaker("test", failure_rate=0.5, window=4, min_calls=4, open_s=60)
+        for ok in (True, False, True, False):
+            breaker.allow()
+            breaker.record_success() if ok else breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+
+    def test_half_open_probe_closes(self):
+        """One trial call is let through after open_s; success closes"""
+        breaker = CircuitBreaker("test", min_calls=1, open_s=0)
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_proxy_ignores_client_errors(self):
+        """Errors classified as non-failures don't trip the breaker"""
+        client = MagicMock()
+        client.get_collection.side_effect = KeyError("missing")
+        breaker = CircuitBreaker("test", min_calls=1)
+        proxy = BreakerProxy(client, breaker, is_failure=lambda e: not isinstance(e, KeyError))
+
+        with pytest.raises(KeyError):
+            proxy.get_collection("nope")
+        assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.unit
+class TestHealthMonitor:
+    """Tests for the background health state"""
+
+    @pytest.mark.asyncio
+    async def test_probe_updates_state(self):
+        """Probes store results that endpoints can read without upstream calls"""
+        monitor = HealthMonitor()
+        info = MagicMock()
+        info.collections = [MagicMock()]
+        info.collections[0].name = "docs"
+        tags = MagicMock()
+        tags.status_code = 200
+        with patch("app.services.health_monitor.qdrant") as mock_qdrant, \
+             patch("app.services.health_monitor.http_client") as mock_http:
+            mock_qdrant.unwrapped.get_collections = MagicMock(return_value=info)
+            mock_http.get = AsyncMock(return_value=tags)
+
+            await monitor.probe_all()
+
+        state = monitor.snapshot()
+        assert state["qdrant"]["status"] == "healthy"
+        assert state["qdrant"]["collections"] == ["docs"]
+        assert monitor.is_healthy("ollama")
+
+    def test_health_endpoint_reads_state(self, test_client):
+        """/api/health answers from memory"""
+        with patch("app.routes.base.health_monitor") as mock_monitor:
+            mock_monitor.snapshot.return_value = {
+                "qdrant": {"status": "healthy"},
+                "ollama": {"status": "unhealthy: down"},
+            }
+            response = test_client.get("/api/health")
+
+        assert response.status_code == 200
+        assert response.json()["ollama"] == "unhealthy: down"
+
+
+class FakeRpcError(grpc.RpcError):
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+@pytest.mark.unit
+class TestQdrantTransport:
+    """Qdrant client construction and error classification"""
+
+    @pytest.mark.parametrize("code,is_failure", [
+        (grpc.StatusCode.NOT_FOUND, False),
+        (grpc.StatusCode.INVALID_ARGUMENT, False),
+        (grpc.StatusCode.UNAVAILABLE, True),
+        (grpc.StatusCode.DEADLINE_EXCEEDED, True),
+    ])
+    def test_grpc_errors(self, code, is_failure):
+        """Only server-side gRPC errors count against the breaker"""
+        assert _is_qdrant_failure(FakeRpcError(code)) is is_failure
+
+    def test_grpc_client_options(self):
+        """prefer_grpc passes port and channel options to QdrantClient"""
+        with patch("app.clients.QdrantClient") as mock_client:
+            make_qdrant_client(prefer_grpc=True)
+
+        kwargs = mock_client.call_args.kwargs
+        assert kwargs["prefer_grpc"] is True
+        assert kwargs["grpc_port"] == cfg.qdrant.grpc_port
+        assert "grpc.max_receive_message_length" in kwargs["grpc_options"]
@@ -0,0 +1,94 @@
+# backend/tests/test_responses.py
+import gzip
+import numpy as np
+import orjson
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.responses import FastJSONResponse, CompressionMiddleware, choose_encoding, dumps_pretty
+from app.services.rag_services import hit_text, payload_selector
+
+
+def make_app(min_bytes=100):
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(CompressionMiddleware, min_bytes=min_bytes)
+
+    @app.get("/big")
+    def big():
+        # returned directly: skips jsonable_encoder, numpy goes straight to orjson
+        return FastJSONResponse({"results": [{"text": "lorem ipsum " * 20, "score": np.float32(0.5)}] * 10})
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a" * 500, b"b" * 500]), media_type="text/plain")
+
+    return app
+
+
+@pytest.mark.unit
+class TestSerialization:
+    """Tests for orjson serialization helpers"""
+
+    def test_numpy_and_non_str_keys(self):
+        body = FastJSONResponse({1: np.arange(3, dtype=np.float32)}).body
+        assert orjson.loads(body) == {"1": [0.0, 1.0, 2.0]}
+
+    def test_dumps_pretty_is_indented(self):
+        assert dumps_pretty({"a": [1]}) == '{\n  "a": [\n    1\n  ]\n}'
+
+    def test_accept_encoding(self):
+        assert choose_encoding("gzip, deflate") == "gzip"
+        assert choose_encoding("identity") == ""
+        assert choose_encoding("gzip;q=0") == ""
+        with patch("app.responses.brotli", MagicMock()):
+            assert choose_encoding("gzip, br") == "br"
+        with patch("app.responses.brotli", None):
+            assert choose_encoding("br, gzip") == "gzip"
+
+
+@pytest.mark.unit
+class TestResultMode:
+    """Tests for search hit shaping"""
+
+    def test_modes(self):
+        payload = {"text": "x" * 50, "source": "a.txt"}
+        assert hit_text(payload, "full") == {"text": "x" * 50}
+        assert hit_text(payload, "preview", 10) == {"text_preview": "x" * 10}
+        assert hit_text(payload, "ids") == {}
+        assert payload_selector("ids") == ["source", "chunk_index"]
+        assert payload_selector("full") is True
+
+
+@pytest.mark.api
+class TestCompressionMiddleware:
+    """Tests for response compression"""
+
+    def test_large_json_is_gzipped(self):
+        client = TestClient(make_app())
+        response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.json()["results"][0]["score"] == 0.5
+        assert int(response.headers["content-length"]) < len(orjson.dumps(response.json()))
+
+    def test_small_and_unaccepted_pass_through(self):
+        client = TestClient(make_app())
+        assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+        assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+
+    def test_streaming_is_not_buffered(self):
+        client = TestClient(make_app())
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.content == b"a" * 500 + b"b" * 500
+
+    def test_gzip_round_trip(self):
+        from app.responses import compress
+        assert gzip.decompress(compress(b"payload" * 100, "gzip")) == b"payload" * 100
@@ -0,0 +1,115 @@
+# backend/tests/test_snapshot_service.py
+import json
+import pytest
+import numpy as np
+from unittest.mock import patch
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from app.clients import cfg
+from app.services.concurrency import write_gate
+from app.services.snapshot_service import export_collection, import_collection
+
+
+@pytest.fixture
+def local_qdrant():
+    """In-memory Qdrant with a small 'docs' collection"""
+    client = QdrantClient(location=":memory:")
+    client.create_collection(
+        collection_name="docs",
+        vectors_config=qmodels.VectorParams(size=4, distance=qmodels.Distance.COSINE),
+    )
+    client.upsert(
+        collection_name="docs",
+        points=[
+            qmodels.PointStruct(
+                id=i,
+                vector=[float(i + 1), 1.0, 0.5, 0.25],
+                payload={"text": f"chunk {i}", "source": "a.txt", "chunk_index": i},
+            )
+            for i in range(25)
+        ],
+    )
+    with patch("app.services.snapshot_service.qdrant", client), \
+         patch("app.services.payload_filters.qdrant", client):
+        yield client
+
+
+@pytest.mark.unit
+class TestSnapshot:
+    """Tests for snapshot export/import"""
+
+    def test_export_writes_mmap_npy(self, local_qdrant, tmp_path):
+        """Exported vectors are a memory-mappable float32 matrix"""
+        meta = export_collection("docs", out_dir=str(tmp_path), page_size=10)
+
+        vectors = np.load(tmp_path / "vectors.npy", mmap_mode="r")
+        assert vectors.shape == (25, 4)
+        assert vectors.dtype == np.float32
+        assert meta["count"] == 25
+
+        lines = (tmp_path / "payloads.jsonl").read_text().splitlines()
+        assert len(lines) == 25
+        assert json.loads(lines[0])["payload"]["source"] == "a.txt"
+
+    def test_round_trip(self, local_qdrant, tmp_path):
+        """Import restores the same points into a new collection"""
+        export_collection("docs", out_dir=str(tmp_path), page_size=7)
+
+        result = import_collection(str(tmp_path), collection="restored", batch_size=10)
+
+        assert result["imported"] == 25
+        assert local_qdrant.count("restored").count == 25
+        point = local_qdrant.retrieve("restored", ids=[3], with_vectors=True)[0]
+        assert point.payload["text"] == "chunk 3"
+
+    def test_import_rejects_mismatched_files(self, local_qdrant, tmp_path):
+        """Payload count must match the vector rows"""
+        export_collection("docs", out_dir=str(tmp_path))
+        lines = (tmp_path / "payloads.jsonl").read_text().splitlines()
+        (tmp_path / "payloads.jsonl").write_text("\n".join(lines[:-1]) + "\n")
+
+        with pytest.raises(ValueError):
+            import_collection(str(tmp_path), collection="broken", batch_size=10)
+        # Rejected before anything was written
+        assert "broken" not in {c.name for c in local_qdrant.get_collections().collections}
+
+    def test_import_rejects_a_different_distance(self, local_qdrant, tmp_path):
+        """Same size, other metric: scores would mean something else"""
+        export_collection("docs", out_dir=str(tmp_path))
+        local_qdrant.create_collection("dots", vectors_config=qmodels.VectorParams(size=4, distance=qmodels.Distance.DOT))
+
+        with pytest.raises(ValueError, match="distance"):
+            import_collection(str(tmp_path), collection="dots", batch_size=10)
+        assert local_qdrant.count("dots").count == 0
+
+    def test_failed_export_keeps_the_previous_snapshot(self, local_qdrant, tmp_path):
+        out = tmp_path / "docs"
+        export_collection("docs", out_dir=str(out))
+        with patch("app.services.snapshot_service._iter_points", side_effect=RuntimeError("qdrant down")):
+            with pytest.raises(RuntimeError):
+                export_collection("docs", out_dir=str(out))
+
+        assert json.loads((out / "meta.json").read_text())["count"] == 25
+        assert np.load(out / "vectors.npy", mmap_mode="r").shape == (25, 4)
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["docs"]      # no temp dirs left behind
+
+        export_collection("docs", out_dir=str(out))                         # and a good export replaces it
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["docs"]
+
+
+@pytest.mark.api
+class TestSnapshotRoutes:
+    """Imports hold the write gate like other upserts"""
+
+    def test_import_into_retired_collection_is_rejected(self, local_qdrant, tmp_path, test_client):
+        with patch.object(cfg.snapshot, "dir", str(tmp_path)):
+            export_collection("docs")
+            write_gate.retire("restored", "moved")
+            try:
+                response = test_client.post("/api/snapshots/docs/import", data={"target": "restored"})
+            finally:
+                write_gate.reopen("restored")
+
+        assert response.status_code == 409
+        assert "restored" not in {c.name for c in local_qdrant.get_collections().collections}